@@ -0,0 +1,94 @@
+"""
+Measure a dashboard workload with and without AnalyticsCache.
+
+Each round queries the high demand city, the idle time of --watched cabs
+and the idle report of one city, then books --bookings-per-round cabs so
+that some of the cached results go stale. Every city gets one booking
+before the first round.
+
+Usage:
+    python benchmarks/bench_analytics_cache.py [--cabs 100000] [--rounds 200] [--watched 50]
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from common import build_fleet, quiet_logging
+from cab_management.analytics import Analytics
+from cab_management.analytics_cache import AnalyticsCache
+
+START = datetime.now().replace(microsecond=0)
+END = START + timedelta(days=1)
+
+
+def dashboard(query, cab_manager, booking_manager, args, seed=3):
+    """
+    Run the dashboard rounds with the given query backend.
+
+    Returns:
+        float: Milliseconds per round spent in queries.
+    """
+    rng = random.Random(seed)
+    watched = [cab_manager.getCab(cab_id) for cab_id in rng.sample(range(1, args.cabs + 1), args.watched)]
+    for city in range(1, args.cities + 1):
+        booking_manager.bookCab(city, START)
+    spent = 0.0
+    for position in range(args.rounds):
+        began = time.perf_counter()
+        query.highDemandCities(*query.demandArgs(booking_manager))
+        for cab in watched:
+            query.calculateIdleTime(cab, START, END)
+        query.fleetIdleReport(START, END, 1 + position % 2)
+        spent += time.perf_counter() - began
+        for _ in range(args.bookings_per_round):
+            booking_manager.bookCab(rng.randint(1, args.cities), START + timedelta(seconds=position))
+    return spent / args.rounds * 1000
+
+
+class Uncached:
+    """
+    Analytics called directly, the way dashboards do today.
+    """
+    highDemandCities = staticmethod(Analytics.highDemandCities)
+    calculateIdleTime = staticmethod(Analytics.calculateIdleTime)
+    fleetIdleReport = staticmethod(Analytics.fleetIdleReport)
+
+    @staticmethod
+    def demandArgs(booking_manager):
+        return (booking_manager.getAllBookings(),)
+
+
+class Cached(AnalyticsCache):
+    """
+    The same queries through AnalyticsCache.
+    """
+    @staticmethod
+    def demandArgs(booking_manager):
+        return ()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cabs', type=int, default=100000)
+    parser.add_argument('--cities', type=int, default=100)
+    parser.add_argument('--rounds', type=int, default=200)
+    parser.add_argument('--watched', type=int, default=50)
+    parser.add_argument('--bookings-per-round', type=int, default=5)
+    args = parser.parse_args()
+
+    quiet_logging()
+    print(f"{'mode':>9} {'ms/round':>9} {'hit rate':>9} {'stale':>6}")
+    for name, query in (('uncached', Uncached), ('cached', Cached())):
+        cab_manager, _, booking_manager = build_fleet(args.cabs, args.cities)
+        ms = dashboard(query, cab_manager, booking_manager, args)
+        if isinstance(query, AnalyticsCache):
+            stats = query.getStats()
+            print(f"{name:>9} {ms:>9.2f} {stats['hitRate']:>9.3f} {stats['stale']:>6}")
+        else:
+            print(f"{name:>9} {ms:>9.2f} {'-':>9} {'-':>6}")
+
+
+if __name__ == "__main__":
+    main()
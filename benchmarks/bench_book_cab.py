@@ -0,0 +1,49 @@
+"""
+Benchmark bookCab latency as the number of cabs in a city grows.
+
+With the per-city idle index, picking the best cab costs O(log n), so the
+per-booking latency should stay flat from 1k to 1M cabs.
+
+Usage:
+    python benchmarks/bench_book_cab.py [--sizes 1000 10000 100000 1000000] [--bookings 2000]
+"""
+
+import argparse
+import time
+
+from common import build_fleet, percentile, quiet_logging
+
+
+def run(num_cabs, num_bookings):
+    """
+    Book and end num_bookings trips in a single city holding num_cabs cabs.
+    
+    Returns:
+        list: bookCab latencies in seconds.
+    """
+    _, _, booking_manager = build_fleet(num_cabs)
+    latencies = []
+    for _ in range(num_bookings):
+        start = time.perf_counter()
+        booking_id = booking_manager.bookCab(1)
+        latencies.append(time.perf_counter() - start)
+        booking_manager.endBooking(booking_id)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--bookings', type=int, default=2000)
+    args = parser.parse_args()
+
+    quiet_logging()
+    print(f"{'cabs':>10} {'mean (us)':>12} {'p50 (us)':>12} {'p99 (us)':>12}")
+    for size in args.sizes:
+        latencies = run(size, args.bookings)
+        mean = sum(latencies) / len(latencies)
+        print(f"{size:>10} {mean * 1e6:>12.1f} {percentile(latencies, 50) * 1e6:>12.1f} {percentile(latencies, 99) * 1e6:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
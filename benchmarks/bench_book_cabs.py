@@ -0,0 +1,54 @@
+"""
+Benchmark batch booking with bookCabs against looping over bookCab.
+
+Usage:
+    python benchmarks/bench_book_cabs.py [--cabs 100000] [--cities 10] [--requests 20000]
+"""
+
+import argparse
+import gc
+import random
+
+from common import build_fleet, quiet_logging, timed
+
+
+def make_requests(num_requests, num_cities, seed=1):
+    """
+    Build a burst of booking requests spread over the cities.
+    
+    Returns:
+        list: City IDs, one per request.
+    """
+    rng = random.Random(seed)
+    return [rng.randint(1, num_cities) for _ in range(num_requests)]
+
+
+def book_in_loop(booking_manager, requests):
+    return [booking_manager.bookCab(city_id) for city_id in requests]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cabs', type=int, default=100000)
+    parser.add_argument('--cities', type=int, default=10)
+    parser.add_argument('--requests', type=int, default=20000)
+    args = parser.parse_args()
+
+    quiet_logging()
+    requests = make_requests(args.requests, args.cities)
+
+    _, _, booking_manager = build_fleet(args.cabs, args.cities)
+    gc.collect()
+    _, loop_time = timed(book_in_loop, booking_manager, requests)
+
+    _, _, booking_manager = build_fleet(args.cabs, args.cities)
+    gc.collect()
+    _, batch_time = timed(booking_manager.bookCabs, requests)
+
+    print(f"{'mode':>10} {'seconds':>10} {'bookings/s':>12}")
+    print(f"{'bookCab':>10} {loop_time:>10.3f} {len(requests) / loop_time:>12.0f}")
+    print(f"{'bookCabs':>10} {batch_time:>10.3f} {len(requests) / batch_time:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Compare sliding-window demand tracking with exact city counts against
+count-min sketches of several widths.
+
+Bookings arrive one per --interval seconds in --cities cities with Zipf-like
+popularity. After every simulated hour the top --k cities of each sketched
+window are compared with the exact window: recall is the share of the exact
+top k that the sketch also reports, and error is the mean relative
+overestimate of their counts.
+
+Usage:
+    python benchmarks/bench_demand_window.py [--bookings 500000] [--cities 100000] [--widths 256 1024 4096]
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from common import quiet_logging
+from cab_management.booking import Booking, BookingState
+from cab_management.city import City
+from cab_management.demand_window import DemandWindow
+
+START = datetime(2024, 7, 22)
+
+
+def generate(num_bookings, cities, interval, seed=1):
+    """
+    Create bookings with Zipf-like city popularity, one per interval seconds.
+
+    Returns:
+        list: The bookings, in start time order.
+    """
+    rng = random.Random(seed)
+    weights = [1 / rank for rank in range(1, len(cities) + 1)]
+    chosen = rng.choices(cities, weights, k=num_bookings)
+    return [Booking.fromRow(position, None, city, BookingState.COMPLETED,
+                            START + timedelta(seconds=position * interval), None)
+            for position, city in enumerate(chosen)]
+
+
+def run(demand_window, bookings, checkpoint, k):
+    """
+    Feed bookings to a window, taking its top k every checkpoint bookings.
+
+    Returns:
+        tuple: Microseconds per booking, microseconds per query, and the top k at every checkpoint.
+    """
+    tops = []
+    add_seconds = query_seconds = 0.0
+    for begin in range(0, len(bookings), checkpoint):
+        started = time.perf_counter()
+        demand_window.extend(bookings[begin:begin + checkpoint])
+        add_seconds += time.perf_counter() - started
+        started = time.perf_counter()
+        tops.append(demand_window.topCities(k))
+        query_seconds += time.perf_counter() - started
+    return add_seconds / len(bookings) * 1e6, query_seconds / len(tops) * 1e6, tops
+
+
+def compare(expected_tops, estimated_tops):
+    """
+    Get the recall and mean relative overestimate of sketched top-k lists.
+
+    Returns:
+        tuple: Recall and relative error, both between 0 and 1.
+    """
+    found = total = 0
+    errors = []
+    for expected, estimated in zip(expected_tops, estimated_tops):
+        estimates = dict(estimated)
+        for name, count in expected:
+            total += 1
+            if name in estimates:
+                found += 1
+                errors.append((estimates[name] - count) / count)
+    return found / total, sum(errors) / len(errors) if errors else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bookings', type=int, default=500000)
+    parser.add_argument('--cities', type=int, default=100000)
+    parser.add_argument('--interval', type=float, default=0.5, help="Seconds between bookings")
+    parser.add_argument('--window', type=int, default=60, help="Window length in minutes")
+    parser.add_argument('--buckets', type=int, default=60)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--widths', type=int, nargs='+', default=[256, 1024, 4096])
+    args = parser.parse_args()
+
+    quiet_logging()
+    cities = [City(city_id, f"City {city_id}") for city_id in range(1, args.cities + 1)]
+    bookings = generate(args.bookings, cities, args.interval)
+    checkpoint = max(1, int(3600 / args.interval))
+    window = timedelta(minutes=args.window)
+
+    print(f"{'mode':>12} {'MB':>7} {'add us':>7} {'query us':>9} {'recall':>7} {'error':>7}")
+    exact = DemandWindow(window, args.buckets, args.k)
+    add_us, query_us, expected_tops = run(exact, bookings, checkpoint, args.k)
+    print(f"{'exact':>12} {exact.memoryBytes() / 2**20:>7.2f} {add_us:>7.2f} {query_us:>9.1f} {1:>7.3f} {0:>7.3f}")
+    for width in args.widths:
+        sketched = DemandWindow(window, args.buckets, args.k, sketchWidth=width)
+        add_us, query_us, tops = run(sketched, bookings, checkpoint, args.k)
+        recall, error = compare(expected_tops, tops)
+        print(f"{f'sketch {width}':>12} {sketched.memoryBytes() / 2**20:>7.2f} {add_us:>7.2f} {query_us:>9.1f} "
+              f"{recall:>7.3f} {error:>7.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Compare a fleet idle report built from one calculateStateTime call per cab
+and state with Analytics.fleetIdleReport.
+
+Every cab is driven through RESERVED, ON_TRIP and IDLE --trips times,
+starting just after registration, before the report window is queried. The
+per-cab loop is only timed up to --loop-limit cabs.
+
+Usage:
+    python benchmarks/bench_fleet_report.py [--cabs 100000 1000000] [--trips 3]
+"""
+
+import argparse
+import gc
+from datetime import datetime, timedelta
+
+from common import build_fleet, quiet_logging, timed
+from cab_management.analytics import Analytics
+from cab_management.cab import CabState
+from cab_management.fleet_report import np
+
+START = datetime.now().replace(microsecond=0) + timedelta(minutes=1)  # After the cabs are registered
+STATES = [CabState.RESERVED, CabState.ON_TRIP, CabState.IDLE]
+
+
+def drive(cab_manager, trips):
+    """
+    Give every cab trips round trips, staggered per cab.
+    """
+    for cab in cab_manager.cabs.values():
+        offset = timedelta(seconds=cab.cabId % 3600)
+        for position in range(3 * trips):
+            cab._changeState(STATES[position % 3], START + offset + timedelta(minutes=20 * position + 1))
+
+
+def per_cab_report(cabs, start_time, end_time):
+    """
+    Build the report with one calculateStateTime call per cab and state.
+
+    Returns:
+        dict: Dictionary mapping cab IDs to dictionaries mapping states to seconds.
+    """
+    return {cab.cabId: {state: Analytics.calculateStateTime(cab, state, start_time, end_time) for state in CabState}
+            for cab in cabs}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cabs', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--trips', type=int, default=3)
+    parser.add_argument('--cities', type=int, default=100)
+    parser.add_argument('--loop-limit', type=int, default=100000)
+    args = parser.parse_args()
+
+    quiet_logging()
+    start_time, end_time = START + timedelta(hours=1), START + timedelta(hours=3)
+    print(f"numpy: {'yes' if np is not None else 'no (loop fallback)'}")
+    print(f"{'cabs':>10} {'per cab (s)':>12} {'report (s)':>11}")
+    for num_cabs in args.cabs:
+        cab_manager, _, _ = build_fleet(num_cabs, args.cities)
+        drive(cab_manager, args.trips)
+        cabs = list(cab_manager.cabs.values())
+        gc.collect()
+        report, report_seconds = timed(Analytics.fleetIdleReport, start_time, end_time)
+        loop = f"{'-':>12}"
+        if num_cabs <= args.loop_limit:
+            expected, loop_seconds = timed(per_cab_report, cabs, start_time, end_time)
+            for cabId, seconds in expected.items():
+                if report.cab(cabId) != seconds:
+                    raise AssertionError(f"Report gave {report.cab(cabId)} for cab {cabId}, expected {seconds}")
+            loop = f"{loop_seconds:>12.2f}"
+        print(f"{num_cabs:>10} {loop} {report_seconds:>11.2f}")
+        del cabs, report, cab_manager
+
+
+if __name__ == "__main__":
+    main()
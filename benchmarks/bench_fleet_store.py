@@ -0,0 +1,72 @@
+"""
+Compare memory and scan time of Cab objects against the columnar fleet store.
+
+Usage:
+    python benchmarks/bench_fleet_store.py [--cabs 1000000] [--cities 100]
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+
+from common import build_fleet, quiet_logging
+from cab_management.cab import CabState
+from cab_management.fleet_store import FleetStore, np
+
+
+def object_counts(cab_manager):
+    counts = {}
+    for cab in cab_manager.cabs.values():
+        city_counts = counts.setdefault(cab.cityId, {state: 0 for state in CabState})
+        city_counts[cab.state] += 1
+    return counts
+
+
+def object_idle_in_city(cab_manager, city_id):
+    return [cab.cabId for cab in cab_manager.cabs.values() if cab.cityId == city_id and cab.state == CabState.IDLE]
+
+
+def best_of(func, *args, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cabs', type=int, default=1000000)
+    parser.add_argument('--cities', type=int, default=100)
+    args = parser.parse_args()
+
+    quiet_logging()
+    gc.collect()
+    tracemalloc.start()
+    cab_manager, _, _ = build_fleet(args.cabs, args.cities)
+    object_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    gc.collect()
+    tracemalloc.start()
+    store = FleetStore()
+    for cab in cab_manager.cabs.values():
+        store.add(cab.cabId, cab.cityId, cab.state, cab.history[-1][0])
+    store_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    print(f"cabs: {args.cabs}, cities: {args.cities}, numpy: {'yes' if np is not None else 'no'}")
+    print(f"{'':<28} {'objects':>12} {'fleet store':>12}")
+    print(f"{'memory (MB)':<28} {object_bytes / 1e6:>12.1f} {store_bytes / 1e6:>12.1f}")
+    print(f"{'bytes per cab':<28} {object_bytes / args.cabs:>12.0f} {store_bytes / args.cabs:>12.0f}")
+    print(f"{'counts per city/state (ms)':<28} {best_of(object_counts, cab_manager) * 1e3:>12.1f} "
+          f"{best_of(store.getCountsByCityAndState) * 1e3:>12.1f}")
+    print(f"{'idle cabs in one city (ms)':<28} {best_of(object_idle_in_city, cab_manager, 1) * 1e3:>12.1f} "
+          f"{best_of(store.getCabIdsInCityByState, 1, CabState.IDLE) * 1e3:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
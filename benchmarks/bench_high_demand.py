@@ -0,0 +1,78 @@
+"""
+Compare Analytics.highDemandCities over a list of bookings with the
+BookingColumns and DemandCounters implementations.
+
+Bookings are spread over --cities cities with start times over a week,
+half as ISO strings and half as datetimes. The loop over bookings is only
+timed up to --loop-limit bookings; above that, bookings are generated
+straight into the columns and counters so that they never all exist at once.
+
+Usage:
+    python benchmarks/bench_high_demand.py [--sizes 100000 1000000 10000000] [--cities 100]
+"""
+
+import argparse
+import gc
+from datetime import datetime, timedelta
+
+from common import quiet_logging, timed
+from cab_management.analytics import Analytics
+from cab_management.booking import Booking, BookingState
+from cab_management.booking_columns import BookingColumns, np
+from cab_management.city import City
+from cab_management.demand_counters import DemandCounters
+
+START = datetime(2024, 7, 22)
+
+
+def generate(num_bookings, cities):
+    """
+    Yield bookings with start times spread over a week.
+    """
+    for position in range(num_bookings):
+        start_time = START + timedelta(seconds=position * 7 % (7 * 86400))
+        if position % 2:
+            start_time = start_time.isoformat()
+        yield Booking.fromRow(position, None, cities[position * 31 % len(cities)], BookingState.COMPLETED,
+                              start_time, None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--cities', type=int, default=100)
+    parser.add_argument('--loop-limit', type=int, default=1000000)
+    args = parser.parse_args()
+
+    quiet_logging()
+    cities = [City(city_id, f"City {city_id}") for city_id in range(1, args.cities + 1)]
+    print(f"numpy: {'yes' if np is not None else 'no (Counter fallback)'}")
+    print(f"{'bookings':>10} {'loop (s)':>9} {'fill (s)':>9} {'columns (s)':>12} {'MB':>6} "
+          f"{'count (s)':>10} {'counters (us)':>14}")
+    for size in args.sizes:
+        loop_seconds = None
+        if size <= args.loop_limit:
+            bookings = list(generate(size, cities))
+            gc.collect()
+            expected, loop_seconds = timed(Analytics.highDemandCities, bookings)
+            columns, fill_seconds = timed(BookingColumns, bookings)
+            counters, count_seconds = timed(DemandCounters, bookings)
+            del bookings
+        else:
+            expected = None
+            columns, fill_seconds = timed(BookingColumns, generate(size, cities))
+            counters, count_seconds = timed(DemandCounters, generate(size, cities))
+        gc.collect()
+        result, columns_seconds = timed(Analytics.highDemandCities, columns)
+        if expected is not None and result != expected:
+            raise AssertionError(f"Columns gave {result}, loop gave {expected}")
+        counted, counters_seconds = timed(Analytics.highDemandCities, counters)
+        if counted != result:
+            raise AssertionError(f"Counters gave {counted}, columns gave {result}")
+        loop = f"{loop_seconds:>9.2f}" if loop_seconds is not None else f"{'-':>9}"
+        print(f"{size:>10} {loop} {fill_seconds:>9.2f} {columns_seconds:>12.3f} {columns.memoryBytes() / 2**20:>6.1f} "
+              f"{count_seconds:>10.2f} {counters_seconds * 1e6:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
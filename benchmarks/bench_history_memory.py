@@ -0,0 +1,60 @@
+"""
+Compare the memory used by a list of (datetime, CabState) tuples with the
+packed CompactHistory used by Cab.history.
+
+Usage:
+    python benchmarks/bench_history_memory.py [--cabs 10000] [--transitions 1 10 100 1000]
+"""
+
+import argparse
+import gc
+import tracemalloc
+from datetime import datetime, timedelta
+
+from common import quiet_logging
+from cab_management.cab import CabState
+from cab_management.compact_history import CompactHistory
+
+STATES = [CabState.RESERVED, CabState.ON_TRIP, CabState.IDLE]
+
+
+def build(num_cabs, num_transitions, factory):
+    """
+    Build one history per cab and measure the memory they hold.
+    
+    Returns:
+        int: Bytes allocated for the histories.
+    """
+    gc.collect()
+    tracemalloc.start()
+    start = datetime(2024, 7, 25)
+    histories = []
+    for cab in range(num_cabs):
+        history = factory()
+        for position in range(num_transitions):
+            history.append((start + timedelta(seconds=cab + position * 60), STATES[position % 3]))
+        histories.append(history)
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return used
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cabs', type=int, default=10000)
+    parser.add_argument('--transitions', type=int, nargs='+', default=[1, 10, 100, 1000])
+    args = parser.parse_args()
+
+    quiet_logging()
+    print(f"{'transitions':>12} {'list B/entry':>14} {'compact B/entry':>16} {'ratio':>7}")
+    for num_transitions in args.transitions:
+        num_cabs = max(1, args.cabs // num_transitions)
+        entries = num_cabs * num_transitions
+        list_bytes = build(num_cabs, num_transitions, list)
+        compact_bytes = build(num_cabs, num_transitions, CompactHistory)
+        print(f"{num_transitions:>12} {list_bytes / entries:>14.1f} {compact_bytes / entries:>16.1f} "
+              f"{list_bytes / compact_bytes:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
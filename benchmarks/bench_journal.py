@@ -0,0 +1,81 @@
+"""
+Measure what the event journal adds to a book + end cycle, and how fast a
+journal replays.
+
+Modes:
+    off          no journal attached
+    group        journal attached, fsync once per group commit
+    no-fsync     journal attached, groups written without fsync
+    sync-each    group commit, but the caller waits for durability after every booking
+
+Usage:
+    python benchmarks/bench_journal.py [--cabs 10000] [--bookings 20000] [--pause-gc]
+"""
+
+import argparse
+import gc
+import os
+import tempfile
+import time
+
+from common import gc_paused, quiet_logging, reset_managers, timed
+from cab_management.journal import Journal, replay
+
+MODES = ['off', 'group', 'no-fsync', 'sync-each']
+
+
+def run(mode, path, num_cabs, num_bookings):
+    """
+    Book and end num_bookings trips with the given journal mode.
+
+    Returns:
+        tuple: Mean seconds per book + end cycle, and the journal (None when off).
+    """
+    cab_manager, city_manager, booking_manager = reset_managers()
+    journal = None
+    if mode != 'off':
+        if os.path.exists(path):
+            os.remove(path)
+        journal = Journal(path, fsync=(mode != 'no-fsync')).attach()
+    city_manager.addCity(1, "City 1")
+    cab_manager.registerCabs((cab_id, 1) for cab_id in range(1, num_cabs + 1))
+    gc.collect()
+    start = time.perf_counter()
+    for _ in range(num_bookings):
+        booking_id = booking_manager.bookCab(1)
+        booking_manager.endBooking(booking_id)
+        if mode == 'sync-each':
+            journal.sync()
+    elapsed = time.perf_counter() - start
+    if journal is not None:
+        journal.close()
+    return elapsed / num_bookings, journal
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cabs', type=int, default=10000)
+    parser.add_argument('--bookings', type=int, default=20000)
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES)
+    parser.add_argument('--pause-gc', action='store_true', help="disable the garbage collector while replaying")
+    args = parser.parse_args()
+
+    quiet_logging()
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{'mode':>10} {'us/booking':>11} {'records':>9} {'groups':>8}")
+        for mode in args.modes:
+            path = os.path.join(directory, f"{mode}.journal")
+            per_booking, journal = run(mode, path, args.cabs, args.bookings)
+            records = journal.durable if journal else 0
+            groups = journal.groups if journal else 0
+            print(f"{mode:>10} {per_booking * 1e6:>11.1f} {records:>9} {groups:>8}")
+
+        path = os.path.join(directory, 'group.journal')
+        if os.path.exists(path):
+            with gc_paused(args.pause_gc):
+                counts, seconds = timed(replay, path)
+            print(f"\nreplayed {counts['events']} events in {seconds:.2f}s ({counts['events'] / seconds:.0f} events/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Compare load_initial_data, which parses the whole JSON document at once, with
+stream_initial_data on the same records as JSON and as NDJSON.
+
+For each loader the table shows the throughput and the peak memory allocated
+on top of the loaded fleet itself, i.e. the parsed document or chunk buffers.
+
+Usage:
+    python benchmarks/bench_loader.py [--cabs 100000] [--bookings 100000] [--cities 100] [--pause-gc]
+"""
+
+import argparse
+import gc
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from common import gc_paused, quiet_logging, reset_managers
+from cab_management.utils import load_initial_data, stream_initial_data
+
+
+def iter_records(num_cabs, num_bookings, num_cities):
+    """
+    Yield (section, record) pairs for a synthetic fleet, every booking completed.
+    """
+    for city_id in range(1, num_cities + 1):
+        yield 'cities', {"cityId": city_id, "name": f"City {city_id}"}
+    for cab_id in range(1, num_cabs + 1):
+        yield 'cabs', {"cabId": cab_id, "cabState": "IDLE", "cityId": cab_id % num_cities + 1}
+    start = datetime(2024, 7, 25)
+    for position in range(num_bookings):
+        cab_id = position % num_cabs + 1
+        start_time = start + timedelta(minutes=position // num_cabs * 60)
+        yield 'bookings', {"cabId": cab_id, "cityId": cab_id % num_cities + 1,
+                           "start_time": start_time.isoformat(),
+                           "end_time": (start_time + timedelta(minutes=30)).isoformat()}
+
+
+def write_files(directory, num_cabs, num_bookings, num_cities):
+    """
+    Write the synthetic fleet as fleet.json and fleet.ndjson.
+
+    Returns:
+        tuple: The JSON and NDJSON paths.
+    """
+    json_path = os.path.join(directory, 'fleet.json')
+    ndjson_path = os.path.join(directory, 'fleet.ndjson')
+    data = {'cities': [], 'cabs': [], 'bookings': []}
+    with open(ndjson_path, 'w') as file:
+        for section, record in iter_records(num_cabs, num_bookings, num_cities):
+            data[section].append(record)
+            file.write(json.dumps(record) + "\n")
+    with open(json_path, 'w') as file:
+        json.dump(data, file)
+    return json_path, ndjson_path
+
+
+def measure(loader, path, pause_gc=False):
+    """
+    Load a file into fresh managers.
+
+    Returns:
+        tuple: Elapsed seconds and peak bytes allocated beyond what the managers keep.
+    """
+    reset_managers()
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    with gc_paused(pause_gc):
+        loader(path)
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak - current
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cabs', type=int, default=100000)
+    parser.add_argument('--bookings', type=int, default=100000)
+    parser.add_argument('--cities', type=int, default=100)
+    parser.add_argument('--pause-gc', action='store_true', help="disable the garbage collector while loading")
+    args = parser.parse_args()
+
+    quiet_logging()
+    rows = args.cities + args.cabs + args.bookings
+    with tempfile.TemporaryDirectory() as directory:
+        json_path, ndjson_path = write_files(directory, args.cabs, args.bookings, args.cities)
+        print(f"{'loader':>22} {'seconds':>9} {'rows/s':>10} {'extra peak MB':>14}")
+        for name, loader, path in (("load_initial_data", load_initial_data, json_path),
+                                   ("stream (json)", stream_initial_data, json_path),
+                                   ("stream (ndjson)", stream_initial_data, ndjson_path)):
+            elapsed, extra = measure(loader, path, args.pause_gc)
+            print(f"{name:>22} {elapsed:>9.2f} {rows / elapsed:>10.0f} {extra / 2**20:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Compare bookCab latency under the logging modes.
+
+    sync:        INFO records formatted and written on the request thread (the old default)
+    production:  INFO records queued to a listener thread, per-transition events sampled
+    warning:     only WARNING and above are emitted
+
+Log output goes to os.devnull so that terminal speed does not skew results.
+
+Usage:
+    python benchmarks/bench_logging.py [--cabs 10000] [--bookings 5000]
+"""
+
+import argparse
+import gc
+import logging
+import os
+import time
+
+from common import build_fleet, percentile
+from cab_management.logging_config import configureLogging, stopLogging
+
+MODES = {
+    'sync': dict(level=logging.INFO, production=False),
+    'production': dict(level=logging.INFO, production=True),
+    'warning': dict(level=logging.WARNING, production=False),
+}
+
+
+def run(num_cabs, num_bookings, mode):
+    """
+    Book and end num_bookings trips with the given logging mode.
+    
+    Returns:
+        list: bookCab latencies in seconds.
+    """
+    logging.disable(logging.CRITICAL)
+    _, _, booking_manager = build_fleet(num_cabs)
+    logging.disable(logging.NOTSET)
+    devnull = open(os.devnull, 'w')
+    configureLogging(handlers=[logging.StreamHandler(devnull)], **MODES[mode])
+    gc.collect()
+    latencies = []
+    for _ in range(num_bookings):
+        start = time.perf_counter()
+        booking_id = booking_manager.bookCab(1)
+        latencies.append(time.perf_counter() - start)
+        booking_manager.endBooking(booking_id)
+    stopLogging()
+    devnull.close()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cabs', type=int, default=10000)
+    parser.add_argument('--bookings', type=int, default=5000)
+    args = parser.parse_args()
+
+    print(f"{'mode':>12} {'mean (us)':>12} {'p50 (us)':>12} {'p99 (us)':>12}")
+    for mode in MODES:
+        latencies = run(args.cabs, args.bookings, mode)
+        mean = sum(latencies) / len(latencies)
+        print(f"{mode:>12} {mean * 1e6:>12.1f} {percentile(latencies, 50) * 1e6:>12.1f} {percentile(latencies, 99) * 1e6:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
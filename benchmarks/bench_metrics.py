@@ -0,0 +1,72 @@
+"""
+Measure the per-call overhead of MetricsRegistry on instrumented operations.
+
+Each operation is called --calls times with metrics detached and again with
+metrics attached, alternating --rounds times, and the best time per call of
+each mode is compared. Detached, the original methods are in place, so that
+column is the cost of the operation itself. The time to render the
+Prometheus text is printed as well.
+
+Usage:
+    python benchmarks/bench_metrics.py [--cabs 100000] [--calls 20000] [--rounds 5]
+"""
+
+import argparse
+import time
+from datetime import datetime
+
+from common import build_fleet, quiet_logging
+from cab_management.analytics import Analytics
+from cab_management.metrics import MetricsRegistry
+
+START = datetime(2024, 1, 1)
+
+
+def per_call(func, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter() - start) / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cabs', type=int, default=100000)
+    parser.add_argument('--cities', type=int, default=100)
+    parser.add_argument('--calls', type=int, default=20000)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    quiet_logging()
+    cab_manager, _, booking_manager = build_fleet(args.cabs, args.cities)
+    cab = cab_manager.getCab(1)
+
+    def book_and_end():
+        booking_manager.endBooking(booking_manager.bookCab(1))
+
+    operations = (
+        ('findBestCab', lambda: booking_manager.findBestCab(1)),
+        ('bookCab+endBooking', book_and_end),
+        ('calculateIdleTime', lambda: Analytics.calculateIdleTime(cab, START, None)),
+    )
+    registry = MetricsRegistry()
+    print(f"{'op':>20} {'detached (ns)':>14} {'attached (ns)':>14} {'overhead (ns)':>14}")
+    for name, func in operations:
+        best = {False: float('inf'), True: float('inf')}
+        for _ in range(args.rounds):
+            for attached in (False, True):
+                if attached:
+                    registry.attach()
+                try:
+                    best[attached] = min(best[attached], per_call(func, args.calls))
+                finally:
+                    registry.detach()
+        print(f"{name:>20} {best[False] * 1e9:>14.0f} {best[True] * 1e9:>14.0f} {(best[True] - best[False]) * 1e9:>14.0f}")
+
+    start = time.perf_counter()
+    text = registry.toPrometheus()
+    print(f"\nPrometheus text: {len(text.splitlines())} lines in {(time.perf_counter() - start) * 1e3:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Report the memory used per cab and per booking by the slotted domain models,
+compared with the same classes rebuilt without __slots__ (one __dict__ per
+instance, as before).
+
+Usage:
+    python benchmarks/bench_model_memory.py [--counts 100000 1000000]
+"""
+
+import argparse
+import gc
+import tracemalloc
+
+from common import quiet_logging
+from cab_management.booking import Booking
+from cab_management.cab import Cab
+from cab_management.city import City
+
+
+def without_slots(cls):
+    """
+    Build a copy of cls whose instances store their attributes in a __dict__.
+    """
+    namespace = {name: value for name, value in vars(cls).items()
+                 if name not in getattr(cls, '__slots__', ()) and name not in ('__slots__', '__dict__', '__weakref__')}
+    return type(cls.__name__, cls.__bases__, namespace)
+
+
+def measure(factory, count):
+    """
+    Create count objects with factory and measure the memory they hold.
+    
+    Returns:
+        float: Bytes per object.
+    """
+    gc.collect()
+    tracemalloc.start()
+    objects = [factory(position) for position in range(count)]
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+    return used / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--counts', type=int, nargs='+', default=[100000, 1000000])
+    args = parser.parse_args()
+
+    quiet_logging()
+    city = City(1, "City 1")
+    cab = Cab(1, 1)
+    models = {
+        'cab': (Cab, lambda cls: lambda position: cls(position, 1)),
+        'booking': (Booking, lambda cls: lambda position: cls(cab, city)),
+    }
+
+    print(f"{'model':>8} {'count':>10} {'__dict__ B':>12} {'__slots__ B':>12} {'saved':>8}")
+    for count in args.counts:
+        for name, (cls, make_factory) in models.items():
+            before = measure(make_factory(without_slots(cls)), count)
+            after = measure(make_factory(cls), count)
+            print(f"{name:>8} {count:>10} {before:>12.1f} {after:>12.1f} {1 - after / before:>8.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Compare registering a fleet one cab at a time with CabManager.registerCab
+against a single CabManager.registerCabs call.
+
+Usage:
+    python benchmarks/bench_register_cabs.py [--sizes 10000 100000 1000000] [--cities 100] [--pause-gc]
+"""
+
+import argparse
+import gc
+
+from common import gc_paused, quiet_logging, reset_managers, timed
+
+
+def register_one_by_one(cab_manager, num_cabs, num_cities):
+    for cab_id in range(1, num_cabs + 1):
+        cab_manager.registerCab(cab_id, cab_id % num_cities + 1)
+
+
+def register_bulk(cab_manager, num_cabs, num_cities):
+    cab_manager.registerCabs((cab_id, cab_id % num_cities + 1) for cab_id in range(1, num_cabs + 1))
+
+
+def measure(register, num_cabs, num_cities, pause_gc=False):
+    """
+    Register num_cabs cabs into fresh managers.
+
+    Returns:
+        float: Elapsed seconds.
+    """
+    cab_manager, city_manager, _ = reset_managers()
+    for city_id in range(1, num_cities + 1):
+        city_manager.addCity(city_id, f"City {city_id}")
+    gc.collect()
+    with gc_paused(pause_gc):
+        _, elapsed = timed(register, cab_manager, num_cabs, num_cities)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--cities', type=int, default=100)
+    parser.add_argument('--pause-gc', action='store_true', help="disable the garbage collector while registering")
+    args = parser.parse_args()
+
+    quiet_logging()
+    print(f"{'cabs':>10} {'registerCab (s)':>16} {'registerCabs (s)':>17} {'speedup':>8}")
+    for num_cabs in args.sizes:
+        single = measure(register_one_by_one, num_cabs, args.cities, args.pause_gc)
+        bulk = measure(register_bulk, num_cabs, args.cities, args.pause_gc)
+        print(f"{num_cabs:>10} {single:>16.2f} {bulk:>17.2f} {single / bulk:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Measure booking throughput of ShardRouter with 1, 2 and 4 worker processes.
+
+Cabs are spread over --cities cities, and the cities are dealt round-robin
+over the shards. Booking requests for random cities are sent in batches of
+--batch, every shard booking its share of a batch in parallel with the
+others. The in-process row books the same batches with BookingManager.bookCabs
+directly. Throughput can only scale while there are idle cores for the
+shards; the number of cores is printed for reference.
+
+Usage:
+    python benchmarks/bench_sharding.py [--cabs 200000] [--bookings 200000] [--batch 2000] [--shards 1 2 4]
+"""
+
+import argparse
+import os
+import random
+import time
+from datetime import datetime
+
+from common import build_fleet, quiet_logging
+from cab_management.sharding import ShardRouter
+
+START = datetime.now().replace(microsecond=0)
+
+
+def batches(args, seed=5):
+    rng = random.Random(seed)
+    requests = [(rng.randint(1, args.cities), START) for _ in range(args.bookings)]
+    return [requests[position:position + args.batch] for position in range(0, len(requests), args.batch)]
+
+
+def in_process(args):
+    _, _, booking_manager = build_fleet(args.cabs, args.cities)
+    began = time.perf_counter()
+    for batch in batches(args):
+        booking_manager.bookCabs(batch)
+    return time.perf_counter() - began
+
+
+def sharded(args, num_shards):
+    with ShardRouter(num_shards) as router:
+        for city_id in range(1, args.cities + 1):
+            router.addCity(city_id, f"City {city_id}")
+        router.registerCabs((cab_id, cab_id % args.cities + 1) for cab_id in range(1, args.cabs + 1))
+        began = time.perf_counter()
+        for batch in batches(args):
+            router.bookCabs(batch)
+        return time.perf_counter() - began
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cabs', type=int, default=200000)
+    parser.add_argument('--cities', type=int, default=64)
+    parser.add_argument('--bookings', type=int, default=200000)
+    parser.add_argument('--batch', type=int, default=2000)
+    parser.add_argument('--shards', type=int, nargs='+', default=[1, 2, 4])
+    args = parser.parse_args()
+
+    quiet_logging()
+    print(f"cores: {os.cpu_count()}")
+    print(f"{'mode':>11} {'seconds':>8} {'bookings/s':>11} {'speedup':>8}")
+    baseline = in_process(args)
+    print(f"{'in-process':>11} {baseline:>8.2f} {args.bookings / baseline:>11.0f} {'-':>8}")
+    single = None
+    for num_shards in args.shards:
+        seconds = sharded(args, num_shards)
+        single = single or seconds
+        print(f"{f'{num_shards} shards':>11} {seconds:>8.2f} {args.bookings / seconds:>11.0f} {single / seconds:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
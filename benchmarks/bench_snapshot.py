@@ -0,0 +1,59 @@
+"""
+Measure snapshot() and restore() of a fleet with completed bookings.
+
+Every booking moves its cab through RESERVED, ON_TRIP and back to IDLE, so
+each cab's history holds three transitions per booking.
+
+Usage:
+    python benchmarks/bench_snapshot.py [--cabs 100000] [--bookings 1000000] [--cities 100] [--pause-gc]
+"""
+
+import argparse
+import gc
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+from common import build_fleet, gc_paused, quiet_logging, timed
+from cab_management.snapshot import restore, snapshot
+
+
+def add_bookings(cab_manager, booking_manager, num_cabs, num_bookings):
+    """
+    Book and end num_bookings trips, spread evenly over the cabs.
+    """
+    start = datetime(2024, 7, 25)
+    for position in range(num_bookings):
+        cab = cab_manager.cabs[position % num_cabs + 1]
+        start_time = start + timedelta(minutes=position // num_cabs * 60)
+        booking_id = booking_manager.bookOldCab(cab, cab._city, start_time)
+        booking_manager.endBooking(booking_id, start_time + timedelta(minutes=30))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cabs', type=int, default=100000)
+    parser.add_argument('--bookings', type=int, default=1000000)
+    parser.add_argument('--cities', type=int, default=100)
+    parser.add_argument('--pause-gc', action='store_true', help="disable the garbage collector while restoring")
+    args = parser.parse_args()
+
+    quiet_logging()
+    cab_manager, _, booking_manager = build_fleet(args.cabs, args.cities)
+    add_bookings(cab_manager, booking_manager, args.cabs, args.bookings)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'fleet.snap')
+        gc.collect()
+        _, write_seconds = timed(snapshot, path)
+        size = os.path.getsize(path)
+        gc.collect()
+        with gc_paused(args.pause_gc):
+            _, restore_seconds = timed(restore, path)
+
+    print(f"{'cabs':>10} {'bookings':>10} {'size MB':>9} {'snapshot (s)':>13} {'restore (s)':>12}")
+    print(f"{args.cabs:>10} {args.bookings:>10} {size / 2**20:>9.1f} {write_seconds:>13.2f} {restore_seconds:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Compare book + end throughput in memory and with the SQLite store attached,
+and time the SQL analytics against their in-memory equivalents.
+
+Modes:
+    memory       no store attached
+    batched      SQLite store with the default batch size
+    per-event    SQLite store waking its writer after every event (batchSize=1)
+
+Usage:
+    python benchmarks/bench_sqlite.py [--cabs 10000] [--bookings 20000]
+"""
+
+import argparse
+import gc
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from common import quiet_logging, reset_managers, timed
+from cab_management.analytics import Analytics
+from cab_management.booking_manager import BookingManager
+from cab_management.sqlite_store import DEFAULT_BATCH_SIZE, SQLiteStore
+
+MODES = {'memory': None, 'batched': DEFAULT_BATCH_SIZE, 'per-event': 1}
+
+
+def run(mode, path, num_cabs, num_bookings, num_cities):
+    """
+    Book and end num_bookings trips with the given store mode.
+
+    Returns:
+        tuple: Mean seconds per book + end cycle, and the store (None in memory).
+    """
+    cab_manager, city_manager, booking_manager = reset_managers()
+    for city_id in range(1, num_cities + 1):
+        city_manager.addCity(city_id, f"City {city_id}")
+    cab_manager.registerCabs((cab_id, cab_id % num_cities + 1) for cab_id in range(1, num_cabs + 1))
+    store = None
+    if MODES[mode] is not None:
+        store = SQLiteStore(path, batchSize=MODES[mode]).attach()
+    start_time = datetime(2024, 7, 25)
+    gc.collect()
+    start = time.perf_counter()
+    for position in range(num_bookings):
+        booking_id = booking_manager.bookCab(position % num_cities + 1, start_time + timedelta(seconds=position))
+        booking_manager.endBooking(booking_id)
+    if store is not None:
+        store.flush()
+    elapsed = time.perf_counter() - start
+    return elapsed / num_bookings, store
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cabs', type=int, default=10000)
+    parser.add_argument('--bookings', type=int, default=20000)
+    parser.add_argument('--cities', type=int, default=10)
+    parser.add_argument('--modes', nargs='+', choices=list(MODES), default=list(MODES))
+    args = parser.parse_args()
+
+    quiet_logging()
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{'mode':>10} {'us/booking':>11} {'bookings/s':>11} {'flushes':>8}")
+        for mode in args.modes:
+            path = os.path.join(directory, f"{mode}.db")
+            per_booking, store = run(mode, path, args.cabs, args.bookings, args.cities)
+            flushes = store.flushes if store else 0
+            print(f"{mode:>10} {per_booking * 1e6:>11.1f} {1 / per_booking:>11.0f} {flushes:>8}")
+            if store is not None:
+                store.close()
+
+        if 'batched' in args.modes:
+            store = SQLiteStore(os.path.join(directory, 'batched.db'))
+            bookings = BookingManager.getInstance().getAllBookings()
+            _, python_seconds = timed(Analytics.highDemandCities, bookings)
+            _, sql_seconds = timed(store.highDemandCities)
+            print(f"\nhighDemandCities over {len(bookings)} bookings: "
+                  f"python {python_seconds * 1e3:.1f} ms, sql {sql_seconds * 1e3:.1f} ms")
+            store.connection.close()
+
+
+if __name__ == "__main__":
+    main()
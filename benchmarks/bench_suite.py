@@ -0,0 +1,204 @@
+"""
+Microbenchmark suite for the core operations at several fleet sizes.
+
+For every fleet size the suite measures registerCab, bookCab, endBooking,
+findBestCab, getCabsInCityByState and highDemandCities, and for every
+history length it measures calculateIdleTime and updateCab on a sample of
+cabs whose histories hold that many transitions. Each operation is timed
+call by call and summarized as mean, p50 and p99 latency.
+
+Results are written as JSON to --output, together with the Python version,
+platform and git commit, so that runs of different releases can be compared.
+With --compare, the p50 latencies are checked against an earlier results
+file and the script exits with status 1 if any operation got slower than
+--threshold allows.
+
+Usage:
+    python benchmarks/bench_suite.py [--sizes 1000 100000 1000000] [--history-lengths 1 10 100]
+                                     [--output results.json] [--compare baseline.json]
+"""
+
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+from common import percentile, quiet_logging, reset_managers
+from cab_management.analytics import Analytics
+from cab_management.cab import CabState
+
+NOW = datetime.now().replace(microsecond=0)
+PAST = NOW - timedelta(days=365)  # Registration time, so generated histories stay in the past
+
+
+def measure(func, calls):
+    """
+    Time each call separately.
+
+    Args:
+        func (callable): Called with each element of calls.
+        calls (list): Arguments of the calls.
+
+    Returns:
+        list: Latencies in seconds.
+    """
+    latencies = []
+    for argument in calls:
+        start = time.perf_counter()
+        func(argument)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def summarize(op, cabs, history, latencies):
+    """
+    Build one result row.
+
+    Returns:
+        dict: Operation, fleet size, history length (None if not applicable) and latency statistics.
+    """
+    mean = sum(latencies) / len(latencies)
+    return {'op': op, 'cabs': cabs, 'history': history, 'calls': len(latencies),
+            'mean_us': round(mean * 1e6, 3), 'p50_us': round(percentile(latencies, 50) * 1e6, 3),
+            'p99_us': round(percentile(latencies, 99) * 1e6, 3), 'ops_per_s': round(1 / mean, 1) if mean else None}
+
+
+def build(num_cabs, num_cities):
+    cab_manager, city_manager, booking_manager = reset_managers()
+    for city_id in range(1, num_cities + 1):
+        city_manager.addCity(city_id, f"City {city_id}")
+    cab_manager.registerCabs(((cab_id, cab_id % num_cities + 1) for cab_id in range(1, num_cabs + 1)), PAST)
+    return cab_manager, city_manager, booking_manager
+
+
+def grow_history(cab, length):
+    """
+    Append alternating ON_TRIP and IDLE transitions, one minute apart, until the cab's history holds length entries.
+    """
+    timestamp = PAST
+    while len(cab.history) < length:
+        timestamp += timedelta(minutes=1)
+        cab.setState(CabState.ON_TRIP if cab.state == CabState.IDLE else CabState.IDLE, timestamp)
+
+
+def run_size(num_cabs, args, rng):
+    """
+    Measure every operation on a fleet of num_cabs cabs.
+
+    Returns:
+        list: Result rows.
+    """
+    cab_manager, city_manager, booking_manager = build(num_cabs, args.cities)
+    cities = [rng.randint(1, args.cities) for _ in range(args.ops)]
+    rows = []
+
+    new_ids = range(num_cabs + 1, num_cabs + args.ops + 1)
+    rows.append(summarize('registerCab', num_cabs, None, measure(
+        lambda cab_id: cab_manager.registerCab(cab_id, cab_id % args.cities + 1), new_ids)))
+
+    rows.append(summarize('findBestCab', num_cabs, None, measure(booking_manager.findBestCab, cities)))
+    rows.append(summarize('getCabsInCityByState', num_cabs, None, measure(
+        lambda city: city_manager.getCabsInCityByState(city, CabState.IDLE), cities)))
+
+    booking_ids = []
+    rows.append(summarize('bookCab', num_cabs, None, measure(
+        lambda city: booking_ids.append(booking_manager.bookCab(city)), cities)))
+    rows.append(summarize('endBooking', num_cabs, None, measure(
+        booking_manager.endBooking, [booking_id for booking_id in booking_ids if booking_id is not None])))
+
+    repeats = [None] * max(1, args.ops // 50)  # Scans every booking, so fewer calls
+    rows.append(summarize('highDemandCities', num_cabs, None, measure(
+        lambda _: Analytics.highDemandCities(booking_manager.getAllBookings()), repeats)))
+    rows.append(summarize('highDemandCities[counters]', num_cabs, None, measure(
+        lambda _: Analytics.highDemandCities(booking_manager.demand), repeats)))
+
+    # Each history length gets its own cabs, so updateCab's transitions at the current time never precede generated ones
+    sample_size = max(1, min(args.sample, num_cabs // len(args.history_lengths)))
+    pool = rng.sample(range(1, num_cabs + 1), sample_size * len(args.history_lengths))
+    for position, length in enumerate(args.history_lengths):
+        sample = [cab_manager.getCab(cab_id) for cab_id in pool[position * sample_size:(position + 1) * sample_size]]
+        for cab in sample:
+            grow_history(cab, length)
+        rows.append(summarize('calculateIdleTime', num_cabs, length, measure(
+            lambda cab: Analytics.calculateIdleTime(cab, PAST, NOW), sample)))
+        rows.append(summarize('updateCab', num_cabs, length, measure(
+            lambda cab: cab_manager.updateCab(cab.cabId, CabState.ON_TRIP if cab.state == CabState.IDLE else CabState.IDLE),
+            sample)))
+    return rows
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path, threshold):
+    """
+    Print the change in p50 latency against a baseline results file.
+
+    Returns:
+        list: Result rows slower than the baseline by more than threshold.
+    """
+    with open(baseline_path) as f:
+        baseline = {(row['op'], row['cabs'], row['history']): row for row in json.load(f)['results']}
+    regressions = []
+    print(f"\n{'op':>27} {'cabs':>8} {'history':>8} {'base p50':>10} {'p50':>10} {'change':>8}")
+    for row in results:
+        before = baseline.get((row['op'], row['cabs'], row['history']))
+        if before is None or not before['p50_us']:
+            continue
+        change = row['p50_us'] / before['p50_us'] - 1
+        flag = ' !' if change > threshold else ''
+        if flag:
+            regressions.append(row)
+        print(f"{row['op']:>27} {row['cabs']:>8} {str(row['history'] or '-'):>8} {before['p50_us']:>10.1f} "
+              f"{row['p50_us']:>10.1f} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000])
+    parser.add_argument('--history-lengths', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--cities', type=int, default=100)
+    parser.add_argument('--ops', type=int, default=1000, help="calls per operation")
+    parser.add_argument('--sample', type=int, default=500, help="cabs per history length")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--compare', help="earlier results file to check for regressions")
+    parser.add_argument('--threshold', type=float, default=0.2, help="allowed p50 slowdown, as a fraction")
+    args = parser.parse_args()
+
+    quiet_logging()
+    rng = random.Random(args.seed)
+    results = []
+    print(f"{'op':>27} {'cabs':>8} {'history':>8} {'mean (us)':>10} {'p50 (us)':>10} {'p99 (us)':>10}")
+    for size in args.sizes:
+        for row in run_size(size, args, rng):
+            results.append(row)
+            print(f"{row['op']:>27} {row['cabs']:>8} {str(row['history'] or '-'):>8} {row['mean_us']:>10.1f} "
+                  f"{row['p50_us']:>10.1f} {row['p99_us']:>10.1f}")
+
+    report = {'created': datetime.now().isoformat(timespec='seconds'), 'commit': git_commit(),
+              'python': platform.python_version(), 'platform': platform.platform(),
+              'settings': {'cities': args.cities, 'ops': args.ops, 'sample': args.sample, 'seed': args.seed},
+              'results': results}
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {len(results)} results to {args.output}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} operations slower than the baseline by more than {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
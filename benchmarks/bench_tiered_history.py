@@ -0,0 +1,97 @@
+"""
+Compare resident history memory and idle-time query latency with and
+without history spilling.
+
+Every cab is driven through RESERVED, ON_TRIP and IDLE once per simulated
+hour, then calculateIdleTime is timed over a recent window (the last day)
+and an old one (the first day).
+
+Usage:
+    python benchmarks/bench_tiered_history.py [--cabs 100] [--transitions 10000] [--chunk 512]
+"""
+
+import argparse
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from common import percentile, quiet_logging
+from cab_management.analytics import Analytics
+from cab_management.cab import Cab, CabState
+from cab_management.tiered_history import HistorySegments, TieredHistory
+
+STATES = [CabState.RESERVED, CabState.ON_TRIP, CabState.IDLE]
+START = datetime(2024, 1, 1)
+
+
+def build(num_cabs, transitions, segments):
+    """
+    Create cabs with long histories, tiered when segments is given.
+
+    Returns:
+        list: The cabs.
+    """
+    cabs = []
+    for cab_id in range(num_cabs):
+        cab = Cab.fromRow(cab_id, 1, CabState.IDLE, START)
+        if segments is not None:
+            cab.history = TieredHistory.fromHistory(cab.history, segments)
+        for position in range(transitions):
+            cab._changeState(STATES[position % 3], START + timedelta(minutes=20 * position + 1))
+        cabs.append(cab)
+    return cabs
+
+
+def query(cabs, start, end, repeat=3):
+    """
+    Time calculateIdleTime for every cab, dropping the first pass.
+
+    Returns:
+        list: Seconds per query.
+    """
+    samples = []
+    for _ in range(repeat):
+        for cab in cabs:
+            began = time.perf_counter()
+            Analytics.calculateIdleTime(cab, start, end)
+            samples.append(time.perf_counter() - began)
+    return samples[len(cabs):]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cabs', type=int, default=100)
+    parser.add_argument('--transitions', type=int, default=10000)
+    parser.add_argument('--chunk', type=int, default=512)
+    args = parser.parse_args()
+
+    quiet_logging()
+    end = START + timedelta(minutes=20 * args.transitions)
+    windows = {'recent': (end - timedelta(days=1), end), 'old': (START, START + timedelta(days=1))}
+    print(f"{'mode':>8} {'heap MB':>8} {'disk MB':>8} {'recent p50 us':>14} {'old p50 us':>11}")
+    with tempfile.TemporaryDirectory() as directory:
+        for mode in ('memory', 'tiered'):
+            segments = None
+            if mode == 'tiered':
+                segments = HistorySegments(os.path.join(directory, 'segments'), args.chunk)
+            gc.collect()
+            tracemalloc.start()
+            cabs = build(args.cabs, args.transitions, segments)
+            for cab in cabs:
+                Analytics.calculateIdleTime(cab, *windows['recent'])  # Builds the indexes
+            heap, _ = tracemalloc.get_traced_memory()  # Histories and their indexes
+            tracemalloc.stop()
+            latencies = {name: percentile(query(cabs, *window), 50) for name, window in windows.items()}
+            disk = segments.chunks * segments.chunkSize if segments else 0
+            print(f"{mode:>8} {heap / 2**20:>8.1f} {disk / 2**20:>8.1f} "
+                  f"{latencies['recent'] * 1e6:>14.1f} {latencies['old'] * 1e6:>11.1f}")
+            del cabs
+            if segments is not None:
+                segments.close()
+
+
+if __name__ == "__main__":
+    main()
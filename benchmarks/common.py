@@ -0,0 +1,107 @@
+"""
+Shared helpers for the benchmark scripts.
+"""
+
+from contextlib import contextmanager
+import gc
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from cab_management.cab_manager import CabManager
+from cab_management.city_manager import CityManager
+from cab_management.booking_manager import BookingManager
+
+
+def quiet_logging():
+    """
+    Disable log output so that benchmarks measure the code, not the terminal.
+    """
+    logging.disable(logging.CRITICAL)
+
+
+@contextmanager
+def gc_paused(pause=True):
+    """
+    Disable the cyclic garbage collector while a bulk load runs.
+
+    The library never touches the collector, which is process-wide state.
+    Single-threaded benchmarks can opt in to skip the collections triggered by
+    allocating millions of objects, none of which are garbage.
+
+    Args:
+        pause (bool): Whether to disable the collector at all.
+    """
+    enabled = gc.isenabled()
+    if pause:
+        gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def reset_managers():
+    """
+    Drop the manager singletons and create fresh, empty ones.
+    
+    Returns:
+        tuple: The new CabManager, CityManager and BookingManager instances.
+    """
+    CabManager._instance = None
+    CityManager._instance = None
+    BookingManager._instance = None
+    city_manager = CityManager.getInstance()
+    cab_manager = CabManager.getInstance()
+    booking_manager = BookingManager.getInstance()
+    return cab_manager, city_manager, booking_manager
+
+
+def build_fleet(num_cabs, num_cities=1):
+    """
+    Create fresh managers holding num_cabs idle cabs spread over num_cities cities.
+    
+    Args:
+        num_cabs (int): Number of cabs to register.
+        num_cities (int): Number of cities to spread the cabs over.
+    
+    Returns:
+        tuple: The CabManager, CityManager and BookingManager instances.
+    """
+    cab_manager, city_manager, booking_manager = reset_managers()
+    for city_id in range(1, num_cities + 1):
+        city_manager.addCity(city_id, f"City {city_id}")
+    cab_manager.registerCabs((cab_id, cab_id % num_cities + 1) for cab_id in range(1, num_cabs + 1))
+    return cab_manager, city_manager, booking_manager
+
+
+def percentile(samples, pct):
+    """
+    Get a percentile of a list of samples.
+    
+    Args:
+        samples (list): The measured values.
+        pct (float): The percentile to compute, between 0 and 100.
+    
+    Returns:
+        float: The value at the given percentile.
+    """
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(len(ordered) * pct / 100))
+    return ordered[index]
+
+
+def timed(func, *args, **kwargs):
+    """
+    Call a function and measure how long it took.
+    
+    Returns:
+        tuple: The function result and the elapsed time in seconds.
+    """
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
@@ -0,0 +1,134 @@
+"""
+Load client for the asyncio booking service.
+
+Opens several connections, each pipelining book requests (and ending each
+trip once booked), and reports requests per second and latency percentiles.
+
+Usage:
+    python benchmarks/load_client.py --spawn [--cabs 100000] [--cities 10] [--connections 50] [--requests 20000]
+    python benchmarks/load_client.py --host 127.0.0.1 --port 8765
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+from common import percentile
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+
+class Connection:
+    """
+    A pipelined connection that matches responses to requests by ID.
+    """
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.waiting = {}
+        self.ids = itertools.count(1)
+        self.receiver = asyncio.create_task(self._receive())
+
+    async def _receive(self):
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                break
+            response = json.loads(line)
+            self.waiting.pop(response["id"]).set_result(response)
+
+    async def call(self, request):
+        request_id = next(self.ids)
+        future = asyncio.get_running_loop().create_future()
+        self.waiting[request_id] = future
+        self.writer.write(json.dumps(dict(request, id=request_id)).encode() + b"\n")
+        return await future
+
+    async def close(self):
+        self.writer.close()
+        self.receiver.cancel()
+
+
+async def client(host, port, num_requests, num_cities, window, latencies, seed):
+    reader, writer = await asyncio.open_connection(host, port)
+    connection = Connection(reader, writer)
+    rng = random.Random(seed)
+    semaphore = asyncio.Semaphore(window)
+
+    async def one_trip():
+        async with semaphore:
+            start = time.perf_counter()
+            response = await connection.call({"op": "book", "cityId": rng.randint(1, num_cities)})
+            latencies.append(time.perf_counter() - start)
+            if response.get("ok"):
+                await connection.call({"op": "end", "bookingId": response["bookingId"]})
+
+    await asyncio.gather(*(one_trip() for _ in range(num_requests)))
+    await connection.close()
+
+
+async def wait_for_port(host, port, timeout=120):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+            writer.close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.2)
+
+
+async def run(args):
+    per_connection = args.requests // args.connections
+    latencies = []
+    await wait_for_port(args.host, args.port)
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        client(args.host, args.port, per_connection, args.cities, args.window, latencies, seed)
+        for seed in range(args.connections)
+    ))
+    elapsed = time.perf_counter() - start
+
+    print(f"requests:  {len(latencies)}")
+    print(f"req/s:     {len(latencies) / elapsed:.0f}")
+    print(f"p50 (ms):  {percentile(latencies, 50) * 1e3:.2f}")
+    print(f"p99 (ms):  {percentile(latencies, 99) * 1e3:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--spawn', action='store_true', help="Start a local service with a synthetic fleet")
+    parser.add_argument('--cabs', type=int, default=100000)
+    parser.add_argument('--cities', type=int, default=10)
+    parser.add_argument('--connections', type=int, default=50)
+    parser.add_argument('--window', type=int, default=8, help="Requests in flight per connection")
+    parser.add_argument('--requests', type=int, default=20000)
+    args = parser.parse_args()
+
+    service = None
+    if args.spawn:
+        service = subprocess.Popen(
+            [sys.executable, "-m", "cab_management.service", "--host", args.host, "--port", str(args.port),
+             "--cabs", str(args.cabs), "--cities", str(args.cities)],
+            cwd=SRC_DIR,
+        )
+    try:
+        asyncio.run(run(args))
+    finally:
+        if service is not None:
+            service.terminate()
+            service.wait()
+
+
+if __name__ == "__main__":
+    main()
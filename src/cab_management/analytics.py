@@ -2,9 +2,13 @@
 Analytics Module
 """
 
-from datetime import datetime, timedelta
+from datetime import datetime
 import logging
-from .cab import Cab, CabState
+from .booking_columns import BookingColumns
+from .cab_manager import CabManager
+from .demand_counters import DemandCounters
+from .cab import CabState
+from .fleet_report import buildFleetReport
 
 logger = logging.getLogger('cab_management.analytics')
 
@@ -17,6 +21,10 @@ class Analytics:
     def calculateIdleTime(cab, start_time, end_time):
         """
         Calculate the total idle time of a cab between start_time and end_time.
+
+        Idle time is the time the cab actually spent in the IDLE state within the
+        window: each IDLE period is clipped to the window, and a cab that is idle
+        now counts until end_time. Time spent ON_TRIP or RESERVED is never counted.
         
         Args:
             cab (Cab): The cab whose idle time is to be calculated.
@@ -25,37 +33,77 @@ class Analytics:
         
         Returns:
             int: The total idle time in seconds.
+
+        Raises:
+            ValueError: If start_time or end_time is neither a datetime nor an ISO format string.
         """
+        idle_time_seconds = Analytics.calculateStateTime(cab, CabState.IDLE, start_time, end_time)
+        logger.info("Calculated idle time for cab %s: %s seconds", cab.cabId, idle_time_seconds)
+        return idle_time_seconds
+
+    @staticmethod
+    def calculateStateTime(cab, state, start_time, end_time):
+        """
+        Calculate the total time a cab spent in a given state between start_time and end_time.
+
+        The query is answered from the cab's history index with two bisects and
+        a subtraction, however long the history is. Windows reaching into the
+        spilled part of a TieredHistory also read one sealed chunk per bound.
+        
+        Args:
+            cab (Cab): The cab whose state time is to be calculated.
+            state (Union[CabState, str]): The state to measure, can be a CabState or a string.
+            start_time (datetime): The start time of the period. If None or minimum, the first recorded time in history is used.
+            end_time (datetime): The end time of the period. If None, the current time is used.
+        
+        Returns:
+            int: The total time spent in the state in seconds.
+
+        Raises:
+            ValueError: If start_time or end_time is neither a datetime nor an ISO format string.
+        """
+        if isinstance(state, str):
+            state = CabState[state]
+
         if start_time is None or start_time == datetime.min:
             # If start_time is None or minimum, start from the first recorded time in history
-            history = cab.getHistory()
-            if history:
-                start_time = history[0][0]
-                logger.warning("Start time is None or minimum, setting it to the first recorded time in history.")
-            else:
-                logger.warning("No history available, setting start_time to datetime.min.")
-                start_time = datetime.min
+            logger.warning("Start time is None or minimum, setting it to the first recorded time in history.")
+            start_time = None
 
         if end_time is None:
             end_time = datetime.now()
             logger.warning("End time is None, setting it to datetime.now()")
 
-        total_idle_time = timedelta(0)
-        previous_time = start_time
+        state_time = cab.getHistoryIndex().timeInState(state, start_time, end_time)
+        state_time_seconds = int(state_time.total_seconds())
+        logger.debug("Calculated %s time for cab %s: %s seconds", state.value, cab.cabId, state_time_seconds)
+        return state_time_seconds
+
+    @staticmethod
+    def fleetIdleReport(start_time, end_time, city=None):
+        """
+        Calculate the idle, on-trip and reserved time of every cab between start_time and end_time.
 
-        logger.debug(f"Calculating idle time for cab {cab.cabId}")
-        for time, state in cab.getHistory():
-            if isinstance(time, datetime) and state == CabState.IDLE:
-                if previous_time < time <= end_time:
-                    total_idle_time += time - previous_time
-                previous_time = time
+        All histories are read in one pass (see fleet_report) instead of one
+        calculateStateTime call per cab, and only the summary is logged.
         
-        if previous_time < end_time and cab.getState() == CabState.IDLE:
-            total_idle_time += end_time - previous_time
+        Args:
+            start_time (datetime): The start time of the period. If None or minimum, each cab's first recorded time is used.
+            end_time (datetime): The end time of the period. If None, the current time is used.
+            city (int, optional): Only report on the cabs currently in the city with this ID.
         
-        idle_time_seconds = int(total_idle_time.total_seconds())
-        logger.info(f"Calculated idle time for cab {cab.cabId}: {idle_time_seconds} seconds")
-        return idle_time_seconds
+        Returns:
+            FleetReport: Seconds per state for each cab, and summed per city.
+
+        Raises:
+            ValueError: If start_time or end_time is neither a datetime nor an ISO format string.
+        """
+        cabs = CabManager.getInstance().cabs.values()
+        if city is not None:
+            cabs = [cab for cab in cabs if cab.cityId == city]
+        report = buildFleetReport(list(cabs), start_time, end_time)
+        logger.info("Fleet idle report for %s cabs in %s cities", len(report), len(report.cities))
+        return report
 
     @staticmethod
     def getCabHistory(cab):
@@ -70,21 +118,31 @@ class Analytics:
         """
         history = cab.getHistory()
         bookings = cab.getBookings()
-        logger.info(f"Retrieved history for cab {cab.cabId}: {history}")
-        logger.info(f"Bookings for cab {cab.cabId}: {bookings}")
+        logger.info("Retrieved history for cab %s: %s", cab.cabId, history)
+        logger.info("Bookings for cab %s: %s", cab.cabId, bookings)
         return history, bookings
 
     @staticmethod
     def highDemandCities(bookings):
         """
         Find the city with the highest demand for cabs and the peak time.
+
+        Given BookingColumns (see BookingManager.enableBookingColumns), the answer
+        is computed from the columns with bincount instead of a loop over bookings.
+        Given DemandCounters (see BookingManager.demand), it is read from the
+        running counts in O(cities + 24).
         
         Args:
-            bookings (list): List of all bookings.
+            bookings (Union[list, BookingColumns, DemandCounters]): List of all bookings, or a view of them.
         
         Returns:
             tuple: City with the highest demand and the peak time.
         """
+        if isinstance(bookings, (BookingColumns, DemandCounters)):
+            high_demand_city, peak_time = bookings.highDemandCities()
+            logger.info("High demand city: %s, Peak time: %s", high_demand_city, peak_time)
+            return high_demand_city, peak_time
+
         city_demand = {}
         time_demand = {}
 
@@ -93,14 +151,14 @@ class Analytics:
             try:
                 booking_time = datetime.fromisoformat(booking.getStartTime()).hour
             except ValueError as e:
-                logger.error(f"Error parsing booking start time: {e}")
+                logger.error("Error parsing booking start time: %s", e)
                 continue
             except TypeError:
                 booking_time = booking.getStartTime()
                 if isinstance(booking_time, datetime):
                     booking_time = booking_time.hour
                 else:
-                    logger.error(f"Invalid start time type: {type(booking_time)} for booking ID: {booking.bookingId}")
+                    logger.error("Invalid start time type: %s for booking ID: %s", type(booking_time), booking.bookingId)
                     continue
 
             if city not in city_demand:
@@ -114,5 +172,27 @@ class Analytics:
         high_demand_city = max(city_demand, key=city_demand.get)
         peak_time = max(time_demand, key=time_demand.get)
 
-        logger.info(f"High demand city: {high_demand_city.name}, Peak time: {peak_time}")
+        logger.info("High demand city: %s, Peak time: %s", high_demand_city.name, peak_time)
         return high_demand_city.name, peak_time
+
+    @staticmethod
+    def demandHistograms(bookings):
+        """
+        Count bookings per city and per start hour.
+
+        Bookings whose start time cannot be interpreted are left out, as in highDemandCities.
+        
+        Args:
+            bookings (Union[list, BookingColumns, DemandCounters]): List of all bookings, or a view of them.
+        
+        Returns:
+            tuple: Dictionary mapping city names to booking counts, and a list of 24 booking counts
+                indexed by start hour.
+        """
+        if not isinstance(bookings, (BookingColumns, DemandCounters)):
+            bookings = BookingColumns(bookings)
+        city_counts, hour_counts = bookings.histograms()[:2]
+        by_name = {}
+        for city, count in city_counts.items():
+            by_name[city.name] = by_name.get(city.name, 0) + count
+        return by_name, hour_counts
@@ -0,0 +1,194 @@
+"""
+Analytics Cache Module
+
+Result cache in front of Analytics for dashboards that repeat the same
+queries. Every entry is stored with the version of the data it was computed
+from: BookingManager.version for demand queries, Cab.version for per-cab
+queries, City.version for per-city reports and Cab.fleetVersion for
+fleet-wide reports. Those versions are renewed whenever the data changes,
+so an entry is reused exactly until its data changes. Entries are evicted
+least recently used first once the cache is full.
+"""
+
+from collections import OrderedDict
+import logging
+import threading
+from .analytics import Analytics
+from .booking_manager import BookingManager
+from .cab import Cab, CabState
+from .city_manager import CityManager
+
+logger = logging.getLogger('cab_management.analytics_cache')
+
+
+class AnalyticsCache:
+    """
+    Least recently used cache of analytics results, invalidated by version numbers.
+
+    Queries whose window ends at the current time (end_time None) depend on
+    the clock and are computed without caching.
+
+    Attributes:
+        maxEntries (int): Number of results kept before the least recently used one is evicted.
+        hits (int): Number of queries answered from the cache.
+        misses (int): Number of queries computed, including stale ones.
+        stale (int): Number of misses for entries whose data had changed since they were computed.
+        evictions (int): Number of entries evicted to make room.
+        uncached (int): Number of queries computed without caching.
+    """
+    def __init__(self, maxEntries=1024):
+        if maxEntries < 1:
+            raise ValueError(f"maxEntries must be positive, got {maxEntries}")
+        self.maxEntries = maxEntries
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+        self.uncached = 0
+        self._entries = OrderedDict()  # key -> (version, result), least recently used first
+        self._lock = threading.Lock()
+
+    def get(self, key, version, compute):
+        """
+        Get a cached result, computing and storing it if missing or out of date.
+
+        Args:
+            key (tuple): Hashable query arguments.
+            version: Version of the data the result depends on, read before computing.
+            compute (callable): Called without arguments to compute the result.
+
+        Returns:
+            The result.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] == version:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                self.stale += 1
+            self.misses += 1
+        result = compute()  # Outside the lock, so slow queries do not block other lookups
+        with self._lock:
+            self._entries[key] = (version, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxEntries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return result
+
+    def highDemandCities(self):
+        """
+        Find the city with the highest demand for cabs and the peak time, from BookingManager's bookings.
+
+        Returns:
+            tuple: City with the highest demand and the peak time.
+        """
+        booking_manager = BookingManager.getInstance()
+        return self.get(('highDemandCities',), booking_manager.version,
+                        lambda: Analytics.highDemandCities(booking_manager.demand))
+
+    def demandHistograms(self):
+        """
+        Count BookingManager's bookings per city and per start hour.
+
+        Returns:
+            tuple: Dictionary mapping city names to booking counts, and a list of 24 booking counts.
+        """
+        booking_manager = BookingManager.getInstance()
+        return self.get(('demandHistograms',), booking_manager.version,
+                        lambda: Analytics.demandHistograms(booking_manager.demand))
+
+    def calculateIdleTime(self, cab, start_time, end_time):
+        """
+        Calculate the total idle time of a cab between start_time and end_time.
+
+        Args:
+            cab (Cab): The cab whose idle time is to be calculated.
+            start_time (datetime): The start time of the period.
+            end_time (datetime): The end time of the period. If None, the current time is used.
+
+        Returns:
+            int: The total idle time in seconds.
+        """
+        return self.calculateStateTime(cab, CabState.IDLE, start_time, end_time)
+
+    def calculateStateTime(self, cab, state, start_time, end_time):
+        """
+        Calculate the total time a cab spent in a given state between start_time and end_time.
+
+        Args:
+            cab (Cab): The cab whose state time is to be calculated.
+            state (Union[CabState, str]): The state to measure.
+            start_time (datetime): The start time of the period.
+            end_time (datetime): The end time of the period. If None, the current time is used.
+
+        Returns:
+            int: The total time spent in the state in seconds.
+        """
+        if isinstance(state, str):
+            state = CabState[state]
+        compute = lambda: Analytics.calculateStateTime(cab, state, start_time, end_time)
+        if end_time is None:
+            return self._uncached(compute)
+        return self.get(('stateTime', cab.cabId, state, start_time, end_time), cab.version, compute)
+
+    def fleetIdleReport(self, start_time, end_time, city=None):
+        """
+        Calculate the idle, on-trip and reserved time of every cab between start_time and end_time.
+
+        Reports for one city are invalidated by changes to the cabs held by that city only.
+
+        Args:
+            start_time (datetime): The start time of the period.
+            end_time (datetime): The end time of the period. If None, the current time is used.
+            city (int, optional): Only report on the cabs currently in the city with this ID.
+
+        Returns:
+            FleetReport: Seconds per state for each cab, and summed per city.
+        """
+        compute = lambda: Analytics.fleetIdleReport(start_time, end_time, city)
+        if end_time is None:
+            return self._uncached(compute)
+        city_obj = CityManager.getInstance().cities.get(city) if city is not None else None
+        version = city_obj.version if city_obj is not None else Cab.fleetVersion
+        return self.get(('fleetIdleReport', start_time, end_time, city), version, compute)
+
+    def _uncached(self, compute):
+        with self._lock:
+            self.uncached += 1
+        return compute()
+
+    def hitRate(self):
+        """
+        Get the share of cacheable queries answered from the cache.
+
+        Returns:
+            float: Hits divided by hits plus misses, 0.0 before the first query.
+        """
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def getStats(self):
+        """
+        Get the cache metrics.
+
+        Returns:
+            dict: Entry count, hits, misses, stale misses, evictions, uncached queries and hit rate.
+        """
+        with self._lock:
+            stats = {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses, 'stale': self.stale,
+                     'evictions': self.evictions, 'uncached': self.uncached}
+        stats['hitRate'] = self.hitRate()
+        return stats
+
+    def clear(self):
+        """
+        Drop every cached result, keeping the metrics.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -4,6 +4,7 @@ Booking Module
 
 from datetime import datetime
 from enum import Enum
+import threading
 from .city import City
 from .city_manager import CityManager
 
@@ -27,12 +28,16 @@ class Booking:
         start_time (datetime): The timestamp when the trip starts.
         end_time (datetime): The timestamp when the trip ends.
     """
+    __slots__ = ('bookingId', 'cab', 'city', 'state', 'start_time', 'end_time')
+
     _booking_counter = 0
+    _booking_counter_lock = threading.Lock()
 
     @classmethod
     def _get_next_booking_id(cls):
-        cls._booking_counter += 1
-        return cls._booking_counter
+        with cls._booking_counter_lock:
+            cls._booking_counter += 1
+            return cls._booking_counter
 
     def __init__(self, cab, city, state=BookingState.BOOKED, start_time=None, end_time=None):
         self.bookingId = Booking._get_next_booking_id()
@@ -54,6 +59,31 @@ class Booking:
         self.start_time = start_time if start_time else datetime.now()
         self.end_time = end_time
 
+    @classmethod
+    def fromRow(cls, bookingId, cab, city, state, start_time, end_time):
+        """
+        Recreate a stored booking without drawing a new booking ID.
+        
+        Args:
+            bookingId (int): The ID the booking was created with.
+            cab (Cab): The cab assigned for the booking.
+            city (City): The city where the booking was made.
+            state (BookingState): The current state of the booking.
+            start_time (datetime): The timestamp when the trip started.
+            end_time (datetime): The timestamp when the trip ended, or None.
+        
+        Returns:
+            Booking: The booking.
+        """
+        booking = cls.__new__(cls)
+        booking.bookingId = bookingId
+        booking.cab = cab
+        booking.city = city
+        booking.state = state
+        booking.start_time = start_time
+        booking.end_time = end_time
+        return booking
+
     def change_state(self, new_state):
         """
         Change the state of the booking.
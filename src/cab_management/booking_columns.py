@@ -0,0 +1,200 @@
+"""
+Booking Columns Module
+
+Columnar view of the bookings for demand analytics: one row per booking
+holding the index of its city and its start time, parsed once when the
+booking is added. Rows live in typed arrays from the array module. When
+NumPy is installed the histograms are computed with bincount over zero-copy
+views of the arrays; otherwise they fall back to collections.Counter, which
+also counts in C.
+"""
+
+from array import array
+from collections import Counter
+from datetime import datetime, timedelta
+import logging
+import sys
+import threading
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+logger = logging.getLogger('cab_management.booking_columns')
+
+HOURS = 24
+NO_TIME = -2**63  # Start time of bookings whose start time cannot be interpreted
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+_MICROS_PER_HOUR = 3600 * 10**6
+
+
+def wallMicros(start_time):
+    """
+    Convert a booking start time to wall-clock microseconds since the epoch.
+
+    Start times are interpreted like Analytics.highDemandCities does: ISO
+    format strings are parsed, datetimes are used as they are, and the wall
+    clock of timezone-aware values is kept, so the hour of the result is the
+    hour of the original value.
+
+    Args:
+        start_time (Union[datetime, str]): The start time of a booking.
+
+    Returns:
+        int: Microseconds since 1970-01-01 on the wall clock, or None if the start time cannot be interpreted.
+    """
+    if isinstance(start_time, str):
+        try:
+            start_time = datetime.fromisoformat(start_time)
+        except ValueError:
+            return None
+    elif not isinstance(start_time, datetime):
+        return None
+    return (start_time.replace(tzinfo=None) - _EPOCH) // _MICROSECOND
+
+
+class BookingColumns:
+    """
+    Columnar store of booking city and start time.
+
+    Attributes:
+        cities (list): City object of every city index, in order of first booking.
+        cityIndexes (array): City index of each booking.
+        startTimes (array): Start time of each booking in wall-clock microseconds since the epoch,
+            NO_TIME if it cannot be interpreted.
+        hours (array): Start hour of each booking, -1 if the start time cannot be interpreted.
+        invalid (int): Number of bookings whose start time cannot be interpreted.
+    """
+    def __init__(self, bookings=()):
+        self.cities = []
+        self.cityIndexes = array('q')
+        self.startTimes = array('q')
+        self.hours = array('b')
+        self.invalid = 0
+        self._cityIndex = {}  # City -> city index
+        self._cityFirstRows = []  # First row with a usable start time per city index, or None
+        self._hourFirstRows = [None] * HOURS  # First row per hour, or None
+        self._lock = threading.Lock()  # Keeps the columns aligned when bookings are added concurrently
+        self.extend(bookings)
+
+    def add(self, booking):
+        """
+        Add a booking.
+
+        Args:
+            booking (Booking): The booking to add.
+        """
+        micros = wallMicros(booking.start_time)
+        with self._lock:
+            self._append(booking.city, micros)
+
+    def extend(self, bookings):
+        """
+        Add many bookings.
+
+        Args:
+            bookings (iterable): The bookings to add, in creation order.
+        """
+        with self._lock:
+            for booking in bookings:
+                self._append(booking.city, wallMicros(booking.start_time))
+
+    def _append(self, city, micros):
+        index = self._cityIndex.get(city)
+        if index is None:
+            index = self._cityIndex[city] = len(self.cities)
+            self.cities.append(city)
+            self._cityFirstRows.append(None)
+        row = len(self.cityIndexes)
+        self.cityIndexes.append(index)
+        if micros is None:
+            self.startTimes.append(NO_TIME)
+            self.hours.append(-1)
+            self.invalid += 1
+            return
+        hour = micros // _MICROS_PER_HOUR % HOURS
+        self.startTimes.append(micros)
+        self.hours.append(hour)
+        if self._cityFirstRows[index] is None:
+            self._cityFirstRows[index] = row
+        if self._hourFirstRows[hour] is None:
+            self._hourFirstRows[hour] = row
+
+    def _counts(self):
+        """
+        Count the bookings with a usable start time per city index and per hour.
+
+        Returns:
+            tuple: List of counts per city index and list of 24 counts per hour.
+        """
+        with self._lock:
+            if np is not None and self.cityIndexes:
+                city_indexes = np.frombuffer(self.cityIndexes, dtype=np.int64)
+                hours = np.frombuffer(self.hours, dtype=np.int8)
+                if self.invalid:
+                    city_indexes = city_indexes[hours >= 0]
+                city_counts = np.bincount(city_indexes, minlength=len(self.cities)).tolist()
+                hour_counts = np.bincount(hours + 1, minlength=HOURS + 1)[1:].tolist()  # Shift -1 to bin 0
+                del city_indexes, hours  # Release the views before the arrays can grow again
+                return city_counts, hour_counts
+            if self.invalid:
+                city_counter = Counter(index for index, hour in zip(self.cityIndexes, self.hours) if hour >= 0)
+            else:
+                city_counter = Counter(self.cityIndexes)
+            hour_counter = Counter(self.hours)
+            return ([city_counter.get(index, 0) for index in range(len(self.cities))],
+                    [hour_counter.get(hour, 0) for hour in range(HOURS)])
+
+    def histograms(self):
+        """
+        Get the full demand histograms.
+
+        Bookings whose start time cannot be interpreted are left out of both.
+
+        Returns:
+            tuple: Dictionary mapping City objects to booking counts, in order of first booking,
+                and a list of 24 booking counts indexed by start hour.
+        """
+        city_counts, hour_counts = self._counts()
+        return {city: count for city, count in zip(self.cities, city_counts) if count}, hour_counts
+
+    def highDemandCities(self):
+        """
+        Find the city with the highest demand for cabs and the peak hour.
+
+        Gives the same answer as Analytics.highDemandCities over the same bookings,
+        including ties, which go to the city or hour booked first.
+
+        Returns:
+            tuple: Name of the city with the most bookings and the hour of day with the most bookings.
+
+        Raises:
+            ValueError: If no booking has a usable start time.
+        """
+        city_counts, hour_counts = self._counts()
+        if not any(hour_counts):
+            raise ValueError("No bookings with a usable start time")
+        city = self._firstMax(city_counts, self._cityFirstRows)
+        hour = self._firstMax(hour_counts, self._hourFirstRows)
+        return self.cities[city].name, hour
+
+    @staticmethod
+    def _firstMax(counts, first_rows):
+        top = max(counts)
+        return min((first_rows[index], index) for index, count in enumerate(counts) if count == top)[1]
+
+    def memoryBytes(self):
+        """
+        Get the memory held by the columns.
+
+        Returns:
+            int: Approximate size in bytes.
+        """
+        columns = (self.cityIndexes, self.startTimes, self.hours)
+        return sum(column.buffer_info()[1] * column.itemsize for column in columns) + sys.getsizeof(self.cities)
+
+    def __len__(self):
+        return len(self.cityIndexes)
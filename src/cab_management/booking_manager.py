@@ -4,14 +4,15 @@ Booking Manager Module
 
 import logging
 
-from datetime import datetime
-import random
+from contextlib import nullcontext
+from datetime import datetime, timedelta
 from .booking import Booking, BookingState
+from .booking_columns import BookingColumns
+from .demand_counters import DemandCounters
+from .demand_window import DemandWindow
 from .city_manager import CityManager
-from .cab import CabState
+from .cab import CabState, nextVersion
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger('cab_management.booking_manager')
 
 class BookingManager:
@@ -20,6 +21,13 @@ class BookingManager:
     
     Attributes:
         _instance (BookingManager): The singleton instance of the BookingManager.
+        demand (DemandCounters): Booking counts per city and start hour, updated as bookings are added.
+        version (int): Version number, renewed whenever a booking is added or ended or the bookings are replaced.
+        bookingColumns (BookingColumns): Optional columnar view of the bookings for demand analytics,
+            None unless enabled.
+        demandWindow (DemandWindow): Optional top cities and hours over a sliding window of recent bookings,
+            None unless enabled.
+        journal (Journal): Journal or SQLiteStore recording booking events, None unless attached.
     """
     _instance = None
 
@@ -29,6 +37,11 @@ class BookingManager:
         else:
             BookingManager._instance = self
             self.bookings = {}  # Dictionary to hold booking data, booking id -> booking object
+            self.demand = DemandCounters()
+            self.version = nextVersion()
+            self.bookingColumns = None
+            self.demandWindow = None
+            self.journal = None
             logger.info("BookingManager instance created")
 
     @staticmethod
@@ -48,6 +61,9 @@ class BookingManager:
     def findBestCab(city):
         """
         Find the best available cab in the given city.
+
+        The best cab is the idle cab with the most idle time; if several cabs
+        have the same idle time, one of them is chosen at random.
         
         Args:
             city (str): The city where the cab is needed.
@@ -55,35 +71,34 @@ class BookingManager:
         Returns:
             Cab: The best available cab object, or None if no cabs are available.
         """
-        logger.info(f"Finding best cab in city {city}")
-        cabs = CityManager.getInstance().getCabsInCityByState(city, CabState.IDLE)  # Get idle cabs directly from CityManager
-        logger.info(f"Available cabs in city {city}: {[cab.cabId for cab in cabs]}")
-        if not cabs:
-            logger.warning(f"No idle cabs available in city {city}")
+        logger.info("Finding best cab in city %s", city)
+        city_obj = CityManager.getInstance().getCity(city)
+        if city_obj is None:
+            logger.warning("City %s not found", city)
             return None
+
+        # The city's idle index keeps idle cabs ordered by idle time, with ties broken randomly
+        selected_cab = city_obj.getLongestIdleCab()
+        if selected_cab is None:
+            logger.warning("No idle cabs available in city %s", city)
+            return None
+
+        logger.info("Selected cab %s from %s idle cabs", selected_cab.cabId, len(city_obj.idleCabs))
+        return selected_cab
+
+    @staticmethod
+    def _getCityLock(city):
+        """
+        Get the lock guarding dispatch in a city.
         
-        for cab in cabs:
-            idle_time = cab.getIdleTime()
-            logger.info(f"Cab ID: {cab.cabId}, Idle Time: {idle_time} seconds")
-        # Sort cabs based on idle time
-        cabs.sort(key=lambda cab: cab.getIdleTime(), reverse=True)
-        
-        for cab in cabs:
-            idle_time = cab.getIdleTime()
-            logger.info(f"Cab ID: {cab.cabId}, Idle Time: {idle_time} seconds")
-            
-        # If there are multiple cabs with the same idle time, randomly select one
-        max_idle_time = cabs[0].getIdleTime()
-        best_cabs = [cab for cab in cabs if cab.getIdleTime() == max_idle_time]
-        
-        if best_cabs:
-            selected_cab = random.choice(best_cabs)
-            logger.info(f"Selected cab {selected_cab.cabId} from best cabs")
-        else:
-            selected_cab = None
-            logger.warning("No cabs were selected as best cabs list is empty")
+        Args:
+            city (int): The ID of the city.
         
-        return selected_cab
+        Returns:
+            The city's lock, or a no-op context manager if the city does not exist.
+        """
+        city_obj = CityManager.getInstance().cities.get(city)
+        return city_obj.lock if city_obj is not None else nullcontext()
 
     def addBooking(self, booking):
         """
@@ -92,8 +107,90 @@ class BookingManager:
         Args:
             booking (Booking): The booking object to be added.
         """
-        logger.info(f"Booking {booking.bookingId} added for cab {booking.cab.cabId} in city {booking.city.cityId} at {booking.start_time}")
+        logger.info("Booking %s added for cab %s in city %s at %s", booking.bookingId, booking.cab.cabId, booking.city.cityId, booking.start_time)
         self.bookings[booking.bookingId] = booking
+        self.version = nextVersion()
+        self.demand.add(booking)
+        if self.bookingColumns is not None:
+            self.bookingColumns.add(booking)
+        if self.demandWindow is not None:
+            self.demandWindow.add(booking)
+        if self.journal is not None:
+            self.journal.bookingCreated(booking)
+
+    def rebuildDemandCounters(self):
+        """
+        Recount the demand counters, and the demand window if enabled, from the bookings dictionary.
+
+        Call this after replacing the bookings dictionary, as the restore
+        functions do.
+        
+        Returns:
+            DemandCounters: The new demand counters.
+        """
+        self.demand = DemandCounters(self.bookings.values())
+        self.version = nextVersion()
+        if self.demandWindow is not None:
+            self.demandWindow.clear()
+            self.demandWindow.extend(self.bookings.values())
+        logger.info("Demand counters rebuilt from %s bookings", len(self.bookings))
+        return self.demand
+
+    def enableBookingColumns(self):
+        """
+        Keep a columnar view of the bookings for fast demand analytics.
+
+        The view is filled from the existing bookings and then kept up to date
+        as bookings are added. Pass it to Analytics.highDemandCities or
+        Analytics.demandHistograms instead of the list of bookings.
+        
+        Returns:
+            BookingColumns: The booking columns.
+        """
+        if self.bookingColumns is None:
+            self.bookingColumns = BookingColumns(self.bookings.values())
+            logger.info("Booking columns enabled with %s bookings", len(self.bookingColumns))
+        return self.bookingColumns
+
+    def disableBookingColumns(self):
+        """
+        Stop maintaining the columnar view of the bookings.
+        """
+        if self.bookingColumns is not None:
+            self.bookingColumns = None
+            logger.info("Booking columns disabled")
+
+    def enableDemandWindow(self, window=timedelta(hours=1), buckets=60, topK=10, sketchWidth=None):
+        """
+        Track the top cities and start hours over a sliding window of recent bookings.
+
+        The window is filled from the existing bookings and then kept up to
+        date as bookings are added. If it is already enabled, the existing
+        window is returned unchanged.
+        
+        Args:
+            window (timedelta): Length of the window.
+            buckets (int): Number of time buckets the window is divided into.
+            topK (int): Largest k the top-k queries answer when sketching.
+            sketchWidth (int, optional): Count cities in count-min sketches of this width instead of exactly.
+        
+        Returns:
+            DemandWindow: The demand window.
+        """
+        if self.demandWindow is None:
+            demand_window = DemandWindow(window, buckets, topK, sketchWidth)
+            demand_window.extend(self.bookings.values())
+            self.demandWindow = demand_window
+            logger.info("Demand window of %s enabled", window)
+        return self.demandWindow
+
+    def disableDemandWindow(self):
+        """
+        Stop tracking demand over a sliding window.
+        """
+        if self.demandWindow is not None:
+            self.demandWindow = None
+            logger.info("Demand window disabled")
 
     def getBookings(self):
         """
@@ -123,17 +220,20 @@ class BookingManager:
             booking_id (int): The ID of the booking to end.
             end_time (datetime, optional): The timestamp when the trip ends. If None, current time will be used.
         """
-        logger.info(f"Ending booking with ID {booking_id}")
+        logger.info("Ending booking with ID %s", booking_id)
         if booking_id in self.bookings:
             booking = self.bookings[booking_id]
             cab = booking.cab
             cab.setState(CabState.IDLE, end_time)  # Set state using the CabState enum
             booking.change_state(BookingState.COMPLETED)
             booking.end_time = end_time if end_time else datetime.now()
-            logger.info(f"Booking with ID {booking_id} ended at {booking.end_time} and cab {cab.cabId} set to IDLE")
+            self.version = nextVersion()
+            if self.journal is not None:
+                self.journal.bookingEnded(booking)
+            logger.info("Booking with ID %s ended at %s and cab %s set to IDLE", booking_id, booking.end_time, cab.cabId)
             return True  # Return True for successful operation
         else:
-            logger.error(f"Booking ID {booking_id} not found.")
+            logger.error("Booking ID %s not found.", booking_id)
             return False  # Return False if booking ID is not found
 
     def bookCab(self, city, start_time=None):
@@ -151,39 +251,113 @@ class BookingManager:
             # Start transaction
             logger.info("Starting transaction for booking a cab")
 
-            # Step 1: Find the best available cab
-            best_cab = self.findBestCab(city)
-            if not best_cab:
-                logger.warning("No cabs available for booking")
-                return None
-            
-            # Step 2: Reserve the cab
-            best_cab.setState(CabState.RESERVED, start_time)  # Set state using the CabState enum
-            logger.info(f"Cab {best_cab.cabId} reserved")
+            # Steps 1 and 2 run under the city lock so concurrent bookings never pick the same cab
+            with self._getCityLock(city):
+                # Step 1: Find the best available cab
+                best_cab = self.findBestCab(city)
+                if not best_cab:
+                    logger.warning("No cabs available for booking")
+                    return None
+
+                # Step 2: Reserve the cab
+                best_cab.setState(CabState.RESERVED, start_time)  # Set state using the CabState enum
+                logger.info("Cab %s reserved", best_cab.cabId)
             
             # Step 3: Create a booking for the cab
             booking = Booking(best_cab, city, start_time=start_time)
             self.addBooking(booking)  # Use the addBooking method to add the booking
             best_cab.addBooking(booking.bookingId)  # Add booking to cab
-            logger.info(f"Booking created with ID {booking.bookingId} for cab {best_cab.cabId}")
+            logger.info("Booking created with ID %s for cab %s", booking.bookingId, best_cab.cabId)
             
             # Step 4: Change the state to WAITING_FOR_CUSTOMER
             booking.change_state(BookingState.WAITING_FOR_CUSTOMER)
-            logger.info(f"Cab {best_cab.cabId} state changed to WAITING_FOR_CUSTOMER")
+            logger.info("Cab %s state changed to WAITING_FOR_CUSTOMER", best_cab.cabId)
             
             # Step 5: Change the state to ON_TRIP
             booking.change_state(BookingState.TRIP_STARTED)
             best_cab.setState(CabState.ON_TRIP, start_time)  # Set state using the CabState enum
-            logger.info(f"Cab {best_cab.cabId} state changed to ON_TRIP")
+            logger.info("Cab %s state changed to ON_TRIP", best_cab.cabId)
             
             # Step 6: Return the booking ID
             logger.info("Transaction completed successfully")
             return booking.bookingId
 
         except Exception as e:
-            logger.error(f"Transaction failed: {e}")
+            logger.error("Transaction failed: %s", e)
             return None
 
+    def bookCabs(self, requests):
+        """
+        Book cabs for many requests in one call.
+
+        Requests are grouped by city. Each city is looked up once and its idle
+        cabs are taken longest idle first in a single pass, so the assignment
+        is the same as calling bookCab for each request in order.
+        
+        Args:
+            requests (list): City IDs, or (city ID, start_time) tuples.
+        
+        Returns:
+            list: The booking ID for each request, in request order, or None where no cab was available.
+        """
+        results = [None] * len(requests)
+        requests_by_city = {}
+        for position, request in enumerate(requests):
+            city, start_time = request if isinstance(request, tuple) else (request, None)
+            requests_by_city.setdefault(city, []).append((position, start_time))
+
+        city_manager = CityManager.getInstance()
+        for city, city_requests in requests_by_city.items():
+            city_obj = city_manager.getCity(city)
+            if city_obj is None:
+                logger.warning("City %s not found, %s requests not booked", city, len(city_requests))
+                continue
+
+            # Reserve the taken cabs before releasing the lock, so a concurrent
+            # update back to IDLE cannot hand the same cab to another booking
+            with city_obj.lock:
+                cabs = city_obj.idleCabs.take(len(city_requests))
+                for (_, start_time), cab in zip(city_requests, cabs):
+                    cab.setState(CabState.RESERVED, start_time)
+            for (position, start_time), cab in zip(city_requests, cabs):
+                try:
+                    results[position] = self._assignCab(cab, city_obj, start_time)
+                except Exception as e:
+                    logger.error("Transaction failed for cab %s: %s", cab.cabId, e)
+                    with city_obj.lock:
+                        if cab.state == CabState.RESERVED and cab._city is city_obj:
+                            cab.setState(CabState.IDLE, start_time)  # Release the cab so it can be booked later
+            logger.info("Booked %s of %s requested cabs in city %s", len(cabs), len(city_requests), city)
+        return results
+
+    def _assignCab(self, cab, city, start_time=None):
+        """
+        Create the booking for a reserved cab and start the trip, without per-step logging.
+        
+        Args:
+            cab (Cab): The cab to be booked, already RESERVED by the caller.
+            city (City): The city where the booking is made.
+            start_time (datetime, optional): The timestamp when the trip starts. If None, current time will be used.
+        
+        Returns:
+            int: The booking ID.
+        """
+        booking = Booking(cab, city, start_time=start_time)
+        self.bookings[booking.bookingId] = booking
+        self.version = nextVersion()
+        self.demand.add(booking)
+        if self.bookingColumns is not None:
+            self.bookingColumns.add(booking)
+        if self.demandWindow is not None:
+            self.demandWindow.add(booking)
+        if self.journal is not None:
+            self.journal.bookingCreated(booking)
+        cab.addBooking(booking.bookingId)
+        booking.change_state(BookingState.WAITING_FOR_CUSTOMER)
+        booking.change_state(BookingState.TRIP_STARTED)
+        cab.setState(CabState.ON_TRIP, start_time)
+        return booking.bookingId
+
     def bookOldCab(self, cab, city, start_time=None):
         """
         Book an old cab using the specified cab ID.
@@ -202,27 +376,27 @@ class BookingManager:
             
             # Step 1: Reserve the cab
             cab.setState(CabState.RESERVED, start_time)  # Set state using the CabState enum
-            logger.info(f"Cab {cab.cabId} reserved")
+            logger.info("Cab %s reserved", cab.cabId)
             
             # Step 2: Create a booking for the cab
             booking = Booking(cab, city, start_time=start_time)
             self.addBooking(booking)  # Use the addBooking method to add the booking
             cab.addBooking(booking.bookingId)  # Add booking to cab
-            logger.info(f"Booking created with ID {booking.bookingId} for cab {cab.cabId}")
+            logger.info("Booking created with ID %s for cab %s", booking.bookingId, cab.cabId)
             
             # Step 3: Change the state to WAITING_FOR_CUSTOMER
             booking.change_state(BookingState.WAITING_FOR_CUSTOMER)
-            logger.info(f"Cab {cab.cabId} state changed to WAITING_FOR_CUSTOMER")
+            logger.info("Cab %s state changed to WAITING_FOR_CUSTOMER", cab.cabId)
             
             # Step 4: Change the state to ON_TRIP
             booking.change_state(BookingState.TRIP_STARTED)
             cab.setState(CabState.ON_TRIP, start_time)  # Set state using the CabState enum
-            logger.info(f"Cab {cab.cabId} state changed to ON_TRIP")
+            logger.info("Cab %s state changed to ON_TRIP", cab.cabId)
             
             # Step 5: Return the booking ID
             logger.info("Transaction completed successfully")
             return booking.bookingId
 
         except Exception as e:
-            logger.error(f"Transaction failed: {e}")
+            logger.error("Transaction failed: %s", e)
             return None
@@ -3,8 +3,30 @@ Cab Module
 """
 
 from datetime import datetime, timedelta
+from itertools import count
 import logging
 from enum import Enum
+from .compact_history import CompactHistory
+
+logger = logging.getLogger('cab_management.cab')
+
+_EPOCH = datetime(1970, 1, 1)
+_NO_TIME = timedelta(0)  # Shared by every new cab, timedeltas are immutable
+_VERSIONS = count(1)
+
+
+def nextVersion():
+    """
+    Get a new version number.
+
+    Version numbers increase monotonically and are never reused, across all
+    cabs, cities and managers, so an object created to replace another never
+    shares its version.
+
+    Returns:
+        int: The version number.
+    """
+    return next(_VERSIONS)  # count is atomic under the GIL
 
 class CabState(Enum):
     IDLE = "IDLE"
@@ -19,16 +41,58 @@ class Cab:
         cabId (int): Unique identifier for the cab.
         cityId (int): Current city ID of the cab.
         state (CabState): Current state of the cab.
-        history (list): List of tuples containing the timestamp and state.
+        history (CompactHistory): Packed sequence of (timestamp, state) tuples, a TieredHistory
+            when history spilling is enabled. Only extend it through setState, which also keeps
+            the running idle-time total in sync.
         bookings (list): List of booking IDs associated with the cab.
+        version (int): Version number, renewed whenever the state or city of the cab changes.
+        fleetVersion (int): Class-wide version number, renewed whenever any cab is created or changes.
+        stateListeners (list): Class-wide list of callables notified of every state change
+            as listener(cab, previous_state, timestamp).
     """
-    def __init__(self, cabId, cityId):
+    __slots__ = ('cabId', 'cityId', 'state', 'history', 'bookings', 'version',
+                 '_city', '_idleTotal', '_lastTransition', '_historyIndex')
+
+    stateListeners = []
+    fleetVersion = 0
+
+    def __init__(self, cabId, cityId, state=CabState.IDLE, created=None):
+        self._init(cabId, cityId, state, created)
+        logger.info("Cab %s initialized in city ID %s with state %s", self.cabId, self.cityId, self.state)
+
+    @classmethod
+    def fromRow(cls, cabId, cityId, state, created, history=None):
+        """
+        Create a cab without logging, for bulk registration.
+        
+        Args:
+            cabId (int): Unique identifier for the cab.
+            cityId (int): Initial city ID of the cab.
+            state (CabState): Initial state of the cab.
+            created (datetime): Timestamp of the first history entry.
+            history (CompactHistory, optional): The cab's history, holding the single
+                (created, state) entry. Built from created and state if None.
+        
+        Returns:
+            Cab: The new cab.
+        """
+        cab = cls.__new__(cls)
+        cab._init(cabId, cityId, state, created, history)
+        return cab
+
+    def _init(self, cabId, cityId, state, created, history=None):
         self.cabId = cabId
         self.cityId = cityId
-        self.state = CabState.IDLE
-        self.history = [(datetime.now(), self.state)]
+        self.state = state
+        if created is None:
+            created = datetime.now()
+        self.history = history if history is not None else CompactHistory([(created, self.state)])
         self.bookings = []  # List to store booking IDs
-        logging.info(f"Cab {self.cabId} initialized in city ID {self.cityId} with state {self.state}")
+        self._city = None  # City object currently holding this cab, set by City.addCab
+        self._idleTotal = _NO_TIME  # Idle time accumulated up to the last datetime transition
+        self._lastTransition = created  # Timestamp of the last datetime transition
+        self._historyIndex = None  # Built on first use by getHistoryIndex
+        self.version = Cab.fleetVersion = nextVersion()
 
     def setState(self, state, timestamp=None):
         """
@@ -38,23 +102,53 @@ class Cab:
             state (Union[CabState, str]): The new state of the cab, can be a CabState or a string.
             timestamp (datetime, optional): The timestamp to record. If None, the current time will be used.
         """
-        logging.debug(f"Attempting to set state for cab {self.cabId} to {state}")
+        logger.debug("Attempting to set state for cab %s to %s", self.cabId, state)
         if isinstance(state, str):
             try:
                 state = CabState[state]  # Convert string to CabState
             except KeyError:
-                logging.error(f"Invalid state string: {state}")
+                logger.error("Invalid state string: %s", state)
                 raise ValueError(f"Invalid state string: {state}")
         elif not isinstance(state, CabState):
-            logging.error(f"Invalid state: {state}")
+            logger.error("Invalid state: %s", state)
             raise ValueError(f"Invalid state: {state}")
         
+        while True:
+            city = self._city
+            if city is None:
+                self._changeState(state, timestamp)
+                return
+            with city.lock:  # Serialize with bookings dispatched in the same city
+                if self._city is city:
+                    self._changeState(state, timestamp)
+                    return
+
+    def _changeState(self, state, timestamp):
+        """
+        Apply a validated state change and keep the derived indexes in sync.
+        
+        Args:
+            state (CabState): The new state of the cab.
+            timestamp (datetime): The timestamp to record, or None for the current time.
+        """
         if self.state != state:  # Only change state if it's different
+            previous_state = self.state
             self.state = state
             if timestamp is None:
                 timestamp = datetime.now()  # Use current time if no timestamp is provided
             self.history.append((timestamp, self.state))
-            logging.info(f"Cab {self.cabId} state changed to {self.state} at {timestamp}")
+            if isinstance(timestamp, datetime):
+                if self._lastTransition is not None and state == CabState.IDLE:
+                    self._idleTotal += timestamp - self._lastTransition
+                self._lastTransition = timestamp
+            if self._historyIndex is not None:
+                self._historyIndex.append(timestamp, self.state)
+            self.version = Cab.fleetVersion = nextVersion()
+            if self._city is not None:
+                self._city.onCabStateChange(self, previous_state)  # Keep the city's indexes in sync
+            for listener in Cab.stateListeners:
+                listener(self, previous_state, timestamp)
+            logger.info("Cab %s state changed to %s at %s", self.cabId, self.state, timestamp)
 
     def setCity(self, cityId):
         """
@@ -63,9 +157,10 @@ class Cab:
         Args:
             cityId (int): The new city ID of the cab.
         """
-        logging.debug(f"Changing city ID for cab {self.cabId} to {cityId}")
+        logger.debug("Changing city ID for cab %s to %s", self.cabId, cityId)
         self.cityId = cityId
-        logging.info(f"Cab {self.cabId} city ID changed to {self.cityId}")
+        self.version = Cab.fleetVersion = nextVersion()
+        logger.info("Cab %s city ID changed to %s", self.cabId, self.cityId)
 
     def getState(self):
         """
@@ -74,7 +169,7 @@ class Cab:
         Returns:
             CabState: The current state of the cab.
         """
-        logging.debug(f"Getting state for cab {self.cabId}: {self.state}")
+        logger.debug("Getting state for cab %s: %s", self.cabId, self.state)
         return self.state
 
     def getCity(self):
@@ -84,18 +179,33 @@ class Cab:
         Returns:
             int: The current city ID of the cab.
         """
-        logging.debug(f"Getting city ID for cab {self.cabId}: {self.cityId}")
+        logger.debug("Getting city ID for cab %s: %s", self.cabId, self.cityId)
         return self.cityId
 
     def getHistory(self):
         """
         Get the state history of the cab.
+
+        The compact history is only decoded when this is called.
         
         Returns:
             list: List of tuples containing the timestamp and state.
         """
-        logging.debug(f"Getting history for cab {self.cabId}")
-        return self.history
+        logger.debug("Getting history for cab %s", self.cabId)
+        return list(self.history)
+
+    def getHistoryIndex(self):
+        """
+        Get the prefix-sum index over the state history of the cab.
+
+        The index is built from the history on first use and kept up to date by setState afterwards.
+        
+        Returns:
+            HistoryIndex: The history index of the cab, a TieredIndex for tiered histories.
+        """
+        if self._historyIndex is None:
+            self._historyIndex = self.history.buildIndex()
+        return self._historyIndex
 
     def addBooking(self, bookingId):
         """
@@ -105,7 +215,7 @@ class Cab:
             bookingId (int): The ID of the booking to add.
         """
         self.bookings.append(bookingId)
-        logging.info(f"Booking {bookingId} added to cab {self.cabId}")
+        logger.info("Booking %s added to cab %s", bookingId, self.cabId)
 
     def getBookings(self):
         """
@@ -114,30 +224,45 @@ class Cab:
         Returns:
             list: List of booking IDs.
         """
-        logging.debug(f"Getting bookings for cab {self.cabId}: {self.bookings}")
+        logger.debug("Getting bookings for cab %s: %s", self.cabId, self.bookings)
         return self.bookings
 
-    def getIdleTime(self):
+    def getIdleTime(self, current_time=None):
         """
         Calculate the total idle time of the cab.
+
+        The idle time accumulated by past transitions is kept up to date by
+        setState, so this runs in constant time regardless of history length.
+        
+        Args:
+            current_time (datetime, optional): The time to measure up to. If None, the current time will be used.
         
         Returns:
             int: The total idle time in seconds.
         """
-        total_idle_time = timedelta(0)
-        current_time = datetime.now()
-        previous_time = None  # Initialize previous_time to None
+        total_idle_time = self._idleTotal
+        if current_time is None:
+            current_time = datetime.now()
 
-        logging.debug(f"Calculating idle time for cab {self.cabId}")
-        for timestamp, state in self.history:
-            if isinstance(timestamp, datetime):
-                if previous_time is not None and state == CabState.IDLE:
-                    total_idle_time += timestamp - previous_time
-                previous_time = timestamp
-        
-        if self.state == CabState.IDLE and previous_time is not None:
-            total_idle_time += current_time - previous_time
+        if self.state == CabState.IDLE and self._lastTransition is not None:
+            total_idle_time += current_time - self._lastTransition
         
         idle_time_seconds = int(total_idle_time.total_seconds())
-        logging.info(f"Total idle time for cab {self.cabId}: {idle_time_seconds} seconds")
+        logger.info("Total idle time for cab %s: %s seconds", self.cabId, idle_time_seconds)
         return idle_time_seconds
+
+    def getIdleRank(self):
+        """
+        Get the key used to order idle cabs by idle time.
+
+        While the cab stays idle, getIdleTime() grows at the same rate for every
+        cab, so the rank (accumulated idle seconds minus the epoch seconds of the
+        last recorded transition) orders idle cabs exactly like getIdleTime()
+        without having to be recomputed as time passes.
+
+        Returns:
+            float: The idle rank of the cab.
+        """
+        if self._lastTransition is None:
+            return self._idleTotal.total_seconds()
+        return (self._idleTotal - (self._lastTransition - _EPOCH)).total_seconds()
@@ -3,10 +3,16 @@ Cab Manager Module
 """
 
 import logging
-from .cab import Cab
+from datetime import datetime
+from .cab import Cab, nextVersion
 from .cab import CabState
+from .compact_history import CompactHistory
 from .booking_manager import BookingManager
 from .city_manager import CityManager
+from .fleet_store import FleetStore
+from .tiered_history import DEFAULT_CHUNK_ENTRIES, HistorySegments, TieredHistory
+
+logger = logging.getLogger('cab_management.cab_manager')
 
 class CabManager:
     """
@@ -15,6 +21,10 @@ class CabManager:
     Attributes:
         _instance (CabManager): The singleton instance of the CabManager.
         cabs (dict): Dictionary mapping cab IDs to Cab objects.
+        fleetStore (FleetStore): Optional columnar copy of the fleet, None unless enabled.
+        historySegments (HistorySegments): Segment files holding the older history of every cab,
+            None unless history spilling is enabled.
+        journal (Journal): Journal or SQLiteStore recording cab events, None unless attached.
     """
     _instance = None
 
@@ -25,6 +35,9 @@ class CabManager:
             CabManager._instance = self
             self.cabs = {}  # cabId -> Cab object
             self.cityManager = CityManager.getInstance()
+            self.fleetStore = None
+            self.historySegments = None
+            self.journal = None
 
     @staticmethod
     def getInstance():
@@ -47,9 +60,80 @@ class CabManager:
             cityId (int): Initial city ID of the cab.
         """
         cab = Cab(cabId, cityId)
+        if self.historySegments is not None:
+            cab.history = TieredHistory.fromHistory(cab.history, self.historySegments)
         self.cabs[cabId] = cab
         self.cityManager.addCabToCity(cab)
-        logging.info(f"Cab {cabId} registered in city ID {cityId}")
+        if self.fleetStore is not None:
+            self.fleetStore.add(cabId, cityId, cab.state, cab.history[-1][0])
+        if self.journal is not None:
+            self.journal.cabRegistered(cab)
+        logger.info("Cab %s registered in city ID %s", cabId, cityId)
+
+    def registerCabs(self, rows, timestamp=None, skipUnknownCities=False):
+        """
+        Register many cabs at once.
+
+        All rows are validated before any cab is registered. Cabs are then inserted
+        city by city, with one lock acquisition and one idle-index rebuild per city,
+        and without per-cab log lines.
+        
+        Args:
+            rows (iterable): (cabId, cityId) or (cabId, cityId, state) tuples. The state can be
+                a CabState or its name and defaults to IDLE.
+            timestamp (datetime, optional): Registration time recorded in every cab's history.
+                If None, the current time will be used.
+            skipUnknownCities (bool): Log a warning and skip rows naming an unknown city instead of
+                raising, so that one bad row does not fail a whole import.
+        
+        Returns:
+            int: The number of cabs registered.
+        
+        Raises:
+            ValueError: If a row names an invalid state, or an unknown city and skipUnknownCities is False.
+        """
+        cities = self.cityManager.cities
+        created = timestamp if timestamp is not None else datetime.now()
+        first_entries = {}  # CabState -> packed (created, state) history entry shared by the batch
+        batch = {}  # cabId -> new Cab object, the last row wins for repeated IDs
+        for row in rows:
+            cabId, cityId = row[0], row[1]
+            state = row[2] if len(row) > 2 else CabState.IDLE
+            if not isinstance(state, CabState):
+                try:
+                    state = CabState[state]
+                except KeyError:
+                    raise ValueError(f"Invalid state for cab {cabId}: {state}") from None
+            if cityId not in cities:
+                if skipUnknownCities:
+                    logger.warning("Cannot register cab %s: City ID=%s not found.", cabId, cityId)
+                    continue
+                raise ValueError(f"Cannot register cab {cabId}: City ID={cityId} not found.")
+            entry = first_entries.get(state)
+            if entry is None:
+                entry = first_entries[state] = CompactHistory([(created, state)]).data
+            history = CompactHistory.fromBytes(entry)
+            if self.historySegments is not None:
+                history = TieredHistory.fromHistory(history, self.historySegments)
+            batch[cabId] = Cab.fromRow(cabId, cityId, state, created, history)
+
+        cabs_by_city = {}
+        for cabId, cab in batch.items():
+            previous = self.cabs.get(cabId)
+            if previous is not None and previous._city is not None and previous._city.cityId != cab.cityId:
+                previous._city.removeCab(cabId)  # Re-registered in another city
+            self.cabs[cabId] = cab
+            cabs_by_city.setdefault(cab.cityId, []).append(cab)
+        for cityId, city_cabs in cabs_by_city.items():
+            cities[cityId].addCabs(city_cabs)
+        if self.fleetStore is not None:
+            for cabId, cab in batch.items():
+                self.fleetStore.add(cabId, cab.cityId, cab.state, created)
+        if self.journal is not None:
+            for cab in batch.values():
+                self.journal.cabRegistered(cab)
+        logger.info("Registered %s cabs in %s cities", len(batch), len(cabs_by_city))
+        return len(batch)
 
     def updateCab(self, cabId, state=None, cityId=None):
         """
@@ -68,7 +152,34 @@ class CabManager:
                 self.cityManager.removeCabFromCity(cab)
                 cab.setCity(cityId)
                 self.cityManager.addCabToCity(cab)
-            logging.info(f"Cab {cabId} updated with state {state} and city ID {cityId}")
+                if self.fleetStore is not None:
+                    self.fleetStore.update(cabId, cityId=cityId)
+                if self.journal is not None:
+                    self.journal.cabMoved(cabId, cityId)
+            logger.info("Cab %s updated with state %s and city ID %s", cabId, state, cityId)
+
+    def removeCab(self, cabId):
+        """
+        Remove a cab from the fleet, for example when it moves to another shard.
+
+        Cached fleet-wide reports are invalidated by renewing Cab.fleetVersion.
+
+        Args:
+            cabId (int): Unique identifier for the cab.
+
+        Returns:
+            Cab: The removed cab, or None if it was not found.
+        """
+        cab = self.cabs.pop(cabId, None)
+        if cab is None:
+            logger.warning("Cab %s not found, nothing removed", cabId)
+            return None
+        self.cityManager.removeCabFromCity(cab)
+        if self.fleetStore is not None:
+            self.fleetStore.remove(cabId)
+        Cab.fleetVersion = nextVersion()
+        logger.info("Cab %s removed", cabId)
+        return cab
 
     def getCab(self, cabId):
         """
@@ -82,6 +193,106 @@ class CabManager:
         """
         return self.cabs.get(cabId)
 
+    def enableFleetStore(self):
+        """
+        Keep a columnar copy of the fleet for fast fleet-wide queries.
+
+        The store is filled from the registered cabs and then kept up to date
+        by registerCab, updateCab and every cab state change.
+        
+        Returns:
+            FleetStore: The fleet store.
+        """
+        if self.fleetStore is None:
+            store = FleetStore()
+            for cab in self.cabs.values():
+                store.add(cab.cabId, cab.cityId, cab.state, cab.history[-1][0])
+            self.fleetStore = store
+            Cab.stateListeners.append(self._onCabStateChange)
+            logger.info("Fleet store enabled with %s cabs", len(store))
+        return self.fleetStore
+
+    def disableFleetStore(self):
+        """
+        Stop maintaining the columnar copy of the fleet.
+        """
+        if self.fleetStore is not None:
+            Cab.stateListeners.remove(self._onCabStateChange)
+            self.fleetStore = None
+            logger.info("Fleet store disabled")
+
+    def enableHistorySpill(self, directory=None, chunkEntries=DEFAULT_CHUNK_ENTRIES):
+        """
+        Keep only the recent history of every cab in memory and spill older transitions to disk.
+
+        Every registered cab gets a TieredHistory backed by one set of segment
+        files, and cabs registered later get one too. Calling this again while
+        spilling is enabled converts any cab that still has an in-memory history,
+        for example after a restore, and ignores the arguments.
+
+        Args:
+            directory (str, optional): Directory for the segment files. A temporary directory, deleted by disableHistorySpill, if None.
+            chunkEntries (int): Number of transitions sealed to disk at a time.
+
+        Returns:
+            HistorySegments: The segment store.
+        """
+        if self.historySegments is None:
+            self.historySegments = HistorySegments(directory, chunkEntries)
+        converted = 0
+        for cab in self.cabs.values():
+            if not isinstance(cab.history, TieredHistory):
+                cab.history = TieredHistory.fromHistory(cab.history, self.historySegments)
+                cab._historyIndex = None
+                converted += 1
+        logger.info("History spilling enabled for %s cabs, %s chunks sealed", converted, self.historySegments.chunks)
+        return self.historySegments
+
+    def disableHistorySpill(self):
+        """
+        Load every spilled history back into memory and close the segment files.
+        """
+        if self.historySegments is not None:
+            for cab in self.cabs.values():
+                if isinstance(cab.history, TieredHistory):
+                    cab.history = CompactHistory.fromBytes(cab.history.packed(), cab.history.extras)
+                    cab._historyIndex = None
+            self.historySegments.close()
+            self.historySegments = None
+            logger.info("History spilling disabled")
+
+    def _onCabStateChange(self, cab, previous_state, timestamp):
+        if self.cabs.get(cab.cabId) is cab:
+            self.fleetStore.update(cab.cabId, state=cab.state, timestamp=timestamp)
+
+    def getCabIdsInCityByState(self, cityId, state):
+        """
+        Get the IDs of all cabs in a city with a given state.
+
+        Uses a vectorized scan of the fleet store when it is enabled.
+        
+        Args:
+            cityId (int): The ID of the city.
+            state (Union[CabState, str]): The state to filter cabs by.
+        
+        Returns:
+            list: IDs of the matching cabs.
+        """
+        if self.fleetStore is not None:
+            return self.fleetStore.getCabIdsInCityByState(cityId, state)
+        return [cab.cabId for cab in self.cityManager.getCabsInCityByState(cityId, state)]
+
+    def getCabCountsByCityAndState(self):
+        """
+        Count the cabs in every city for every state.
+        
+        Returns:
+            dict: Dictionary mapping city IDs to dictionaries mapping each CabState to a cab count.
+        """
+        if self.fleetStore is not None:
+            return self.fleetStore.getCountsByCityAndState()
+        return {city.cityId: city.getCabCounts() for city in self.cityManager.getAllCities()}
+
     def getAllBookings(self):
         """
         Get all bookings for cabs.
@@ -1,7 +1,9 @@
 """
 City Module
 """
-from .cab import CabState
+import threading
+from .cab import CabState, nextVersion
+from .idle_index import IdleCabIndex
 
 class City:
     """
@@ -11,11 +13,22 @@ class City:
         cityId (int): Unique identifier for the city.
         name (str): Name of the city.
         cabs (dict): Dictionary mapping cab IDs to Cab objects.
+        cabsByState (dict): Dictionary mapping each CabState to a dictionary of the cabs in that state.
+        idleCabs (IdleCabIndex): Longest-idle-first index of the idle cabs in the city.
+        lock (threading.RLock): Guards the cabs of the city and their state changes, so that
+            concurrent bookings never pick the same cab.
+        version (int): Version number, renewed whenever a cab joins or leaves the city or changes state.
     """
+    __slots__ = ('cityId', 'name', 'cabs', 'cabsByState', 'idleCabs', 'lock', 'version')
+
     def __init__(self, cityId, name):
         self.cityId = cityId
         self.name = name
         self.cabs = {}  # cabId -> Cab object
+        self.cabsByState = {state: {} for state in CabState}  # CabState -> {cabId -> Cab object}
+        self.idleCabs = IdleCabIndex()
+        self.lock = threading.RLock()
+        self.version = nextVersion()
 
     def addCab(self, cab):
         """
@@ -24,7 +37,41 @@ class City:
         Args:
             cab (Cab): The cab object to be added.
         """
-        self.cabs[cab.cabId] = cab
+        with self.lock:
+            previous = self.cabs.get(cab.cabId)
+            if previous is not None and previous is not cab:
+                self.removeCab(cab.cabId)  # Detach a stale cab object registered under the same ID
+            self.cabs[cab.cabId] = cab
+            self.cabsByState[cab.state][cab.cabId] = cab
+            cab._city = self
+            if cab.state == CabState.IDLE:
+                self.idleCabs.push(cab)
+            self.version = nextVersion()
+
+    def addCabs(self, cabs):
+        """
+        Add several cabs to the city under a single lock acquisition.
+        
+        Args:
+            cabs (list): The cab objects to be added.
+        """
+        with self.lock:
+            new_cabs = {cab.cabId: cab for cab in cabs}
+            for cabId in new_cabs.keys() & self.cabs.keys():
+                if self.cabs[cabId] is not new_cabs[cabId]:
+                    self.removeCab(cabId)  # Detach stale cab objects registered under the same IDs
+            self.cabs.update(new_cabs)
+            idle = []
+            for cab in new_cabs.values():
+                cab._city = self
+                if cab.state is CabState.IDLE:
+                    idle.append(cab)
+                else:
+                    self.cabsByState[cab.state][cab.cabId] = cab
+            if idle:
+                self.cabsByState[CabState.IDLE].update((cab.cabId, cab) for cab in idle)
+                self.idleCabs.pushMany(idle)
+            self.version = nextVersion()
 
     def removeCab(self, cabId):
         """
@@ -33,8 +80,32 @@ class City:
         Args:
             cabId (int): The cab ID to be removed.
         """
-        if cabId in self.cabs:
-            del self.cabs[cabId]
+        with self.lock:
+            cab = self.cabs.pop(cabId, None)
+            if cab is not None:
+                self.cabsByState[cab.state].pop(cabId, None)
+                self.idleCabs.discard(cab)
+                if cab._city is self:
+                    cab._city = None
+                self.version = nextVersion()
+
+    def onCabStateChange(self, cab, previous_state):
+        """
+        Update the state buckets and the idle index after a cab in the city changed state.
+
+        Called by Cab.setState with the city lock held.
+        
+        Args:
+            cab (Cab): The cab whose state changed.
+            previous_state (CabState): The state the cab was in before the change.
+        """
+        self.cabsByState[previous_state].pop(cab.cabId, None)
+        self.cabsByState[cab.state][cab.cabId] = cab
+        if cab.state == CabState.IDLE:
+            self.idleCabs.push(cab)
+        else:
+            self.idleCabs.discard(cab)
+        self.version = nextVersion()
 
     def getCabs(self):
         """
@@ -57,4 +128,36 @@ class City:
         """
         if isinstance(state, str):
             state = CabState[state]
-        return [cab for cab in self.cabs.values() if cab.getState() == state]
+        return list(self.cabsByState[state].values())
+
+    def getCabCountByState(self, state):
+        """
+        Get the number of cabs in the city with a given state.
+        
+        Args:
+            state (Union[str, CabState]): The state to count cabs for, can be a string or a CabState.
+        
+        Returns:
+            int: The number of cabs with the given state.
+        """
+        if isinstance(state, str):
+            state = CabState[state]
+        return len(self.cabsByState[state])
+
+    def getCabCounts(self):
+        """
+        Get the number of cabs in the city for every state.
+        
+        Returns:
+            dict: Dictionary mapping each CabState to the number of cabs in that state.
+        """
+        return {state: len(cabs) for state, cabs in self.cabsByState.items()}
+
+    def getLongestIdleCab(self):
+        """
+        Get the idle cab that has been idle the longest.
+        
+        Returns:
+            Cab: The idle cab with the most idle time, or None if no cab is idle.
+        """
+        return self.idleCabs.peek()
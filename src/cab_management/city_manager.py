@@ -5,6 +5,8 @@ City Manager Module
 from .city import City
 import logging
 
+logger = logging.getLogger('cab_management.city_manager')
+
 class CityManager:
     """
     Singleton class for managing cities.
@@ -12,6 +14,7 @@ class CityManager:
     Attributes:
         _instance (CityManager): The singleton instance of the CityManager.
         cities (dict): Dictionary mapping city IDs to City objects.
+        journal (Journal): Journal or SQLiteStore recording city events, None unless attached.
     """
     _instance = None
 
@@ -21,7 +24,8 @@ class CityManager:
         else:
             CityManager._instance = self
             self.cities = {}  # cityId -> City object
-            logging.info("CityManager instance created.")
+            self.journal = None
+            logger.info("CityManager instance created.")
 
     @staticmethod
     def getInstance():
@@ -33,7 +37,7 @@ class CityManager:
         """
         if CityManager._instance is None:
             CityManager()
-            logging.info("CityManager instance created through getInstance.")
+            logger.info("CityManager instance created through getInstance.")
         return CityManager._instance
 
     def addCity(self, cityId, name):
@@ -45,7 +49,9 @@ class CityManager:
             name (str): Name of the city.
         """
         self.cities[cityId] = City(cityId, name)
-        logging.info(f"City added: ID={cityId}, Name={name}")
+        if self.journal is not None:
+            self.journal.cityAdded(cityId, name)
+        logger.info("City added: ID=%s, Name=%s", cityId, name)
 
     def getCity(self, cityId):
         """
@@ -59,9 +65,9 @@ class CityManager:
         """
         city = self.cities.get(cityId)
         if city:
-            logging.info(f"Retrieved city: ID={cityId}, Name={city.name}")
+            logger.info("Retrieved city: ID=%s, Name=%s", cityId, city.name)
         else:
-            logging.warning(f"City with ID={cityId} not found.")
+            logger.warning("City with ID=%s not found.", cityId)
         return city
     
     def getAllCities(self):
@@ -72,7 +78,7 @@ class CityManager:
             list: List of all city objects.
         """
         cities = list(self.cities.values())
-        logging.info(f"Retrieved all cities: Count={len(cities)}")
+        logger.info("Retrieved all cities: Count=%s", len(cities))
         return cities
 
     def addCabToCity(self, cab):
@@ -85,9 +91,9 @@ class CityManager:
         city = self.getCity(cab.cityId)
         if city:
             city.addCab(cab)
-            logging.info(f"Cab added to city: Cab ID={cab.cabId}, City ID={cab.cityId}")
+            logger.info("Cab added to city: Cab ID=%s, City ID=%s", cab.cabId, cab.cityId)
         else:
-            logging.warning(f"Cannot add cab to city: City ID={cab.cityId} not found.")
+            logger.warning("Cannot add cab to city: City ID=%s not found.", cab.cityId)
     
     def removeCabFromCity(self, cab):
         """
@@ -99,9 +105,9 @@ class CityManager:
         city = self.getCity(cab.cityId)
         if city:
             city.removeCab(cab.cabId)
-            logging.info(f"Cab removed from city: Cab ID={cab.cabId}, City ID={cab.cityId}")
+            logger.info("Cab removed from city: Cab ID=%s, City ID=%s", cab.cabId, cab.cityId)
         else:
-            logging.warning(f"Cannot remove cab from city: City ID={cab.cityId} not found.")
+            logger.warning("Cannot remove cab from city: City ID=%s not found.", cab.cityId)
 
     def getAllCabsInCity(self, cityId):
         """
@@ -115,7 +121,7 @@ class CityManager:
         """
         city = self.getCity(cityId)
         cabs = city.getCabs() if city else []
-        logging.info(f"Retrieved all cabs in city: City ID={cityId}, Count={len(cabs)}")
+        logger.info("Retrieved all cabs in city: City ID=%s, Count=%s", cityId, len(cabs))
         return cabs
     
     def getCabsInCityByState(self, cityId, state):
@@ -131,9 +137,22 @@ class CityManager:
         """
         city = self.getCity(cityId)
         cabs = city.getCabsByState(state) if city else []
-        logging.info(f"Retrieved cabs in city by state: City ID={cityId}, State={state}, Count={len(cabs)}")
+        logger.info("Retrieved cabs in city by state: City ID=%s, State=%s, Count=%s", cityId, state, len(cabs))
         return cabs
 
+    def getCabCountsInCity(self, cityId):
+        """
+        Get the number of cabs in a given city for every state.
+        
+        Args:
+            cityId (int): The ID of the city.
+        
+        Returns:
+            dict: Dictionary mapping each CabState to the number of cabs in that state, empty if the city does not exist.
+        """
+        city = self.getCity(cityId)
+        return city.getCabCounts() if city else {}
+
     def removeCity(self, cityId):
         """
         Remove a city if it has no associated cabs.
@@ -147,7 +166,9 @@ class CityManager:
         city = self.getCity(cityId)
         if city and not city.getCabs():
             del self.cities[cityId]
-            logging.info(f"City with ID {cityId} has been removed.")
+            if self.journal is not None:
+                self.journal.cityRemoved(cityId)
+            logger.info("City with ID %s has been removed.", cityId)
             return True
-        logging.warning(f"City with ID {cityId} cannot be removed as it has associated cabs.")
+        logger.warning("City with ID %s cannot be removed as it has associated cabs.", cityId)
         return False
@@ -0,0 +1,216 @@
+"""
+Compact History Module
+"""
+
+from collections.abc import Sequence
+from datetime import datetime, timedelta
+import struct
+from .history_index import HistoryIndex
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+# Each entry is packed as a little-endian int64 of microseconds since the epoch
+# followed by one byte holding the state code and flags.
+_ENTRY = struct.Struct('<qB')
+_ISO_STRING = 0x80  # Timestamp was given as an ISO format string
+_RAW = 0x40  # Timestamp could not be encoded and is kept in extras
+_CODE_MASK = 0x3F
+
+_STATES = []  # state code -> state
+_STATE_CODES = {}  # state -> state code
+
+
+def _stateCode(state):
+    code = _STATE_CODES.get(state)
+    if code is None:
+        if len(_STATES) > _CODE_MASK:
+            raise ValueError(f"Too many distinct states to encode: {state}")
+        code = _STATE_CODES[state] = len(_STATES)
+        _STATES.append(state)
+    return code
+
+
+def stateTable():
+    """
+    Get the states in code order.
+
+    Codes are assigned in the order states are first seen, so packed entries
+    written by another process need its table to be decoded (see recodeStates).
+
+    Returns:
+        list: The state of every code.
+    """
+    return list(_STATES)
+
+
+def recodeStates(data, states):
+    """
+    Rewrite the state codes of packed entries to the codes of this process, in place.
+
+    Args:
+        data (bytearray): Packed entries.
+        states (list): The state table the entries were written with, as returned by stateTable.
+    """
+    if states == _STATES[:len(states)]:
+        return
+    table = bytearray(range(256))
+    for code, state in enumerate(states):
+        new_code = _stateCode(state)
+        for flags in (0, _RAW, _ISO_STRING, _RAW | _ISO_STRING):
+            table[flags | code] = flags | new_code
+    data[_ENTRY.size - 1::_ENTRY.size] = data[_ENTRY.size - 1::_ENTRY.size].translate(table)
+
+
+def _isoMicros(timestamp):
+    """
+    Get the microseconds for an ISO string that decodes back to exactly the same string.
+    """
+    try:
+        parsed = datetime.fromisoformat(timestamp)
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None or parsed.isoformat() != timestamp:
+        return None
+    return (parsed - _EPOCH) // _MICROSECOND
+
+
+class CompactHistory(Sequence):
+    """
+    State history packed into a bytearray, 9 bytes per transition.
+
+    Behaves like the list of (timestamp, state) tuples it replaces: entries
+    are decoded on access, so indexing, slicing and iteration return the
+    same datetimes, ISO strings and states that were appended. Timestamps
+    that cannot be packed (aware datetimes, other strings and objects) are
+    kept as-is in a side dictionary.
+
+    Attributes:
+        data (bytearray): The packed entries.
+        extras (dict): Dictionary mapping entry positions to timestamps kept as-is, or None.
+    """
+    __slots__ = ('data', 'extras')
+
+    def __init__(self, entries=()):
+        self.data = bytearray()
+        self.extras = None
+        for entry in entries:
+            self.append(entry)
+
+    @classmethod
+    def fromBytes(cls, data, extras=None):
+        """
+        Create a history from packed entries, without decoding them.
+
+        Args:
+            data (bytes): Packed entries, as held in the data attribute of another history.
+            extras (dict, optional): Timestamps kept as-is, keyed by entry position.
+
+        Returns:
+            CompactHistory: A history holding a copy of the entries.
+        """
+        history = cls.__new__(cls)
+        history.data = bytearray(data)
+        history.extras = dict(extras) if extras else None
+        return history
+
+    def append(self, entry):
+        """
+        Append a transition.
+
+        Args:
+            entry (tuple): The (timestamp, state) pair to append.
+        """
+        timestamp, state = entry
+        code = _stateCode(state)
+        micros = None
+        if type(timestamp) is datetime and timestamp.tzinfo is None:
+            micros = (timestamp - _EPOCH) // _MICROSECOND
+        elif isinstance(timestamp, str):
+            micros = _isoMicros(timestamp)
+            if micros is not None:
+                code |= _ISO_STRING
+        if micros is None:
+            if self.extras is None:
+                self.extras = {}
+            self.extras[len(self)] = timestamp
+            micros = 0
+            code |= _RAW
+        self.data += _ENTRY.pack(micros, code)
+
+    def extend(self, entries):
+        for entry in entries:
+            self.append(entry)
+
+    def iterMicros(self):
+        """
+        Iterate over the raw entries without building datetime objects.
+
+        Yields:
+            tuple: (microseconds since the epoch, state) for each transition. Microseconds
+            are None for timestamps kept as-is.
+        """
+        for micros, code in _ENTRY.iter_unpack(self.data):
+            yield (None if code & _RAW else micros), _STATES[code & _CODE_MASK]
+
+    def packed(self):
+        """
+        Get every packed entry, oldest first.
+
+        Returns:
+            bytes: The packed entries, in the layout of the data attribute.
+        """
+        return self.data
+
+    def buildIndex(self):
+        """
+        Build a prefix-sum index over the history.
+
+        Returns:
+            HistoryIndex: An index holding every transition with a usable timestamp.
+        """
+        index = HistoryIndex()
+        for position, (micros, state) in enumerate(self.iterMicros()):
+            if micros is None:
+                index.append(self.extras[position], state)  # Timestamp kept as-is
+            else:
+                index.appendMicros(micros, state)
+        return index
+
+    def _decode(self, index):
+        micros, code = _ENTRY.unpack_from(self.data, index * _ENTRY.size)
+        return self._decodeEntry(index, micros, code)
+
+    def _decodeEntry(self, index, micros, code):
+        state = _STATES[code & _CODE_MASK]
+        if code & _RAW:
+            return self.extras[index], state
+        timestamp = _EPOCH + timedelta(microseconds=micros)
+        if code & _ISO_STRING:
+            timestamp = timestamp.isoformat()
+        return timestamp, state
+
+    def __len__(self):
+        return len(self.data) // _ENTRY.size
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._decode(position) for position in range(*index.indices(len(self)))]
+        length = len(self)
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError("history index out of range")
+        return self._decode(index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self._decode(index)
+
+    def __eq__(self, other):
+        if isinstance(other, (CompactHistory, list)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self):
+        return f"CompactHistory({list(self)!r})"
@@ -0,0 +1,99 @@
+"""
+Demand Counters Module
+
+Booking demand counted as bookings are created: bookings per city, per
+start hour of day and per (city, hour) pair. BookingManager keeps one
+DemandCounters up to date, so the high demand city and peak hour are found
+in O(cities + 24) instead of a pass over every booking.
+"""
+
+import logging
+import threading
+from .booking_columns import HOURS, wallMicros
+
+logger = logging.getLogger('cab_management.demand_counters')
+
+_MICROS_PER_HOUR = 3600 * 10**6
+
+
+class DemandCounters:
+    """
+    Running booking counts per city, per start hour and per (city, hour).
+
+    Start times are interpreted like Analytics.highDemandCities does, and
+    bookings whose start time cannot be interpreted are not counted. Ties go
+    to the city or hour counted first, as in Analytics.highDemandCities over
+    the bookings in creation order.
+
+    Attributes:
+        cityCounts (dict): Dictionary mapping City objects to booking counts, in order of first booking.
+        hourCounts (list): Booking count per start hour of day.
+        cityHourCounts (dict): Dictionary mapping City objects to lists of 24 booking counts per start hour.
+        skipped (int): Number of bookings whose start time cannot be interpreted.
+    """
+    def __init__(self, bookings=()):
+        self.cityCounts = {}
+        self.hourCounts = [0] * HOURS
+        self.cityHourCounts = {}
+        self.skipped = 0
+        self._hourOrder = []  # Hours in order of first booking
+        self._lock = threading.Lock()  # Bookings are created from many threads
+        for booking in bookings:
+            self.add(booking)
+
+    def add(self, booking):
+        """
+        Count a new booking.
+
+        Args:
+            booking (Booking): The booking that was created.
+        """
+        micros = wallMicros(booking.start_time)
+        city = booking.city
+        with self._lock:
+            if micros is None:
+                self.skipped += 1
+                return
+            hour = micros // _MICROS_PER_HOUR % HOURS
+            if city in self.cityCounts:
+                self.cityCounts[city] += 1
+                self.cityHourCounts[city][hour] += 1
+            else:
+                self.cityCounts[city] = 1
+                self.cityHourCounts[city] = [0] * HOURS
+                self.cityHourCounts[city][hour] = 1
+            if not self.hourCounts[hour]:
+                self._hourOrder.append(hour)
+            self.hourCounts[hour] += 1
+
+    def highDemandCities(self):
+        """
+        Find the city with the highest demand for cabs and the peak hour.
+
+        Returns:
+            tuple: Name of the city with the most bookings and the hour of day with the most bookings.
+
+        Raises:
+            ValueError: If no booking has been counted.
+        """
+        with self._lock:
+            if not self.cityCounts:
+                raise ValueError("No bookings with a usable start time")
+            city = max(self.cityCounts, key=self.cityCounts.get)  # The first maximum wins ties
+            hour = max(self._hourOrder, key=self.hourCounts.__getitem__)
+        return city.name, hour
+
+    def histograms(self):
+        """
+        Get copies of the counters.
+
+        Returns:
+            tuple: Dictionary mapping City objects to booking counts, list of 24 booking counts
+                per start hour, and dictionary mapping City objects to lists of 24 counts per start hour.
+        """
+        with self._lock:
+            return (dict(self.cityCounts), list(self.hourCounts),
+                    {city: list(counts) for city, counts in self.cityHourCounts.items()})
+
+    def __len__(self):
+        return sum(self.hourCounts)
@@ -0,0 +1,388 @@
+"""
+Demand Window Module
+
+Top cities and start hours by demand over a sliding window of recent
+bookings. The window is a ring of time buckets keyed by booking start time:
+each bucket holds the counts of the bookings that started in it, running
+totals are kept for the whole window, and the oldest bucket is subtracted
+from the totals when the window moves past it.
+
+City counts are exact by default. The cities are then also kept grouped by
+their window count, with the distinct counts in a sorted list, so a top-k
+query reads the largest groups instead of scanning every city. For very many cities they can instead be
+kept in count-min sketches, one per bucket plus one for the window, with a
+small set of heavy-hitter candidates, so memory does not depend on the
+number of cities and top-k queries only estimate the candidates.
+"""
+
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter
+from datetime import timedelta
+import heapq
+import logging
+import random
+import sys
+import threading
+from .booking_columns import HOURS, wallMicros
+
+logger = logging.getLogger('cab_management.demand_window')
+
+_MICROS_PER_HOUR = 3600 * 10**6
+_PRIME = 2**61 - 1
+
+
+class CountMinSketch:
+    """
+    Count-min sketch of integer keys.
+
+    Estimates never undercount. They overcount by at most 2/width of the total
+    count with probability 1 - 2**-depth.
+
+    Attributes:
+        width (int): Number of counters per row.
+        depth (int): Number of rows, each with its own hash function.
+        table (array): The counters, row after row.
+    """
+    def __init__(self, width, depth=4, seed=0):
+        if width < 1 or depth < 1:
+            raise ValueError(f"Sketch width and depth must be positive, got {width} and {depth}")
+        self.width = width
+        self.depth = depth
+        self.table = array('q', bytes(8 * width * depth))
+        rng = random.Random(seed)  # Sketches with the same seed hash alike and can be subtracted
+        self._hashes = [(rng.randrange(1, _PRIME), rng.randrange(_PRIME), row * width) for row in range(depth)]
+
+    def positions(self, key):
+        """
+        Get the counter of a key in every row.
+
+        Args:
+            key (int): The key.
+
+        Returns:
+            list: Offsets into the table, one per row.
+        """
+        width = self.width
+        return [offset + (a * key + b) % _PRIME % width for a, b, offset in self._hashes]
+
+    def addAt(self, positions, count=1):
+        """
+        Add to the counters of a key.
+
+        Args:
+            positions (list): The key's counters, from positions.
+            count (int): The amount to add.
+
+        Returns:
+            int: The new estimate for the key.
+        """
+        table = self.table
+        for position in positions:
+            table[position] += count
+        return min(table[position] for position in positions)
+
+    def estimate(self, key):
+        """
+        Estimate the count of a key.
+
+        Args:
+            key (int): The key.
+
+        Returns:
+            int: The estimated count.
+        """
+        table = self.table
+        return min(table[position] for position in self.positions(key))
+
+    def subtract(self, other):
+        """
+        Subtract the counts of a sketch built with the same width, depth and seed.
+
+        Args:
+            other (CountMinSketch): The sketch to subtract.
+        """
+        table = self.table
+        for position, count in enumerate(other.table):
+            if count:
+                table[position] -= count
+
+    def clear(self):
+        """
+        Reset every counter to zero.
+        """
+        self.table = array('q', bytes(8 * len(self.table)))
+
+    def memoryBytes(self):
+        """
+        Get the memory held by the counters.
+
+        Returns:
+            int: Size in bytes.
+        """
+        return self.table.buffer_info()[1] * self.table.itemsize
+
+
+class DemandWindow:
+    """
+    Booking counts per city and start hour over a sliding window of start times.
+
+    The window ends at the latest start time seen, or at the time passed to a
+    query if that is later. Bookings that started before the window are not
+    counted, so backfilling old bookings leaves it unchanged.
+
+    Attributes:
+        window (timedelta): Length of the window.
+        buckets (int): Number of buckets in the ring; the window moves one bucket at a time.
+        topK (int): Largest k the top-k queries answer in sketch mode.
+        sketch (CountMinSketch): Window city counts when sketching, None when counting exactly.
+        late (int): Number of bookings that started before the window and were not counted.
+    """
+    def __init__(self, window=timedelta(hours=1), buckets=60, topK=10, sketchWidth=None, sketchDepth=4):
+        if buckets < 1 or topK < 1:
+            raise ValueError(f"buckets and topK must be positive, got {buckets} and {topK}")
+        self.window = window
+        self.buckets = buckets
+        self.bucketMicros = max(1, window // timedelta(microseconds=1) // buckets)
+        self.topK = topK
+        self.late = 0
+        self._cities = {}  # City ID -> City, for the cities counted or kept as candidates
+        self._bucketIds = [None] * buckets  # Bucket number held by each slot
+        self._hourCounts = [[0] * HOURS for _ in range(buckets)]
+        self._hourTotals = [0] * HOURS
+        self._latest = None  # Newest bucket number
+        self._lock = threading.Lock()
+        if sketchWidth is None:
+            self.sketch = None
+            self._cityCounts = [Counter() for _ in range(buckets)]
+            self._cityTotals = Counter()
+            self._citiesByCount = {}  # Window count -> sorted IDs of the cities with that count
+            self._counts = []  # Distinct window counts, ascending
+        else:
+            self.sketch = CountMinSketch(sketchWidth, sketchDepth)
+            self._cityCounts = [CountMinSketch(sketchWidth, sketchDepth) for _ in range(buckets)]
+            self._candidates = {}  # Heavy-hitter city ID -> estimate when last seen
+            self._heap = []  # (estimate, city ID), possibly stale, smallest first
+
+    def add(self, booking):
+        """
+        Count a new booking.
+
+        Args:
+            booking (Booking): The booking that was created.
+        """
+        micros = wallMicros(booking.start_time)
+        if micros is None:
+            return
+        bucket = micros // self.bucketMicros
+        city = booking.city
+        with self._lock:
+            if self._latest is None or bucket > self._latest:
+                self._advance(bucket)
+            elif bucket <= self._latest - self.buckets:
+                self.late += 1
+                return
+            slot = bucket % self.buckets
+            self._bucketIds[slot] = bucket
+            if self.sketch is None:
+                cityId = city.cityId
+                self._cities[cityId] = city
+                self._cityCounts[slot][cityId] += 1
+                total = self._cityTotals[cityId]
+                self._cityTotals[cityId] = total + 1
+                self._recount(cityId, total, total + 1)
+            else:
+                positions = self.sketch.positions(city.cityId)
+                self._cityCounts[slot].addAt(positions)
+                self._offer(city, self.sketch.addAt(positions))
+            hour = micros // _MICROS_PER_HOUR % HOURS
+            self._hourCounts[slot][hour] += 1
+            self._hourTotals[hour] += 1
+
+    def extend(self, bookings):
+        """
+        Count many bookings.
+
+        Args:
+            bookings (iterable): The bookings to count.
+        """
+        for booking in bookings:
+            self.add(booking)
+
+    def _advance(self, bucket):
+        """
+        Move the end of the window to a later bucket, expiring the buckets that fall out of it.
+        """
+        if self._latest is not None:
+            expired = False
+            for passed in range(max(self._latest + 1, bucket - self.buckets + 1), bucket + 1):
+                expired = self._expire(passed % self.buckets) or expired
+            if expired and self.sketch is not None:
+                self._refreshCandidates()
+        self._latest = bucket
+
+    def _expire(self, slot):
+        if self._bucketIds[slot] is None:
+            return False
+        self._bucketIds[slot] = None
+        for hour, count in enumerate(self._hourCounts[slot]):
+            self._hourTotals[hour] -= count
+        self._hourCounts[slot] = [0] * HOURS
+        if self.sketch is None:
+            for cityId, count in self._cityCounts[slot].items():
+                total = self._cityTotals[cityId]
+                remaining = total - count
+                self._recount(cityId, total, remaining)
+                if remaining:
+                    self._cityTotals[cityId] = remaining
+                else:
+                    del self._cityTotals[cityId]
+                    del self._cities[cityId]
+            self._cityCounts[slot].clear()
+        else:
+            self.sketch.subtract(self._cityCounts[slot])
+            self._cityCounts[slot].clear()
+        return True
+
+    def _recount(self, cityId, old, new):
+        """
+        Move a city from the group of its old window count to the group of its new one.
+        """
+        groups = self._citiesByCount
+        if old:
+            group = groups[old]
+            del group[bisect_left(group, cityId)]
+            if not group:
+                del groups[old]
+                del self._counts[bisect_left(self._counts, old)]
+        if new:
+            group = groups.get(new)
+            if group is None:
+                groups[new] = [cityId]
+                insort(self._counts, new)
+            else:
+                insort(group, cityId)
+
+    def _offer(self, city, estimate):
+        """
+        Keep a city among the heavy-hitter candidates if its estimate is high enough.
+
+        Up to 2 * topK candidates are kept so that cities near the k-th place are not evicted too eagerly.
+        """
+        cityId = city.cityId
+        candidates = self._candidates
+        heap = self._heap
+        if cityId not in candidates and len(candidates) >= 2 * self.topK:
+            while heap and candidates.get(heap[0][1]) != heap[0][0]:
+                heapq.heappop(heap)  # Stale entry
+            if estimate <= heap[0][0]:
+                return
+            evicted = heapq.heappop(heap)[1]
+            del candidates[evicted]
+            del self._cities[evicted]
+        candidates[cityId] = estimate
+        self._cities[cityId] = city
+        heapq.heappush(heap, (estimate, cityId))
+        if len(heap) > 8 * self.topK:
+            self._heap = [(count, key) for key, count in candidates.items()]
+            heapq.heapify(self._heap)
+
+    def _refreshCandidates(self):
+        """
+        Re-estimate the candidates after buckets expired, dropping those no longer in the window.
+        """
+        estimates = {cityId: self.sketch.estimate(cityId) for cityId in self._candidates}
+        self._candidates = {cityId: count for cityId, count in estimates.items() if count > 0}
+        self._cities = {cityId: self._cities[cityId] for cityId in self._candidates}
+        self._heap = [(count, cityId) for cityId, count in self._candidates.items()]
+        heapq.heapify(self._heap)
+
+    def topCities(self, k=None, now=None):
+        """
+        Get the cities with the most bookings in the window.
+
+        In sketch mode the counts are estimates that may be too high, and k is at most topK.
+
+        Args:
+            k (int, optional): Number of cities to return. If None, topK.
+            now (Union[datetime, str], optional): End of the window. If None or earlier than the latest
+                start time seen, the latest start time seen.
+
+        Returns:
+            list: (city name, booking count) tuples, most bookings first.
+        """
+        k = self.topK if k is None else k
+        with self._lock:
+            self._moveTo(now)
+            if self.sketch is None:
+                top = []
+                for count in reversed(self._counts):
+                    top.extend((cityId, count) for cityId in self._citiesByCount[count][:k - len(top)])
+                    if len(top) >= k:
+                        break
+            else:
+                estimates = [(cityId, self.sketch.estimate(cityId)) for cityId in self._candidates]
+                top = sorted((item for item in estimates if item[1] > 0), key=lambda item: (-item[1], item[0]))
+                top = top[:min(k, self.topK)]
+            return [(self._cities[cityId].name, count) for cityId, count in top]
+
+    def topHours(self, k=None, now=None):
+        """
+        Get the start hours of day with the most bookings in the window.
+
+        Hour counts are always exact.
+
+        Args:
+            k (int, optional): Number of hours to return. If None, topK.
+            now (Union[datetime, str], optional): End of the window, as for topCities.
+
+        Returns:
+            list: (hour, booking count) tuples, most bookings first.
+        """
+        k = self.topK if k is None else k
+        with self._lock:
+            self._moveTo(now)
+            hours = [(hour, count) for hour, count in enumerate(self._hourTotals) if count]
+        hours.sort(key=lambda item: (-item[1], item[0]))
+        return hours[:k]
+
+    def _moveTo(self, now):
+        if now is None:
+            return
+        micros = wallMicros(now)
+        if micros is None:
+            raise ValueError(f"Cannot interpret window end {now!r}")
+        bucket = micros // self.bucketMicros
+        if self._latest is None or bucket > self._latest:
+            self._advance(bucket)
+
+    def clear(self):
+        """
+        Forget every counted booking.
+        """
+        with self._lock:
+            for slot in range(self.buckets):
+                self._expire(slot)
+            self._cities.clear()
+            self._latest = None
+            self.late = 0
+            if self.sketch is not None:
+                self._candidates.clear()
+                self._heap.clear()
+
+    def memoryBytes(self):
+        """
+        Get the memory held by the counts.
+
+        Returns:
+            int: Approximate size in bytes.
+        """
+        hours = (self.buckets + 1) * sys.getsizeof([0] * HOURS)
+        if self.sketch is None:
+            cities = sum(sys.getsizeof(counter) for counter in self._cityCounts) + sys.getsizeof(self._cityTotals)
+            cities += sys.getsizeof(self._citiesByCount) + sys.getsizeof(self._counts)
+            cities += sum(sys.getsizeof(group) for group in self._citiesByCount.values())
+        else:
+            cities = sum(sketch.memoryBytes() for sketch in self._cityCounts) + self.sketch.memoryBytes()
+            cities += sys.getsizeof(self._candidates) + sys.getsizeof(self._heap)
+        return hours + cities
@@ -0,0 +1,254 @@
+"""
+Fleet Report Module
+
+Time spent in every state by every cab over one window, computed in a
+single pass over the packed histories of the whole fleet instead of one
+history index query per cab. The packed entries of all cabs are joined into
+one buffer; each transition then covers the time until the cab's next
+transition, clipped to the window, and the clipped durations are summed per
+cab and state. When NumPy is installed the pass is vectorized over the
+buffer; otherwise it falls back to a loop over the unpacked entries.
+"""
+
+from array import array
+from datetime import datetime
+from itertools import accumulate, compress, repeat
+import logging
+from operator import and_, gt, lt
+import sys
+from .cab import CabState
+from .compact_history import _CODE_MASK, _ENTRY, _RAW, _STATE_CODES, _STATES
+from .history_index import toMicros, windowMicros
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+logger = logging.getLogger('cab_management.fleet_report')
+
+_MICROS_PER_SECOND = 10**6
+_CODE_TABLE = bytes(code & _CODE_MASK for code in range(256))  # Strips the flags from a code byte
+
+if np is not None:
+    _ENTRY_DTYPE = np.dtype([('micros', '<i8'), ('code', 'u1')])  # Same layout as _ENTRY
+
+
+class FleetReport:
+    """
+    Seconds spent in each state per cab and per city over a window.
+
+    Per-cab seconds are truncated to whole seconds like Analytics.calculateStateTime,
+    and per-city seconds are the sums of the per-cab seconds.
+
+    Attributes:
+        start (int): Start of the window in microseconds since the epoch, None if each cab's window
+            starts at its first transition.
+        end (int): End of the window in microseconds since the epoch.
+        cabIds (array): Cab ID of each row.
+        cityIds (list): City ID of each row.
+        seconds (dict): Dictionary mapping each CabState to an array of seconds per row.
+        cities (dict): Dictionary mapping city IDs to dictionaries mapping each CabState to seconds.
+    """
+    def __init__(self, start, end, cabIds, cityIds, seconds):
+        self.start = start
+        self.end = end
+        self.cabIds = cabIds
+        self.cityIds = cityIds
+        self.seconds = seconds
+        self.cities = {}
+        states = list(seconds)
+        for cityId, *values in zip(cityIds, *seconds.values()):
+            totals = self.cities.get(cityId)
+            if totals is None:
+                self.cities[cityId] = totals = [0] * len(states)
+            for position, value in enumerate(values):
+                totals[position] += value
+        self.cities = {cityId: dict(zip(states, totals)) for cityId, totals in self.cities.items()}
+        self._rows = None  # Cab ID -> row, built on first lookup
+
+    def cab(self, cabId):
+        """
+        Get the seconds a cab spent in each state.
+
+        Args:
+            cabId (int): The ID of the cab.
+
+        Returns:
+            dict: Dictionary mapping each CabState to seconds, or None if the cab is not in the report.
+        """
+        if self._rows is None:
+            self._rows = {cabId: row for row, cabId in enumerate(self.cabIds)}
+        row = self._rows.get(cabId)
+        if row is None:
+            return None
+        return {state: column[row] for state, column in self.seconds.items()}
+
+    def __len__(self):
+        return len(self.cabIds)
+
+
+def buildFleetReport(cabs, start_time=None, end_time=None):
+    """
+    Compute the time every cab spent in every state over a window.
+
+    Gives the same seconds as Analytics.calculateStateTime for each cab and state.
+
+    Args:
+        cabs (list): The cabs to report on.
+        start_time (datetime, optional): Start of the window. If None or minimum, each cab's window
+            starts at its first recorded transition.
+        end_time (datetime, optional): End of the window. If None, the current time is used.
+
+    Returns:
+        FleetReport: The report.
+
+    Raises:
+        ValueError: If start_time or end_time is neither a datetime nor an ISO format string.
+    """
+    start, end = windowMicros(None if start_time == datetime.min else start_time, end_time, None)
+    histories = [cab.history.packed() for cab in cabs]
+    if np is not None:
+        totals = _vectorizedTotals(cabs, histories, start, end)
+    else:
+        totals = _loopTotals(cabs, histories, start, end)
+    seconds = {}
+    for state in CabState:
+        code = _STATE_CODES.get(state)
+        column = array('q')
+        if code is None:  # No history holds the state yet
+            column.frombytes(bytes(8 * len(cabs)))
+        elif np is not None:
+            column.frombytes((totals[:, code] // _MICROS_PER_SECOND).astype(np.int64).tobytes())
+        else:
+            column.extend(value // _MICROS_PER_SECOND for value in totals[code::len(_STATES)])
+        seconds[state] = column
+    return FleetReport(start, end, array('q', [cab.cabId for cab in cabs]), [cab.cityId for cab in cabs], seconds)
+
+
+def _rawMicros(history, position):
+    """
+    Get the microseconds of a timestamp kept as-is, or None if it cannot be interpreted.
+    """
+    return toMicros(history.extras[position]) if history.extras else None
+
+
+def _cabTotals(cab, data, start, end, num_codes):
+    """
+    Sum the microseconds per state code of one cab, sorting its entries and interpreting
+    timestamps kept as-is.
+
+    Returns:
+        list: Microseconds per state code.
+    """
+    entries = []
+    for position, (micros, code) in enumerate(_ENTRY.iter_unpack(data)):
+        if code & _RAW:
+            micros = _rawMicros(cab.history, position)
+            if micros is None:
+                continue
+        entries.append((micros, code & _CODE_MASK))
+    entries.sort(key=lambda entry: entry[0])  # Stable, as the history index inserts after equal times
+    cab_totals = [0] * num_codes
+    for position, (micros, code) in enumerate(entries):
+        until = entries[position + 1][0] if position + 1 < len(entries) else end
+        low = micros if start is None or micros > start else start
+        high = until if until < end else end
+        if high > low:
+            cab_totals[code] += high - low
+    return cab_totals
+
+
+def _loopTotals(cabs, histories, start, end):
+    """
+    Sum the microseconds per cab and state code without NumPy.
+
+    The entries of all cabs are split into a microseconds array and a codes
+    string with slicing, and the transitions overlapping the window are picked
+    out with map and compress, so only those are visited in Python. Cabs with
+    out-of-order or as-is timestamps are recomputed one by one.
+
+    Returns:
+        list: Microseconds for every cab and state code, cab after cab.
+    """
+    num_codes = len(_STATES)
+    joined = bytearray().join(histories)
+    codes = joined[_ENTRY.size - 1::_ENTRY.size].translate(_CODE_TABLE)
+    del joined[_ENTRY.size - 1::_ENTRY.size]  # Leaves the int64 timestamps back to back
+    micros = array('q')
+    micros.frombytes(joined)
+    if sys.byteorder != 'little':
+        micros.byteswap()
+    del joined
+
+    counts = [len(data) // _ENTRY.size for data in histories]
+    offsets = list(accumulate(counts, initial=0))
+    rows = array('q')
+    until = micros[1:]
+    until.append(end)
+    for row, count in enumerate(counts):
+        rows.extend(repeat(row, count))
+        if count:
+            until[offsets[row + 1] - 1] = end  # Last transition of the cab lasts until the end
+
+    # Cabs whose entries go back in time, or that hold timestamps kept as-is, take the slow path
+    slow = {row for row, cab in enumerate(cabs) if cab.history.extras}
+    for position in compress(range(len(micros)), map(gt, micros, until)):
+        if position + 1 < len(micros) and rows[position + 1] == rows[position]:
+            slow.add(rows[position])
+
+    first = start if start is not None else -2**63
+    overlapping = list(map(and_, map(lt, micros, repeat(end)), map(gt, until, repeat(first))))
+    totals = [0] * (len(cabs) * num_codes)
+    for row, code, low, high in zip(compress(rows, overlapping), compress(codes, overlapping),
+                                    compress(micros, overlapping), compress(until, overlapping)):
+        if low < first:
+            low = first
+        if high > end:
+            high = end
+        totals[row * num_codes + code] += high - low
+    for row in slow:
+        totals[row * num_codes:(row + 1) * num_codes] = _cabTotals(cabs[row], histories[row], start, end, num_codes)
+    return totals
+
+
+def _vectorizedTotals(cabs, histories, start, end):
+    """
+    Sum the microseconds per cab and state code with NumPy over all entries at once.
+
+    Returns:
+        ndarray: Microseconds with one row per cab and one column per state code.
+    """
+    num_codes = len(_STATES)
+    counts = np.fromiter((len(data) // _ENTRY.size for data in histories), dtype=np.int64, count=len(histories))
+    entries = np.frombuffer(b''.join(histories), dtype=_ENTRY_DTYPE)
+    micros = entries['micros'].copy()
+    codes = entries['code']
+    rows = np.repeat(np.arange(len(cabs), dtype=np.int64), counts)
+
+    raw = (codes & _RAW) != 0
+    if raw.any():
+        offsets = np.concatenate(([0], np.cumsum(counts)))
+        keep = np.ones(len(micros), dtype=bool)
+        for entry in np.flatnonzero(raw).tolist():
+            row = int(rows[entry])
+            value = _rawMicros(cabs[row].history, entry - int(offsets[row]))
+            if value is None:
+                keep[entry] = False
+            else:
+                micros[entry] = value
+        micros, codes, rows = micros[keep], codes[keep], rows[keep]
+    codes = (codes & _CODE_MASK).astype(np.int64)
+
+    same_cab = rows[1:] == rows[:-1]
+    if (same_cab & (micros[1:] < micros[:-1])).any():
+        order = np.lexsort((micros, rows))  # Stable, as the history index inserts after equal times
+        micros, codes, rows = micros[order], codes[order], rows[order]
+        same_cab = rows[1:] == rows[:-1]
+
+    until = np.full(len(micros), end, dtype=np.int64)
+    until[:-1][same_cab] = micros[1:][same_cab]
+    low = micros if start is None else np.maximum(micros, start)
+    durations = np.clip(np.minimum(until, end) - low, 0, None)
+    totals = np.bincount(rows * num_codes + codes, weights=durations, minlength=len(cabs) * num_codes)
+    return np.rint(totals).astype(np.int64).reshape(len(cabs), num_codes)
@@ -0,0 +1,197 @@
+"""
+Fleet Store Module
+
+Columnar, array-backed view of the fleet: one row per cab holding its cab ID,
+city ID, state code and last transition time. Rows live in typed arrays from
+the array module, so scans touch contiguous memory instead of chasing one
+Python object per cab. When NumPy is installed the scans are vectorized over
+zero-copy views of the arrays; otherwise they fall back to plain loops.
+
+The store is updated from Cab.stateListeners under several city locks at
+once, so every method takes the store's own lock. Scans drop their NumPy
+views before releasing it, because an array cannot grow while a view of its
+buffer is alive.
+"""
+
+from array import array
+from datetime import datetime
+import logging
+import sys
+import threading
+from .cab import CabState
+from .history_index import toMicros
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+logger = logging.getLogger('cab_management.fleet_store')
+
+STATES = list(CabState)
+STATE_CODES = {state: code for code, state in enumerate(STATES)}
+
+
+class FleetStore:
+    """
+    Columnar store of cab ID, city ID, state and last transition time.
+
+    Attributes:
+        cabIds (array): Cab ID of each row.
+        cityIds (array): City ID of each row.
+        states (array): State code of each row, an index into STATES.
+        lastTransitions (array): Last transition time of each row in microseconds since the epoch.
+        rows (dict): Dictionary mapping cab IDs to their row number.
+    """
+    def __init__(self):
+        self.cabIds = array('q')
+        self.cityIds = array('q')
+        self.states = array('b')
+        self.lastTransitions = array('q')
+        self.rows = {}  # cabId -> row
+        self._lock = threading.Lock()  # Keeps the columns aligned and no views alive while they grow
+
+    def add(self, cabId, cityId, state=CabState.IDLE, timestamp=None):
+        """
+        Add a cab to the store, or overwrite its row if it is already present.
+
+        Args:
+            cabId (int): Unique identifier for the cab.
+            cityId (int): Current city ID of the cab.
+            state (CabState): Current state of the cab.
+            timestamp (datetime, optional): Time of the last transition. If None, the current time will be used.
+        """
+        micros = self._toMicros(timestamp)
+        with self._lock:
+            row = self.rows.get(cabId)
+            if row is not None:
+                self.cityIds[row] = cityId
+                self.states[row] = STATE_CODES[state]
+                self.lastTransitions[row] = micros
+                return
+            self.rows[cabId] = len(self.cabIds)
+            self.cabIds.append(cabId)
+            self.cityIds.append(cityId)
+            self.states.append(STATE_CODES[state])
+            self.lastTransitions.append(micros)
+
+    def update(self, cabId, state=None, cityId=None, timestamp=None):
+        """
+        Update the state and/or city of a cab already in the store.
+
+        Args:
+            cabId (int): Unique identifier for the cab.
+            state (CabState, optional): The new state of the cab.
+            cityId (int, optional): The new city ID of the cab.
+            timestamp (datetime, optional): Time of the state change. If None, the current time will be used.
+        """
+        micros = self._toMicros(timestamp) if state is not None else None
+        with self._lock:
+            row = self.rows.get(cabId)
+            if row is None:
+                logger.warning("Cab %s is not in the fleet store", cabId)
+                return
+            if state is not None:
+                self.states[row] = STATE_CODES[state]
+                self.lastTransitions[row] = micros
+            if cityId is not None:
+                self.cityIds[row] = cityId
+
+    def remove(self, cabId):
+        """
+        Remove a cab from the store by moving the last row into its place.
+
+        Args:
+            cabId (int): Unique identifier for the cab.
+        """
+        with self._lock:
+            row = self.rows.pop(cabId, None)
+            if row is None:
+                return
+            last = len(self.cabIds) - 1
+            if row != last:
+                for column in (self.cabIds, self.cityIds, self.states, self.lastTransitions):
+                    column[row] = column[last]
+                self.rows[self.cabIds[row]] = row
+            for column in (self.cabIds, self.cityIds, self.states, self.lastTransitions):
+                column.pop()
+
+    def getState(self, cabId):
+        """
+        Get the state of a cab.
+
+        Returns:
+            CabState: The state of the cab, or None if it is not in the store.
+        """
+        with self._lock:
+            row = self.rows.get(cabId)
+            return STATES[self.states[row]] if row is not None else None
+
+    def getCabIdsInCityByState(self, cityId, state):
+        """
+        Get the IDs of all cabs in a city with a given state.
+
+        Args:
+            cityId (int): The ID of the city.
+            state (Union[CabState, str]): The state to filter cabs by.
+
+        Returns:
+            list: IDs of the matching cabs.
+        """
+        if isinstance(state, str):
+            state = CabState[state]
+        code = STATE_CODES[state]
+        with self._lock:
+            if np is not None and self.cabIds:
+                cab_ids = np.frombuffer(self.cabIds, dtype=np.int64)
+                mask = (np.frombuffer(self.cityIds, dtype=np.int64) == cityId) & (np.frombuffer(self.states, dtype=np.int8) == code)
+                matches = cab_ids[mask].tolist()
+                del cab_ids, mask  # Release the view before the arrays can grow again
+                return matches
+            return [cab_id for cab_id, city_id, state_code in zip(self.cabIds, self.cityIds, self.states)
+                    if city_id == cityId and state_code == code]
+
+    def getCountsByCityAndState(self):
+        """
+        Count the cabs in every (city, state) pair.
+
+        Returns:
+            dict: Dictionary mapping city IDs to dictionaries mapping each CabState to a cab count.
+        """
+        counts = {}
+        with self._lock:
+            if np is not None and self.cabIds:
+                city_ids, inverse = np.unique(np.frombuffer(self.cityIds, dtype=np.int64), return_inverse=True)
+                keys = inverse * len(STATES) + np.frombuffer(self.states, dtype=np.int8)
+                totals = np.bincount(keys, minlength=len(city_ids) * len(STATES)).reshape(len(city_ids), len(STATES))
+                for city_id, row in zip(city_ids.tolist(), totals.tolist()):
+                    counts[city_id] = dict(zip(STATES, row))
+                return counts
+            for city_id, state_code in zip(self.cityIds, self.states):
+                city_counts = counts.get(city_id)
+                if city_counts is None:
+                    city_counts = counts[city_id] = [0] * len(STATES)
+                city_counts[state_code] += 1
+        return {city_id: dict(zip(STATES, row)) for city_id, row in counts.items()}
+
+    def memoryBytes(self):
+        """
+        Get the memory held by the columns and the row index.
+
+        Returns:
+            int: Approximate size in bytes.
+        """
+        columns = (self.cabIds, self.cityIds, self.states, self.lastTransitions)
+        with self._lock:
+            return sum(column.buffer_info()[1] * column.itemsize for column in columns) + sys.getsizeof(self.rows)
+
+    @staticmethod
+    def _toMicros(timestamp):
+        micros = toMicros(timestamp) if timestamp is not None else None
+        return micros if micros is not None else toMicros(datetime.now())
+
+    def __len__(self):
+        return len(self.cabIds)
+
+    def __contains__(self, cabId):
+        return cabId in self.rows
@@ -0,0 +1,208 @@
+"""
+History Index Module
+"""
+
+from bisect import bisect_right
+from datetime import datetime, timedelta, timezone
+import logging
+
+logger = logging.getLogger('cab_management.history_index')
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def toMicros(timestamp):
+    """
+    Convert a history timestamp to microseconds since the epoch.
+
+    Args:
+        timestamp (Union[datetime, str]): A datetime or an ISO format string.
+
+    Returns:
+        int: Microseconds since 1970-01-01, or None if the timestamp cannot be interpreted.
+    """
+    if isinstance(timestamp, str):
+        try:
+            timestamp = datetime.fromisoformat(timestamp)
+        except ValueError:
+            return None
+    if not isinstance(timestamp, datetime):
+        return None
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return (timestamp - _EPOCH) // _MICROSECOND
+
+
+def windowMicros(start_time, end_time, first):
+    """
+    Convert the bounds of a time-in-state window to microseconds since the epoch.
+
+    Args:
+        start_time (Union[datetime, str]): Start of the window. If None, the window starts at first.
+        end_time (Union[datetime, str]): End of the window. If None, the current time will be used.
+        first (int): Microseconds of the first transition, or None to leave the start of the window open.
+
+    Returns:
+        tuple: The start and end of the window in microseconds.
+
+    Raises:
+        ValueError: If a bound is neither a datetime nor an ISO format string.
+    """
+    start = toMicros(start_time) if start_time is not None else first
+    end = toMicros(end_time if end_time is not None else datetime.now())
+    if (start is None and start_time is not None) or end is None:
+        bad = end_time if end is None else start_time
+        raise ValueError(f"Invalid time window bound: {bad!r}")
+    return start, end
+
+
+class HistoryIndex:
+    """
+    Prefix-sum index over the state history of a cab.
+
+    Transitions are kept sorted by time together with the cumulative time
+    spent in every state up to each transition, so the time spent in any
+    state over any window costs two bisects and a subtraction. The state of
+    the latest transition is assumed to last until the end of the window.
+
+    Attributes:
+        times (list): Sorted transition times in microseconds since the epoch.
+        states (list): State entered at each transition.
+        cumulative (dict): Dictionary mapping each state seen so far to a list
+            of the microseconds spent in that state before each transition.
+        base (dict): Dictionary mapping states to microseconds spent in them before
+            the first indexed transition, for indexes over the tail of a longer history, or None.
+    """
+    __slots__ = ('times', 'states', 'cumulative', 'base', '_sorted')
+
+    def __init__(self, history=()):
+        self.times = []
+        self.states = []
+        self.cumulative = {}  # state -> prefix sums, aligned with times
+        self.base = None
+        self._sorted = True
+        for timestamp, state in history:
+            self.append(timestamp, state)
+
+    def append(self, timestamp, state):
+        """
+        Record a state transition.
+
+        Transitions that arrive in time order are indexed in O(1); older ones
+        are inserted in place and the prefix sums are rebuilt on the next query.
+
+        Args:
+            timestamp (Union[datetime, str]): The time of the transition.
+            state (CabState): The state entered.
+        """
+        micros = toMicros(timestamp)
+        if micros is None:
+            logger.debug("Skipping history entry with unusable timestamp %r", timestamp)
+            return
+        self.appendMicros(micros, state)
+
+    def appendMicros(self, micros, state):
+        """
+        Record a state transition given in microseconds since the epoch.
+
+        Args:
+            micros (int): The time of the transition.
+            state (CabState): The state entered.
+        """
+        if not self.times or micros >= self.times[-1]:
+            if self._sorted:
+                self._extendSums(micros, state)
+            self.times.append(micros)
+            self.states.append(state)
+        else:
+            position = bisect_right(self.times, micros)
+            self.times.insert(position, micros)
+            self.states.insert(position, state)
+            self._sorted = False
+
+    def _extendSums(self, micros, state):
+        """
+        Append one prefix-sum entry per state for a transition into state at micros.
+        """
+        if state not in self.cumulative:
+            self.cumulative[state] = [0] * len(self.times)
+        if not self.times:
+            for sums in self.cumulative.values():
+                sums.append(0)
+            return
+        elapsed = micros - self.times[-1]
+        previous_state = self.states[-1]
+        for known_state, sums in self.cumulative.items():
+            sums.append(sums[-1] + elapsed if known_state == previous_state else sums[-1])
+
+    def _rebuild(self):
+        """
+        Recompute all prefix sums after out-of-order transitions.
+        """
+        times, states = self.times, self.states
+        self.times, self.states = [], []
+        self.cumulative = {}
+        for micros, state in zip(times, states):
+            self._extendSums(micros, state)
+            self.times.append(micros)
+            self.states.append(state)
+        self._sorted = True
+
+    def _timeInStateUntil(self, state, micros):
+        """
+        Get the microseconds spent in state from the first transition until micros.
+        """
+        position = bisect_right(self.times, micros) - 1
+        if position < 0:
+            return 0
+        total = self.base.get(state, 0) if self.base else 0
+        if state not in self.cumulative:
+            return total
+        total += self.cumulative[state][position]
+        if self.states[position] == state:
+            total += micros - self.times[position]
+        return total
+
+    def timeUntil(self, state, micros):
+        """
+        Get the time spent in a state up to a point in time, including the base.
+
+        Args:
+            state (CabState): The state to measure.
+            micros (int): The point in time, in microseconds since the epoch.
+
+        Returns:
+            int: Microseconds spent in the state, 0 if micros precedes the first transition.
+        """
+        if not self._sorted:
+            self._rebuild()
+        return self._timeInStateUntil(state, micros)
+
+    def timeInState(self, state, start_time=None, end_time=None):
+        """
+        Get the time spent in a state between start_time and end_time.
+
+        Args:
+            state (CabState): The state to measure.
+            start_time (datetime, optional): Start of the window. If None, the window starts at the first transition.
+            end_time (datetime, optional): End of the window. If None, the current time will be used.
+
+        Returns:
+            timedelta: The time spent in the state during the window.
+
+        Raises:
+            ValueError: If a bound is neither a datetime nor an ISO format string.
+        """
+        if not self._sorted:
+            self._rebuild()
+        if not self.times:
+            return timedelta(0)
+        start, end = windowMicros(start_time, end_time, self.times[0])
+        if end <= start:
+            return timedelta(0)
+        total = self._timeInStateUntil(state, end) - self._timeInStateUntil(state, start)
+        return timedelta(microseconds=total)
+
+    def __len__(self):
+        return len(self.times)
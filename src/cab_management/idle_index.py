@@ -0,0 +1,116 @@
+"""
+Idle Index Module
+"""
+
+import heapq
+import random
+
+
+class IdleCabIndex:
+    """
+    Longest-idle-first index of the idle cabs in a city.
+
+    Cabs are kept in a heap ordered by their idle rank (see Cab.getIdleRank),
+    so the cab with the most idle time can be found in O(log n) regardless of
+    fleet size or history length. Ties are broken by a random number drawn
+    when the cab enters the index. Entries for cabs that have left the index
+    are discarded lazily when they reach the top of the heap.
+
+    Attributes:
+        heap (list): Heap of (negated rank, tiebreak, cab) entries.
+        live (dict): Dictionary mapping cab IDs to their current heap entry.
+    """
+    def __init__(self):
+        self.heap = []
+        self.live = {}  # cabId -> current heap entry
+
+    def push(self, cab):
+        """
+        Add a cab to the index, replacing any entry it already has.
+
+        Args:
+            cab (Cab): The idle cab to be added.
+        """
+        entry = (-cab.getIdleRank(), random.random(), cab)
+        self.live[cab.cabId] = entry
+        heapq.heappush(self.heap, entry)
+        if len(self.heap) > 2 * len(self.live) + 64:
+            self._compact()
+
+    def pushMany(self, cabs):
+        """
+        Add several cabs at once.
+
+        Large batches rebuild the heap once in O(n) instead of pushing every cab.
+        
+        Args:
+            cabs (iterable): The idle cabs to be added.
+        """
+        entries = [(-cab.getIdleRank(), random.random(), cab) for cab in cabs]
+        for entry in entries:
+            self.live[entry[2].cabId] = entry
+        if len(entries) * 8 >= len(self.heap):
+            self._compact()
+        else:
+            for entry in entries:
+                heapq.heappush(self.heap, entry)
+
+    def discard(self, cab):
+        """
+        Remove a cab from the index if it is present.
+
+        Args:
+            cab (Cab): The cab to be removed.
+        """
+        entry = self.live.get(cab.cabId)
+        if entry is not None and entry[2] is cab:
+            del self.live[cab.cabId]
+
+    def peek(self):
+        """
+        Get the cab with the longest idle time without removing it.
+
+        Returns:
+            Cab: The longest idle cab, or None if the index is empty.
+        """
+        heap = self.heap
+        while heap:
+            entry = heap[0]
+            if self.live.get(entry[2].cabId) is entry:
+                return entry[2]
+            heapq.heappop(heap)
+        return None
+
+    def take(self, count):
+        """
+        Remove and return up to count cabs in longest-idle-first order.
+
+        Args:
+            count (int): The maximum number of cabs to take.
+
+        Returns:
+            list: The cabs taken from the index, longest idle first.
+        """
+        heap = self.heap
+        taken = []
+        while heap and len(taken) < count:
+            entry = heapq.heappop(heap)
+            cab = entry[2]
+            if self.live.get(cab.cabId) is entry:
+                del self.live[cab.cabId]
+                taken.append(cab)
+        return taken
+
+    def _compact(self):
+        """
+        Rebuild the heap from the live entries, dropping stale ones.
+        """
+        self.heap = list(self.live.values())
+        heapq.heapify(self.heap)
+
+    def __len__(self):
+        return len(self.live)
+
+    def __contains__(self, cab):
+        entry = self.live.get(cab.cabId)
+        return entry is not None and entry[2] is cab
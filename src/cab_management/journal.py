@@ -0,0 +1,458 @@
+"""
+Journal Module
+
+Append-only write-ahead journal of domain events, and replay.
+
+While a Journal is attached, the managers report every city added or removed, cab
+registered, cab state change (through Cab.stateListeners), cab city change,
+booking created and booking ended. Each event is packed into a small binary
+record with a CRC32 of its contents and queued in memory; a background
+thread writes the queued records and fsyncs them as one group every
+flushInterval seconds, so journaling an event costs the caller a
+struct.pack, a CRC and a queue append. Callers that need an event to be
+durable before they answer call sync().
+
+replay(path) rebuilds the managers from a journal file. It can also be run
+from the command line, optionally writing a snapshot of the result:
+
+    python -m cab_management.journal fleet.journal [--snapshot fleet.snap]
+"""
+
+import argparse
+from datetime import datetime, timedelta
+import logging
+import os
+import struct
+import threading
+import zlib
+from collections import deque
+from .booking import Booking, BookingState
+from .booking_manager import BookingManager
+from .cab import Cab, CabState
+from .cab_manager import CabManager
+from .city import City
+from .city_manager import CityManager
+from .history_index import toMicros
+from .logging_config import configureLogging
+
+logger = logging.getLogger('cab_management.journal')
+
+MAGIC = b'CABJRNL\0'
+VERSION = 2
+DEFAULT_FLUSH_INTERVAL = 0.002  # Seconds between group commits
+
+_FILE_HEADER = struct.Struct('<8sI4x')
+_RECORD_HEADER = struct.Struct('<IBI')  # CRC32 of the rest of the record, event type, payload length
+_CRC = struct.Struct('<I')
+_BODY_HEADER = struct.Struct('<BI')  # The record header after the CRC
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+# Event types
+CITY_ADDED = 1
+CAB_REGISTERED = 2
+CAB_STATE_CHANGED = 3
+CAB_MOVED = 4
+BOOKING_CREATED = 5
+BOOKING_ENDED = 6
+CITY_REMOVED = 7
+
+# Payloads; every timestamp is a kind byte and microseconds, last in the payload
+_CITY_ADDED = struct.Struct('<q')  # cityId, followed by the UTF-8 name
+_CAB_REGISTERED = struct.Struct('<qqbbq')  # cabId, cityId, state, timestamp
+_CAB_STATE_CHANGED = struct.Struct('<qbbq')  # cabId, state, timestamp
+_CAB_MOVED = struct.Struct('<qq')  # cabId, cityId
+_BOOKING_CREATED = struct.Struct('<qqqbq')  # bookingId, cabId, cityId, start time
+_BOOKING_ENDED = struct.Struct('<qbq')  # bookingId, end time
+_CITY_REMOVED = struct.Struct('<q')  # cityId
+
+# Header (without the CRC) and payload packed in one call, for records without trailing bytes
+_RECORD_STRUCTS = {payload: struct.Struct(_BODY_HEADER.format + payload.format[1:])
+                   for payload in (_CITY_ADDED, _CAB_REGISTERED, _CAB_STATE_CHANGED, _CAB_MOVED,
+                                   _BOOKING_CREATED, _BOOKING_ENDED, _CITY_REMOVED)}
+
+CAB_STATES = list(CabState)
+CAB_STATE_CODES = {state: code for code, state in enumerate(CAB_STATES)}
+
+# Timestamp kinds. Timestamps that are neither datetimes nor ISO strings that
+# round-trip are stored as text after the fixed-width payload.
+_NONE = 0
+_DATETIME = 1
+_ISO_STRING = 2
+_TEXT = 3
+
+
+def _encodeTimestamp(timestamp):
+    """
+    Returns:
+        tuple: (kind, microseconds, trailing bytes).
+    """
+    if timestamp is None:
+        return _NONE, 0, b''
+    if type(timestamp) is datetime and timestamp.tzinfo is None:
+        return _DATETIME, (timestamp - _EPOCH) // _MICROSECOND, b''
+    if isinstance(timestamp, str):
+        micros = toMicros(timestamp)
+        if micros is not None and (_EPOCH + timedelta(microseconds=micros)).isoformat() == timestamp:
+            return _ISO_STRING, micros, b''
+    return _TEXT, 0, str(timestamp).encode()
+
+
+def _decodeTimestamp(kind, micros, tail):
+    if kind == _DATETIME:
+        return _EPOCH + timedelta(0, 0, micros)
+    if kind == _ISO_STRING:
+        return (_EPOCH + timedelta(0, 0, micros)).isoformat()
+    if kind == _TEXT:
+        return bytes(tail).decode()
+    return None
+
+
+def _checkHeader(data, path):
+    if len(data) < _FILE_HEADER.size or _FILE_HEADER.unpack_from(data)[0] != MAGIC:
+        raise ValueError(f"{path} is not a cab management journal")
+    version = _FILE_HEADER.unpack_from(data)[1]
+    if version != VERSION:
+        raise ValueError(f"Unsupported journal version {version}")
+
+
+def _recordEnd(data, offset):
+    """
+    Get the end of the record at offset, or None if it is incomplete or fails its checksum.
+    """
+    if offset + _RECORD_HEADER.size > len(data):
+        return None
+    crc, _, length = _RECORD_HEADER.unpack_from(data, offset)
+    end = offset + _RECORD_HEADER.size + length
+    if end > len(data) or zlib.crc32(memoryview(data)[offset + _CRC.size:end]) != crc:
+        return None
+    return end
+
+
+def _validLength(data):
+    """
+    Get the length of the journal up to the end of its last record before the first bad one.
+    """
+    offset = _FILE_HEADER.size
+    while True:
+        end = _recordEnd(data, offset)
+        if end is None:
+            return offset
+        offset = end
+
+
+def _record(event_type, payload_struct, *fields, tail=b''):
+    if not tail:
+        body = _RECORD_STRUCTS[payload_struct].pack(event_type, payload_struct.size, *fields)
+    else:
+        payload = payload_struct.pack(*fields) + tail
+        body = _BODY_HEADER.pack(event_type, len(payload)) + payload
+    return _CRC.pack(zlib.crc32(body)) + body
+
+
+class Journal:
+    """
+    Append-only journal file with group commit.
+
+    Producers only pack a record and append it to a deque, without taking a
+    lock. A writer thread wakes every flushInterval seconds (or when sync()
+    asks for it), writes everything queued as one group and fsyncs once.
+
+    Attributes:
+        path (str): The path of the journal file.
+        flushInterval (float): Seconds the writer waits to gather a group of records.
+        fsync (bool): Whether every group is fsynced.
+        durable (int): Number of records written (and fsynced if enabled) so far.
+        groups (int): Number of groups written so far.
+        error (OSError): The error that stopped the writer, or None.
+    """
+    def __init__(self, path, flushInterval=DEFAULT_FLUSH_INTERVAL, fsync=True):
+        self.path = path
+        self.flushInterval = flushInterval
+        self.fsync = fsync
+        self.durable = 0
+        self.groups = 0
+        self.error = None
+        self._pending = deque()  # Appended by producers, popped only by the writer
+        self._taken = 0  # Records popped by the writer so far
+        self._condition = threading.Condition(threading.Lock())  # Guards _taken, durable and error
+        self._wake = threading.Event()
+        self._closing = False
+        self._file = open(path, 'r+b' if os.path.exists(path) else 'w+b', buffering=0)
+        try:
+            data = self._file.read()
+            if not data:
+                self._file.write(_FILE_HEADER.pack(MAGIC, VERSION))
+            else:
+                _checkHeader(data, path)
+                length = _validLength(data)
+                if length != len(data):
+                    logger.warning("Truncating %s bytes from the first torn or corrupt record of %s",
+                                   len(data) - length, path)
+                    self._file.truncate(length)
+                self._file.seek(length)
+        except Exception:
+            self._file.close()
+            raise
+        self._writer = threading.Thread(target=self._run, name='journal-writer', daemon=True)
+        self._writer.start()
+
+    @property
+    def appended(self):
+        """
+        int: Number of records appended so far.
+        """
+        with self._condition:
+            return self._taken + len(self._pending)
+
+    def attach(self):
+        """
+        Start journaling the events of the manager singletons.
+
+        Returns:
+            Journal: This journal.
+        """
+        CityManager.getInstance().journal = self
+        CabManager.getInstance().journal = self
+        BookingManager.getInstance().journal = self
+        Cab.stateListeners.append(self.cabStateChanged)
+        logger.info("Journal %s attached", self.path)
+        return self
+
+    def detach(self):
+        """
+        Stop journaling manager events.
+        """
+        for manager in (CityManager.getInstance(), CabManager.getInstance(), BookingManager.getInstance()):
+            if manager.journal is self:
+                manager.journal = None
+        if self.cabStateChanged in Cab.stateListeners:
+            Cab.stateListeners.remove(self.cabStateChanged)
+
+    def close(self):
+        """
+        Detach, write every queued record and close the file.
+        """
+        self.detach()
+        self._closing = True
+        self._wake.set()
+        self._writer.join()
+        self._file.close()
+        logger.info("Journal %s closed after %s records in %s groups", self.path, self.durable, self.groups)
+
+    def __enter__(self):
+        return self.attach()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def sync(self):
+        """
+        Block until every record appended so far has been written.
+
+        Raises:
+            OSError: If the writer failed to write to the file.
+        """
+        with self._condition:
+            target = self._taken + len(self._pending)
+            if self.durable < target:
+                self._wake.set()  # Do not wait for a fuller group
+            while self.durable < target and self.error is None:
+                self._condition.wait()
+            if self.error is not None:
+                raise self.error
+
+    def append(self, record):
+        """
+        Queue an encoded record for the next group commit.
+
+        Args:
+            record (bytes): The encoded record.
+        """
+        self._pending.append(record)
+
+    def _run(self):
+        pending = self._pending
+        while True:
+            self._wake.wait(self.flushInterval)
+            self._wake.clear()
+            closing = self._closing
+            with self._condition:
+                group = [pending.popleft() for _ in range(len(pending))]
+                self._taken += len(group)
+                target = self._taken
+            if group:
+                try:
+                    self._file.write(b''.join(group))
+                    if self.fsync:
+                        os.fsync(self._file.fileno())
+                except OSError as e:
+                    logger.error("Failed to write journal %s: %s", self.path, e)
+                    with self._condition:
+                        self.error = e
+                        self._condition.notify_all()
+                    return
+                with self._condition:
+                    self.durable = target
+                    self.groups += 1
+                    self._condition.notify_all()
+            if closing:
+                return
+
+    # Events
+
+    def cityAdded(self, cityId, name):
+        self.append(_record(CITY_ADDED, _CITY_ADDED, cityId, tail=name.encode()))
+
+    def cityRemoved(self, cityId):
+        self.append(_record(CITY_REMOVED, _CITY_REMOVED, cityId))
+
+    def cabRegistered(self, cab):
+        kind, micros, tail = _encodeTimestamp(cab._lastTransition)
+        self.append(_record(CAB_REGISTERED, _CAB_REGISTERED, cab.cabId, cab.cityId, CAB_STATE_CODES[cab.state],
+                            kind, micros, tail=tail))
+
+    def cabStateChanged(self, cab, previous_state, timestamp):
+        """
+        Cab.stateListeners callback.
+        """
+        kind, micros, tail = _encodeTimestamp(timestamp)
+        self.append(_record(CAB_STATE_CHANGED, _CAB_STATE_CHANGED, cab.cabId, CAB_STATE_CODES[cab.state],
+                            kind, micros, tail=tail))
+
+    def cabMoved(self, cabId, cityId):
+        self.append(_record(CAB_MOVED, _CAB_MOVED, cabId, cityId))
+
+    def bookingCreated(self, booking):
+        kind, micros, tail = _encodeTimestamp(booking.start_time)
+        self.append(_record(BOOKING_CREATED, _BOOKING_CREATED, booking.bookingId, booking.cab.cabId,
+                            booking.city.cityId, kind, micros, tail=tail))
+
+    def bookingEnded(self, booking):
+        kind, micros, tail = _encodeTimestamp(booking.end_time)
+        self.append(_record(BOOKING_ENDED, _BOOKING_ENDED, booking.bookingId, kind, micros, tail=tail))
+
+
+def replay(path):
+    """
+    Replace the state of all managers with the state rebuilt from a journal file.
+
+    Bookings are restored as TRIP_STARTED when created and COMPLETED when ended,
+    the states BookingManager leaves them in. Replay stops at the first record
+    that is incomplete or fails its checksum, such as a torn or zero-filled
+    tail left by a crash during a write; the rest of the file is ignored.
+
+    Args:
+        path (str): The path of the journal file.
+
+    Returns:
+        dict: Dictionary mapping "cities", "cabs" and "bookings" to the number of objects rebuilt,
+            and "events" to the number of records replayed.
+
+    Raises:
+        ValueError: If the file is not a journal, or a journal is attached to the managers.
+    """
+    city_manager = CityManager.getInstance()
+    cab_manager = CabManager.getInstance()
+    booking_manager = BookingManager.getInstance()
+    if city_manager.journal or cab_manager.journal or booking_manager.journal:
+        raise ValueError("Detach the journal before replaying into the managers")
+    with open(path, 'rb') as file:
+        data = file.read()
+    _checkHeader(data, path)
+
+    cities, cabs, bookings = {}, {}, {}
+    view = memoryview(data)
+    offset = _FILE_HEADER.size
+    events = 0
+    try:
+        while True:
+            end = _recordEnd(data, offset)
+            if end is None:
+                break
+            event_type = data[offset + _CRC.size]
+            start = offset + _RECORD_HEADER.size
+            offset = end
+            events += 1
+            if event_type == CAB_STATE_CHANGED:
+                cabId, state, kind, micros = _CAB_STATE_CHANGED.unpack_from(data, start)
+                cabs[cabId]._changeState(CAB_STATES[state], _decodeTimestamp(kind, micros, view[start + _CAB_STATE_CHANGED.size:end]))
+            elif event_type == BOOKING_CREATED:
+                bookingId, cabId, cityId, kind, micros = _BOOKING_CREATED.unpack_from(data, start)
+                cab = cabs[cabId]
+                bookings[bookingId] = Booking.fromRow(bookingId, cab, cities[cityId], BookingState.TRIP_STARTED,
+                                                      _decodeTimestamp(kind, micros, view[start + _BOOKING_CREATED.size:end]), None)
+                cab.bookings.append(bookingId)
+            elif event_type == BOOKING_ENDED:
+                bookingId, kind, micros = _BOOKING_ENDED.unpack_from(data, start)
+                booking = bookings[bookingId]
+                booking.state = BookingState.COMPLETED
+                booking.end_time = _decodeTimestamp(kind, micros, view[start + _BOOKING_ENDED.size:end])
+            elif event_type == CAB_REGISTERED:
+                cabId, cityId, state, kind, micros = _CAB_REGISTERED.unpack_from(data, start)
+                created = _decodeTimestamp(kind, micros, view[start + _CAB_REGISTERED.size:end])
+                cabs[cabId] = Cab.fromRow(cabId, cityId, CAB_STATES[state], created)
+            elif event_type == CAB_MOVED:
+                cabId, cityId = _CAB_MOVED.unpack_from(data, start)
+                cabs[cabId].cityId = cityId
+            elif event_type == CITY_ADDED:
+                cityId, = _CITY_ADDED.unpack_from(data, start)
+                cities[cityId] = City(cityId, bytes(view[start + _CITY_ADDED.size:end]).decode())
+            elif event_type == CITY_REMOVED:
+                cityId, = _CITY_REMOVED.unpack_from(data, start)
+                del cities[cityId]
+            else:
+                raise ValueError(f"Unknown journal event type {event_type} at offset {start - _RECORD_HEADER.size}")
+        if offset != len(data):
+            logger.warning("Ignoring %s bytes from the first torn or corrupt record of %s", len(data) - offset, path)
+
+        members = {}
+        for cab in cabs.values():
+            if cab.cityId in cities:
+                members.setdefault(cab.cityId, []).append(cab)
+        for cityId, city_cabs in members.items():
+            cities[cityId].addCabs(city_cabs)
+    except KeyError as e:
+        raise ValueError(f"Journal event at offset {start - _RECORD_HEADER.size} refers to unknown ID {e}; "
+                         "a journal must be replayed from the start of the fleet's life") from None
+    finally:
+        view.release()
+
+    city_manager.cities = cities
+    cab_manager.cabs = cabs
+    booking_manager.bookings = bookings
+    booking_manager.rebuildDemandCounters()
+    with Booking._booking_counter_lock:
+        Booking._booking_counter = max([Booking._booking_counter, *bookings])
+    if cab_manager.fleetStore is not None:
+        cab_manager.disableFleetStore()
+        cab_manager.enableFleetStore()
+    if cab_manager.historySegments is not None:
+        cab_manager.enableHistorySpill()
+    if booking_manager.bookingColumns is not None:
+        booking_manager.disableBookingColumns()
+        booking_manager.enableBookingColumns()
+    logger.info("Replayed %s events from %s", events, path)
+    return {'cities': len(cities), 'cabs': len(cabs), 'bookings': len(bookings), 'events': events}
+
+
+def main():
+    """
+    Replay a journal from the command line.
+    """
+    parser = argparse.ArgumentParser(description="Rebuild the fleet from a journal file.")
+    parser.add_argument('journal', help="Journal file to replay")
+    parser.add_argument('--snapshot', help="Write a snapshot of the rebuilt fleet to this file")
+    args = parser.parse_args()
+
+    configureLogging(logging.INFO)
+    counts = replay(args.journal)
+    print(f"Replayed {counts['events']} events: {counts['cities']} cities, {counts['cabs']} cabs, "
+          f"{counts['bookings']} bookings")
+    if args.snapshot:
+        from .snapshot import snapshot
+        snapshot(args.snapshot)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Logging Configuration Module
+
+The package only creates loggers; applications choose how records are
+emitted by calling configureLogging once at startup.
+
+In the default mode, records are written synchronously to stderr as
+before. In production mode, the request thread only puts records on a
+queue. Formatting and I/O happen on a QueueListener thread, and
+high-frequency INFO/DEBUG events can be sampled so that only one in N is
+kept. Production mode also turns off the caller, thread and process
+lookups that logging does for every record, because LOG_FORMAT does not
+use them.
+"""
+
+import atexit
+import itertools
+import logging
+import logging.handlers
+import queue
+import sys
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Per-transition events logged on every booking, keyed by logger name.
+DEFAULT_SAMPLE_RATES = {
+    'cab_management.cab': 100,
+    'cab_management.city_manager': 100,
+    'cab_management.booking_manager': 10,
+}
+
+_listener = None
+_recordDefaults = (logging._srcfile, logging.logThreads, logging.logProcesses, logging.logMultiprocessing)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps one in every N records for configured events.
+
+    Events are matched by exact message template first, then by logger name
+    or any of its parent loggers. Records at WARNING or above are never dropped.
+
+    Attributes:
+        rates (dict): Dictionary mapping message templates or logger names to N.
+    """
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = dict(rates)
+        self._counters = {}  # key -> itertools.count, next() is atomic under the GIL
+
+    def _rateFor(self, record):
+        rate = self.rates.get(record.msg)
+        if rate is not None:
+            return record.msg, rate
+        name = record.name
+        while name:
+            rate = self.rates.get(name)
+            if rate is not None:
+                return name, rate
+            name = name.rpartition('.')[0]
+        return None, 1
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        key, rate = self._rateFor(record)
+        if rate <= 1:
+            return True
+        counter = self._counters.get(key)
+        if counter is None:
+            counter = self._counters.setdefault(key, itertools.count())
+        return next(counter) % rate == 0
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves message formatting to the listener thread.
+
+    The standard QueueHandler formats every record before queueing it, so
+    that it can be pickled. The queue here is in-process, so the record is
+    passed on as-is and the message is only formatted by the listener, from
+    the arguments as they are at that point.
+    Exception tracebacks are still rendered right away, while they are
+    still available.
+    """
+    def prepare(self, record):
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def configureLogging(level=logging.INFO, production=False, sample_rates=None, handlers=None):
+    """
+    Configure logging for the cab management package.
+
+    Args:
+        level (int): Level of the root logger.
+        production (bool): Emit records through a queue and a background listener thread.
+        sample_rates (dict, optional): In production mode, dictionary mapping message templates
+            or logger names to N, keeping one in N INFO/DEBUG records. Defaults to DEFAULT_SAMPLE_RATES.
+        handlers (list, optional): Handlers that write the records. Defaults to one stderr handler.
+
+    Returns:
+        logging.handlers.QueueListener: The listener in production mode, otherwise None.
+    """
+    stopLogging()
+    if handlers is None:
+        handlers = [logging.StreamHandler(sys.stderr)]
+    for handler in handlers:
+        if handler.formatter is None:
+            handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.setLevel(level)
+
+    if not production:
+        logging._srcfile, logging.logThreads, logging.logProcesses, logging.logMultiprocessing = _recordDefaults
+        for handler in handlers:
+            root.addHandler(handler)
+        return None
+
+    # Skip per-record work that LOG_FORMAT does not use (see "Optimization" in the logging HOWTO)
+    logging._srcfile = None
+    logging.logThreads = False
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+
+    global _listener
+    log_queue = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(DEFAULT_SAMPLE_RATES if sample_rates is None else sample_rates))
+    root.addHandler(queue_handler)
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def stopLogging():
+    """
+    Stop the production-mode listener, flushing any queued records.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stopLogging)
@@ -0,0 +1,422 @@
+"""
+Metrics Module
+
+Latency histograms, counters and gauges for the core operations, with a
+Prometheus text export. MetricsRegistry.attach() wraps the instrumented
+methods of BookingManager, CabManager and Analytics with timing wrappers;
+detach() puts the original methods back, so disabled metrics cost nothing.
+
+Latencies are recorded in nanoseconds into log-linear buckets in the style
+of HdrHistogram: every power of two is split into 2**SUB_BUCKET_BITS
+buckets, so a recorded value is off by at most 1/16 of itself whatever its
+magnitude, and recording is an index computation and two additions.
+Gauges (idle cabs per city, active bookings, cabs per state) are read from
+the managers when metrics are collected, not maintained on the booking path.
+"""
+
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import functools
+import logging
+from operator import attrgetter
+import os
+import threading
+from time import perf_counter_ns
+from .analytics import Analytics
+from .booking import BookingState
+from .booking_manager import BookingManager
+from .cab import CabState
+from .cab_manager import CabManager
+from .city_manager import CityManager
+
+logger = logging.getLogger('cab_management.metrics')
+
+SUB_BUCKET_BITS = 4
+_SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+_LINEAR_LIMIT = 2 * _SUB_BUCKETS  # Values below this get a bucket each
+_NUM_BUCKETS = (64 - SUB_BUCKET_BITS) << SUB_BUCKET_BITS  # Enough for any 64-bit value
+_MAX_NANOS = (1 << 64) - 1  # Largest value the buckets hold
+
+# Methods wrapped by attach(), by class. None instruments every public static method.
+INSTRUMENTED = {
+    BookingManager: ('bookCab', 'bookCabs', 'endBooking', 'findBestCab'),
+    CabManager: ('registerCab', 'updateCab'),
+    Analytics: None,
+}
+# Operations whose None or False result means the request could not be served.
+FAILURE_RESULTS = {'bookCab', 'endBooking', 'findBestCab'}
+
+PREFIX = 'cab_management'
+# Bucket bounds of the Prometheus export, in nanoseconds: powers of two from about
+# 1 microsecond to about 69 seconds, each the inclusive top of a histogram bucket.
+# Every bound is written on every scrape, so the exported series never change.
+EXPORT_BOUNDS = tuple((1 << power) - 1 for power in range(10, 37))
+
+
+def bucketIndex(nanos):
+    """
+    Get the histogram bucket of a value.
+
+    Args:
+        nanos (int): The value, at least 0.
+
+    Returns:
+        int: The bucket index.
+    """
+    if nanos < _LINEAR_LIMIT:
+        return nanos
+    shift = nanos.bit_length() - SUB_BUCKET_BITS - 1
+    return (shift << SUB_BUCKET_BITS) + (nanos >> shift)
+
+
+def bucketBounds(index):
+    """
+    Get the range of values counted in a histogram bucket.
+
+    Args:
+        index (int): The bucket index.
+
+    Returns:
+        tuple: The lowest value in the bucket and the lowest value above it.
+    """
+    if index < _LINEAR_LIMIT:
+        return index, index + 1
+    shift = (index >> SUB_BUCKET_BITS) - 1
+    mantissa = index - (shift << SUB_BUCKET_BITS)
+    return mantissa << shift, (mantissa + 1) << shift
+
+
+class LatencyHistogram:
+    """
+    Log-linear histogram of latencies in nanoseconds.
+
+    Recording takes no lock. Increments from threads switching at the wrong
+    moment could in principle be lost, which a monitoring histogram can afford
+    in exchange for staying off the callers' critical path.
+
+    Attributes:
+        name (str): Name of the operation measured.
+        counts (list): Number of values recorded in each bucket, updated in place.
+        sums (list): One-element list holding the sum of the values recorded, updated in place.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.counts = [0] * _NUM_BUCKETS
+        self.sums = [0]
+
+    def record(self, nanos):
+        """
+        Record a value.
+
+        Args:
+            nanos (int): Latency in nanoseconds.
+        """
+        self.counts[bucketIndex(nanos) if nanos > 0 else 0] += 1
+        self.sums[0] += nanos
+
+    @property
+    def count(self):
+        """
+        int: Number of values recorded.
+        """
+        return sum(self.counts)
+
+    @property
+    def total(self):
+        """
+        int: Sum of the values recorded, in nanoseconds.
+        """
+        return self.sums[0]
+
+    @property
+    def max(self):
+        """
+        int: Upper bound of the largest value recorded, in nanoseconds, or 0 if nothing was recorded.
+        """
+        cumulative = self.buckets()
+        return cumulative[-1][0] if cumulative else 0
+
+    def percentile(self, pct):
+        """
+        Get a percentile of the recorded values.
+
+        Args:
+            pct (float): The percentile, between 0 and 100.
+
+        Returns:
+            int: Upper bound of the bucket holding the percentile, in nanoseconds, or 0 if nothing was recorded.
+        """
+        cumulative = self.buckets()
+        if not cumulative:
+            return 0
+        rank = max(1, -(-cumulative[-1][1] * pct // 100))  # Number of values at or below the percentile
+        for upper, seen in cumulative:
+            if seen >= rank:
+                return upper
+        return cumulative[-1][0]
+
+    def buckets(self):
+        """
+        Get the cumulative counts of the non-empty buckets.
+
+        Returns:
+            list: (upper bound in nanoseconds, number of values at or below it) pairs, in increasing order.
+        """
+        cumulative = []
+        seen = 0
+        for index, bucket in enumerate(list(self.counts)):
+            if bucket:
+                seen += bucket
+                cumulative.append((bucketBounds(index)[1] - 1, seen))
+        return cumulative
+
+    def countsAtOrBelow(self, bounds):
+        """
+        Get the cumulative counts at fixed bounds, empty buckets included.
+
+        Args:
+            bounds (tuple): Increasing bounds in nanoseconds, each one below a power of two.
+
+        Returns:
+            list: (bound, number of values at or below it) pairs, one per bound.
+        """
+        counts = list(self.counts)
+        cumulative = []
+        seen = 0
+        index = 0
+        for bound in bounds:
+            stop = bucketIndex(bound + 1)  # First bucket above the bound
+            seen += sum(counts[index:stop])
+            index = max(index, stop)
+            cumulative.append((bound, seen))
+        return cumulative
+
+    def reset(self):
+        """
+        Drop every recorded value.
+        """
+        self.counts[:] = [0] * _NUM_BUCKETS
+        self.sums[0] = 0
+
+
+class MetricsRegistry:
+    """
+    Latency histograms and counters of the instrumented operations, and gauges read from the managers.
+
+    Attributes:
+        latencies (dict): Dictionary mapping operation names to LatencyHistogram.
+        errors (dict): Dictionary mapping operation names to the number of calls that raised.
+        failures (dict): Dictionary mapping operation names to the number of calls that returned None or False.
+    """
+    _attached = None  # The registry whose wrappers are installed
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.failures = {}
+        self._originals = []  # (class, name, original attribute), restored by detach
+
+    def attach(self):
+        """
+        Start recording the instrumented operations, replacing any other attached registry.
+
+        Returns:
+            MetricsRegistry: This registry.
+        """
+        if MetricsRegistry._attached is not None:
+            MetricsRegistry._attached.detach()
+        for cls, names in INSTRUMENTED.items():
+            if names is None:
+                names = [name for name, value in vars(cls).items()
+                         if isinstance(value, staticmethod) and not name.startswith('_')]
+            for name in names:
+                original = vars(cls)[name]
+                static = isinstance(original, staticmethod)
+                wrapper = self._instrument(name, original.__func__ if static else original)
+                setattr(cls, name, staticmethod(wrapper) if static else wrapper)
+                self._originals.append((cls, name, original))
+        MetricsRegistry._attached = self
+        logger.info("Metrics attached to %s operations", len(self._originals))
+        return self
+
+    def detach(self):
+        """
+        Stop recording and restore the original methods. Recorded metrics are kept.
+        """
+        for cls, name, original in reversed(self._originals):
+            setattr(cls, name, original)
+        self._originals = []
+        if MetricsRegistry._attached is self:
+            MetricsRegistry._attached = None
+
+    def _instrument(self, name, func):
+        # The histogram update is inlined, as a call to LatencyHistogram.record would double the overhead
+        histogram = self.latencies.setdefault(name, LatencyHistogram(name))
+        counts, sums = histogram.counts, histogram.sums
+        errors = self.errors
+        errors.setdefault(name, 0)
+        failures = self.failures if name in FAILURE_RESULTS else None
+        if failures is not None:
+            failures.setdefault(name, 0)
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            start = perf_counter_ns()
+            try:
+                result = func(*args, **kwargs)
+            except BaseException:
+                errors[name] += 1
+                raise
+            finally:
+                nanos = perf_counter_ns() - start
+                if nanos < _LINEAR_LIMIT:
+                    counts[nanos if nanos > 0 else 0] += 1
+                else:
+                    shift = nanos.bit_length() - SUB_BUCKET_BITS - 1
+                    counts[(shift << SUB_BUCKET_BITS) + (nanos >> shift)] += 1
+                sums[0] += nanos
+            if failures is not None and (result is None or result is False):
+                failures[name] += 1
+            return result
+        return timed
+
+    @staticmethod
+    def gauges():
+        """
+        Read the gauges from the managers.
+
+        Returns:
+            dict: Idle cabs per city as (city name, count) pairs keyed by city ID, cabs per state name
+                and the number of active bookings.
+        """
+        idle = {}
+        cabs = dict.fromkeys((state.name for state in CabState), 0)
+        for city in list(CityManager.getInstance().cities.values()):
+            counts = city.getCabCounts()
+            idle[city.cityId] = (city.name, counts.get(CabState.IDLE, 0))
+            for state, count in counts.items():
+                cabs[state.name] += count
+        states = Counter(map(attrgetter('state'), list(BookingManager.getInstance().bookings.values())))
+        active = sum(states.values()) - states[BookingState.COMPLETED] - states[BookingState.CANCELLED]
+        return {'idleCabs': idle, 'cabs': cabs, 'activeBookings': active}
+
+    def getMetrics(self):
+        """
+        Get a summary of every metric.
+
+        Returns:
+            dict: Per-operation latency statistics in microseconds, error and failure counts, and the gauges.
+        """
+        latencies = {}
+        for name, histogram in self.latencies.items():
+            count = histogram.count
+            latencies[name] = {
+                'count': count,
+                'meanMicros': histogram.total / count / 1000 if count else 0.0,
+                'p50Micros': histogram.percentile(50) / 1000,
+                'p99Micros': histogram.percentile(99) / 1000,
+                'maxMicros': histogram.max / 1000,
+            }
+        return {'latencies': latencies, 'errors': dict(self.errors), 'failures': dict(self.failures),
+                'gauges': self.gauges()}
+
+    def toPrometheus(self):
+        """
+        Render every metric in the Prometheus text exposition format.
+
+        Latency histograms are written with the same EXPORT_BOUNDS buckets for every
+        operation and every scrape, empty buckets included, so rates and quantiles
+        can be computed across scrapes.
+
+        Returns:
+            str: The metrics, one sample per line.
+        """
+        lines = [f"# HELP {PREFIX}_operation_seconds Latency of cab management operations.",
+                 f"# TYPE {PREFIX}_operation_seconds histogram"]
+        for name, histogram in sorted(self.latencies.items()):
+            label = f'op="{name}"'
+            cumulative = histogram.countsAtOrBelow(EXPORT_BOUNDS + (_MAX_NANOS,))
+            count, total = cumulative.pop()[1], histogram.total  # Count from the same snapshot as the buckets
+            for upper, seen in cumulative:
+                lines.append(f'{PREFIX}_operation_seconds_bucket{{{label},le="{upper / 1e9:.12g}"}} {seen}')
+            lines.append(f'{PREFIX}_operation_seconds_bucket{{{label},le="+Inf"}} {count}')
+            lines.append(f'{PREFIX}_operation_seconds_sum{{{label}}} {total / 1e9:.9g}')
+            lines.append(f'{PREFIX}_operation_seconds_count{{{label}}} {count}')
+        for metric, counts, help_text in (
+                ('operation_errors_total', self.errors, "Operations that raised an exception."),
+                ('operation_failures_total', self.failures, "Operations that returned no result, e.g. no cab available.")):
+            lines.append(f"# HELP {PREFIX}_{metric} {help_text}")
+            lines.append(f"# TYPE {PREFIX}_{metric} counter")
+            for name, value in sorted(counts.items()):
+                lines.append(f'{PREFIX}_{metric}{{op="{name}"}} {value}')
+
+        gauges = self.gauges()
+        lines += [f"# HELP {PREFIX}_idle_cabs Idle cabs per city.", f"# TYPE {PREFIX}_idle_cabs gauge"]
+        for city_id, (name, value) in sorted(gauges['idleCabs'].items()):
+            lines.append(f'{PREFIX}_idle_cabs{{city_id="{city_id}",city="{_escape(name)}"}} {value}')
+        lines += [f"# HELP {PREFIX}_cabs Cabs per state.", f"# TYPE {PREFIX}_cabs gauge"]
+        for state, value in gauges['cabs'].items():
+            lines.append(f'{PREFIX}_cabs{{state="{state}"}} {value}')
+        lines += [f"# HELP {PREFIX}_active_bookings Bookings not completed or cancelled.",
+                  f"# TYPE {PREFIX}_active_bookings gauge",
+                  f"{PREFIX}_active_bookings {gauges['activeBookings']}"]
+        return '\n'.join(lines) + '\n'
+
+    def writePrometheus(self, path):
+        """
+        Write the Prometheus text to a file, replacing it atomically (e.g. for node_exporter's textfile collector).
+
+        Args:
+            path (str): The file to write.
+        """
+        temporary = f"{path}.tmp"
+        with open(temporary, 'w') as f:
+            f.write(self.toPrometheus())
+        os.replace(temporary, path)
+
+    def serve(self, port=9108, host='127.0.0.1'):
+        """
+        Serve the Prometheus text over HTTP from a background thread.
+
+        Args:
+            port (int): The port to listen on, 0 for any free port.
+            host (str): The address to listen on.
+
+        Returns:
+            ThreadingHTTPServer: The running server; call shutdown() to stop it.
+        """
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = registry.toPrometheus().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug("Metrics request: " + format, *args)
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+        logger.info("Serving metrics on http://%s:%s/metrics", host, server.server_address[1])
+        return server
+
+    def reset(self):
+        """
+        Drop every recorded latency and zero the counters.
+        """
+        for histogram in self.latencies.values():
+            histogram.reset()
+        for counts in (self.errors, self.failures):
+            for name in counts:
+                counts[name] = 0
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
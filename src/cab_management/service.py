@@ -0,0 +1,252 @@
+"""
+Booking Service Module
+
+A local asyncio TCP service in front of BookingManager and CabManager.
+
+Each request and response is one line of JSON. Requests carry an "op" field
+and an optional "id" that is echoed back, so clients can pipeline requests
+over one connection:
+
+    {"id": 1, "op": "book", "cityId": 1}
+    {"id": 2, "op": "end", "bookingId": 7}
+    {"id": 3, "op": "update", "cabId": 101, "state": "IDLE", "cityId": 2}
+
+Booking requests that arrive during the same event-loop tick are coalesced
+into a single BookingManager.bookCabs call. At most maxInFlight requests
+per connection are handled or waiting for the client to read their
+response; beyond that the service stops reading from the connection, so a
+client that pipelines without reading is slowed down by TCP flow control
+instead of growing the server's buffers.
+
+Usage:
+    python -m cab_management.service [--host 127.0.0.1] [--port 8765] [--data data/initial_data.json]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+from datetime import datetime
+from .booking_manager import BookingManager
+from .cab_manager import CabManager
+from .city_manager import CityManager
+from .utils import load_initial_data
+from .logging_config import configureLogging
+
+logger = logging.getLogger('cab_management.service')
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_MAX_IN_FLIGHT = 256  # Requests per connection being handled or waiting to be written
+
+
+class BookingCoalescer:
+    """
+    Collects booking requests made during one event-loop tick and books them in one batch.
+
+    Attributes:
+        bookingManager (BookingManager): The manager used to book the batches.
+        pending (list): (request, future) pairs waiting for the next flush.
+        batches (int): Number of batches flushed so far.
+    """
+    def __init__(self, bookingManager):
+        self.bookingManager = bookingManager
+        self.pending = []
+        self.batches = 0
+
+    def book(self, city, start_time=None):
+        """
+        Queue a booking request.
+
+        Args:
+            city (int): The ID of the city where the cab is needed.
+            start_time (datetime, optional): The timestamp when the trip starts.
+
+        Returns:
+            asyncio.Future: Resolves to the booking ID, or None if no cab was available.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if not self.pending:
+            loop.call_soon(self._flush)
+        request = (city, start_time) if start_time is not None else city
+        self.pending.append((request, future))
+        return future
+
+    def _flush(self):
+        """
+        Book every pending request with one bookCabs call and resolve their futures.
+        """
+        pending, self.pending = self.pending, []
+        self.batches += 1
+        try:
+            booking_ids = self.bookingManager.bookCabs([request for request, _ in pending])
+        except Exception as e:
+            logger.error("Batch booking failed: %s", e)
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), booking_id in zip(pending, booking_ids):
+            if not future.done():
+                future.set_result(booking_id)
+
+
+class BookingService:
+    """
+    Serves book, end and update requests over a local TCP socket.
+
+    Attributes:
+        host (str): The interface to listen on.
+        port (int): The port to listen on, 0 to pick a free one.
+        maxInFlight (int): Requests per connection handled at once, counting those whose
+            response is waiting for the client to read.
+        coalescer (BookingCoalescer): Batches booking requests per event-loop tick.
+    """
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, maxInFlight=DEFAULT_MAX_IN_FLIGHT):
+        if maxInFlight < 1:
+            raise ValueError(f"maxInFlight must be positive, got {maxInFlight}")
+        self.host = host
+        self.port = port
+        self.maxInFlight = maxInFlight
+        self.bookingManager = BookingManager.getInstance()
+        self.cabManager = CabManager.getInstance()
+        self.coalescer = BookingCoalescer(self.bookingManager)
+        self.server = None
+
+    async def start(self):
+        """
+        Start listening for connections.
+
+        Returns:
+            int: The port the service is listening on.
+        """
+        self.server = await asyncio.start_server(self._handleConnection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        logger.info("Booking service listening on %s:%s", self.host, self.port)
+        return self.port
+
+    async def serveForever(self):
+        """
+        Start the service if needed and serve until cancelled.
+        """
+        if self.server is None:
+            await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def stop(self):
+        """
+        Stop accepting connections and close the server.
+        """
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    async def _handleConnection(self, reader, writer):
+        tasks = set()
+        in_flight = asyncio.Semaphore(self.maxInFlight)
+
+        def done(task):
+            tasks.discard(task)
+            in_flight.release()
+
+        try:
+            while True:
+                await in_flight.acquire()  # Stop reading while the client is not reading its responses
+                line = await reader.readline()
+                if not line:
+                    in_flight.release()
+                    break
+                task = asyncio.create_task(self._respond(line, writer))
+                tasks.add(task)
+                task.add_done_callback(done)
+            if tasks:
+                await asyncio.gather(*tasks)
+        except ConnectionError as e:
+            logger.warning("Connection closed: %s", e)
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _respond(self, line, writer):
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get("id")
+            response = await self.handle(request)
+        except Exception as e:
+            response = {"ok": False, "error": str(e)}
+        response["id"] = request_id
+        writer.write(json.dumps(response).encode() + b"\n")
+        await writer.drain()  # Keep the in-flight slot until the transport buffer is below its high-water mark
+
+    async def handle(self, request):
+        """
+        Execute one request.
+
+        Args:
+            request (dict): The decoded request.
+
+        Returns:
+            dict: The response to send back.
+        """
+        op = request.get("op")
+        if op == "book":
+            start_time = request.get("startTime")
+            start_time = datetime.fromisoformat(start_time) if start_time else None
+            booking_id = await self.coalescer.book(request["cityId"], start_time)
+            if booking_id is None:
+                return {"ok": False, "error": "No cab available"}
+            return {"ok": True, "bookingId": booking_id}
+        if op == "end":
+            end_time = request.get("endTime")
+            end_time = datetime.fromisoformat(end_time) if end_time else None
+            return {"ok": self.bookingManager.endBooking(request["bookingId"], end_time)}
+        if op == "update":
+            cab_id = request["cabId"]
+            if self.cabManager.getCab(cab_id) is None:
+                return {"ok": False, "error": f"Cab {cab_id} not found"}
+            self.cabManager.updateCab(cab_id, request.get("state"), request.get("cityId"))
+            return {"ok": True}
+        return {"ok": False, "error": f"Unknown op: {op}"}
+
+
+def main():
+    """
+    Run the booking service from the command line.
+    """
+    parser = argparse.ArgumentParser(description="Local cab booking service.")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--data', help="JSON file with initial data to load")
+    parser.add_argument('--cabs', type=int, default=0, help="Register this many synthetic idle cabs")
+    parser.add_argument('--cities', type=int, default=10, help="Number of synthetic cities for --cabs")
+    parser.add_argument('--max-in-flight', type=int, default=DEFAULT_MAX_IN_FLIGHT,
+                        help="Requests per connection handled at once")
+    parser.add_argument('--log-level', default="WARNING")
+    args = parser.parse_args()
+
+    configureLogging(args.log_level)
+    if args.data:
+        load_initial_data(args.data)
+    if args.cabs:
+        city_manager = CityManager.getInstance()
+        cab_manager = CabManager.getInstance()
+        for city_id in range(1, args.cities + 1):
+            city_manager.addCity(city_id, f"City {city_id}")
+        cab_manager.registerCabs((cab_id, cab_id % args.cities + 1) for cab_id in range(1, args.cabs + 1))
+
+    service = BookingService(args.host, args.port, args.max_in_flight)
+    try:
+        asyncio.run(service.serveForever())
+    except KeyboardInterrupt:
+        logger.info("Booking service stopped.")
+
+
+if __name__ == "__main__":
+    main()
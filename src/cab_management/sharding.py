@@ -0,0 +1,394 @@
+"""
+Sharding Module
+
+Runs the fleet in several worker processes, one shard of cities each, so
+that bookings in different cities are dispatched on different cores. Every
+worker holds its own CabManager, CityManager and BookingManager for the
+cities assigned to it. A ShardRouter in the calling process owns the
+city-to-shard assignment, forwards each request to the owning shard and
+sends the requests for all shards before waiting for any reply, so the
+shards work in parallel.
+
+Booking IDs are made unique across shards by numbering them
+local ID * number of shards + shard, so endBooking can be routed from the
+ID alone. Moving a cab to a city on another shard is an explicit handoff:
+the old shard releases the cab with its history and the new shard adopts
+it. Bookings stay on the shard that made them.
+"""
+
+import logging
+import multiprocessing
+import threading
+from .booking import BookingState
+from .booking_manager import BookingManager
+from .cab import Cab
+from .cab_manager import CabManager
+from .city_manager import CityManager
+from .compact_history import CompactHistory, recodeStates, stateTable
+
+logger = logging.getLogger('cab_management.sharding')
+
+
+class ShardError(Exception):
+    """
+    Raised when a shard fails to execute a request.
+
+    Attributes:
+        results (dict): Dictionary mapping the shards whose requests all succeeded to their results.
+    """
+    def __init__(self, message, results=None):
+        super().__init__(message)
+        self.results = results if results is not None else {}
+
+
+class ShardWorker:
+    """
+    Executes routed requests against the managers of one worker process.
+
+    Attributes:
+        shard (int): Number of this shard.
+        numShards (int): Total number of shards.
+    """
+    def __init__(self, shard, numShards):
+        self.shard = shard
+        self.numShards = numShards
+        self.cityManager = CityManager.getInstance()
+        self.cabManager = CabManager.getInstance()
+        self.bookingManager = BookingManager.getInstance()
+
+    def _globalId(self, booking_id):
+        return booking_id * self.numShards + self.shard if booking_id is not None else None
+
+    def addCity(self, cityId, name):
+        self.cityManager.addCity(cityId, name)
+
+    def registerCabs(self, rows, timestamp=None):
+        return self.cabManager.registerCabs(rows, timestamp)
+
+    def bookCabs(self, requests):
+        return [self._globalId(booking_id) for booking_id in self.bookingManager.bookCabs(requests)]
+
+    def endBooking(self, booking_id, end_time=None):
+        if booking_id % self.numShards != self.shard:
+            logger.error("Booking ID %s belongs to another shard than %s", booking_id, self.shard)
+            return False
+        return self.bookingManager.endBooking(booking_id // self.numShards, end_time)
+
+    def updateCab(self, cabId, state=None, cityId=None):
+        self.cabManager.updateCab(cabId, state, cityId)
+
+    def releaseCab(self, cabId, state=None):
+        """
+        Apply a last state change to a cab and remove it from this shard.
+
+        Args:
+            cabId (int): The ID of the cab.
+            state (CabState, optional): The state to set before the cab leaves.
+
+        Returns:
+            dict: Everything adoptCab needs to recreate the cab.
+
+        Raises:
+            ValueError: If the cab is unknown or still has a booking in progress.
+        """
+        cab = self.cabManager.getCab(cabId)
+        if cab is None:
+            raise ValueError(f"Cab {cabId} not found")
+        bookings = self.bookingManager.bookings
+        if any(bookings[booking_id].state != BookingState.COMPLETED for booking_id in cab.bookings
+               if booking_id in bookings):
+            raise ValueError(f"Cab {cabId} has a booking in progress and cannot leave shard {self.shard}")
+        if state:
+            cab.setState(state)
+        self.cabManager.removeCab(cabId)
+        return {'cabId': cabId, 'cityId': cab.cityId, 'state': cab.state, 'history': bytes(cab.history.packed()),
+                'extras': cab.history.extras, 'states': stateTable(),
+                'idleTotal': cab._idleTotal, 'lastTransition': cab._lastTransition}
+
+    def adoptCab(self, released, cityId):
+        """
+        Recreate a cab released by another shard in one of this shard's cities.
+
+        Args:
+            released (dict): The cab, as returned by releaseCab.
+            cityId (int): The city the cab moves to.
+        """
+        history = CompactHistory.fromBytes(released['history'], released['extras'])
+        recodeStates(history.data, released['states'])
+        cab = Cab.fromRow(released['cabId'], cityId, released['state'], released['lastTransition'], history)
+        cab._idleTotal = released['idleTotal']
+        self.cabManager.cabs[cab.cabId] = cab
+        self.cityManager.addCabToCity(cab)
+        if self.cabManager.fleetStore is not None:
+            self.cabManager.fleetStore.add(cab.cabId, cityId, cab.state, cab._lastTransition)
+
+    def getStats(self):
+        return {'cities': len(self.cityManager.cities), 'cabs': len(self.cabManager.cabs),
+                'bookings': len(self.bookingManager.bookings)}
+
+
+def _serveShard(connection, shard, numShards):
+    """
+    Worker process loop: execute batches of (method, args) requests until None is received.
+    """
+    worker = ShardWorker(shard, numShards)
+    while True:
+        requests = connection.recv()
+        if requests is None:
+            break
+        results = []
+        for method, args in requests:
+            try:
+                results.append((True, getattr(worker, method)(*args)))
+            except Exception as e:
+                results.append((False, f"{type(e).__name__}: {e}"))
+        connection.send(results)
+    connection.close()
+
+
+class ShardRouter:
+    """
+    Front end that routes requests to the worker process owning each city.
+
+    Attributes:
+        numShards (int): Number of worker processes.
+        cityShards (dict): Dictionary mapping city IDs to shard numbers.
+        cabShards (dict): Dictionary mapping cab IDs to shard numbers.
+        handoffs (int): Number of cabs moved between shards.
+    """
+    def __init__(self, numShards, context='spawn'):
+        if numShards < 1:
+            raise ValueError(f"numShards must be positive, got {numShards}")
+        self.numShards = numShards
+        self.cityShards = {}
+        self.cabShards = {}
+        self.handoffs = 0
+        self._lock = threading.Lock()  # One request batch in flight per pipe
+        self._connections = []
+        self._processes = []
+        mp_context = multiprocessing.get_context(context)
+        for shard in range(numShards):
+            parent, child = mp_context.Pipe()
+            process = mp_context.Process(target=_serveShard, args=(child, shard, numShards), daemon=True,
+                                         name=f"cab-shard-{shard}")
+            process.start()
+            child.close()
+            self._connections.append(parent)
+            self._processes.append(process)
+        logger.info("Started %s shard processes", numShards)
+
+    def _call(self, requests_by_shard):
+        """
+        Send request batches to several shards, then collect every reply.
+
+        Args:
+            requests_by_shard (dict): Dictionary mapping shard numbers to lists of (method, args) requests.
+
+        Returns:
+            dict: Dictionary mapping shard numbers to lists of results, in request order.
+
+        Raises:
+            ShardError: If a request failed in its shard, once every reply has been collected. Its
+                results hold the replies of the shards whose requests all succeeded.
+        """
+        with self._lock:
+            for shard, requests in requests_by_shard.items():
+                self._connections[shard].send(requests)
+            replies = {shard: self._connections[shard].recv() for shard in requests_by_shard}
+        results = {}
+        errors = []
+        for shard, reply in replies.items():
+            failures = [value for ok, value in reply if not ok]
+            if failures:
+                errors.append(f"Shard {shard}: {failures[0]}")
+            else:
+                results[shard] = [value for _, value in reply]
+        if errors:
+            raise ShardError("; ".join(errors), results)
+        return results
+
+    def _callOne(self, shard, method, *args):
+        return self._call({shard: [(method, args)]})[shard][0]
+
+    def addCity(self, cityId, name, shard=None):
+        """
+        Add a city to a shard.
+
+        Args:
+            cityId (int): Unique identifier for the city.
+            name (str): Name of the city.
+            shard (int, optional): The shard to own the city. If None, cities are dealt round-robin.
+        """
+        if shard is None:
+            shard = len(self.cityShards) % self.numShards
+        self._callOne(shard, 'addCity', cityId, name)
+        self.cityShards[cityId] = shard
+
+    def registerCabs(self, rows, timestamp=None):
+        """
+        Register many cabs in the shards owning their cities.
+
+        Args:
+            rows (iterable): (cabId, cityId) or (cabId, cityId, state) tuples.
+            timestamp (datetime, optional): Registration time recorded in every cab's history.
+
+        Returns:
+            int: The number of cabs registered.
+
+        Raises:
+            ValueError: If a row names an unknown city.
+            ShardError: If a shard rejected its rows. The cabs registered by the other shards are
+                still routed to them.
+        """
+        rows_by_shard = {}
+        for row in rows:
+            shard = self.cityShards.get(row[1])
+            if shard is None:
+                raise ValueError(f"Cannot register cab {row[0]}: City ID={row[1]} not found.")
+            rows_by_shard.setdefault(shard, []).append(row)
+        results = {}
+        try:
+            results = self._call({shard: [('registerCabs', (shard_rows, timestamp))]
+                                  for shard, shard_rows in rows_by_shard.items()})
+        except ShardError as e:
+            results = e.results
+            raise
+        finally:
+            for shard in results:  # A shard registers all of its rows or none
+                for row in rows_by_shard[shard]:
+                    self.cabShards[row[0]] = shard
+        return sum(result[0] for result in results.values())
+
+    def registerCab(self, cabId, cityId):
+        """
+        Register a new cab.
+
+        Args:
+            cabId (int): Unique identifier for the cab.
+            cityId (int): Initial city ID of the cab.
+        """
+        self.registerCabs([(cabId, cityId)])
+
+    def bookCab(self, city, start_time=None):
+        """
+        Book a cab in the specified city.
+
+        Args:
+            city (int): The ID of the city where the cab is needed.
+            start_time (datetime, optional): The timestamp when the trip starts.
+
+        Returns:
+            int: The booking ID, or None if no cab was available.
+        """
+        return self.bookCabs([(city, start_time)])[0]
+
+    def bookCabs(self, requests):
+        """
+        Book cabs for many requests, with every shard booking its share in parallel.
+
+        Args:
+            requests (list): City IDs, or (city ID, start_time) tuples.
+
+        Returns:
+            list: The booking ID for each request, in request order, or None where no cab was available.
+        """
+        results = [None] * len(requests)
+        positions_by_shard = {}
+        requests_by_shard = {}
+        for position, request in enumerate(requests):
+            city = request[0] if isinstance(request, tuple) else request
+            shard = self.cityShards.get(city)
+            if shard is None:
+                logger.warning("City %s not found, request not booked", city)
+                continue
+            positions_by_shard.setdefault(shard, []).append(position)
+            requests_by_shard.setdefault(shard, []).append(request)
+        replies = self._call({shard: [('bookCabs', (shard_requests,))]
+                              for shard, shard_requests in requests_by_shard.items()})
+        for shard, reply in replies.items():
+            for position, booking_id in zip(positions_by_shard[shard], reply[0]):
+                results[position] = booking_id
+        return results
+
+    def endBooking(self, booking_id, end_time=None):
+        """
+        End a booking in the shard that made it.
+
+        Args:
+            booking_id (int): The ID of the booking to end.
+            end_time (datetime, optional): The timestamp when the trip ends.
+
+        Returns:
+            bool: True if the booking was ended, False if it was not found.
+        """
+        return self._callOne(booking_id % self.numShards, 'endBooking', booking_id, end_time)
+
+    def updateCab(self, cabId, state=None, cityId=None):
+        """
+        Update the state or location of a cab, handing it off if its new city is on another shard.
+
+        Args:
+            cabId (int): Unique identifier for the cab.
+            state (CabState, optional): The new state of the cab.
+            cityId (int, optional): The new city ID of the cab.
+
+        Returns:
+            bool: True if the cab was updated, False if it was not found.
+
+        Raises:
+            ShardError: If the cab has a booking in progress and would change shards, or if the new
+                shard failed to adopt it, in which case the cab is returned to its old shard.
+        """
+        shard = self.cabShards.get(cabId)
+        if shard is None:
+            logger.warning("Cab %s not found", cabId)
+            return False
+        target = self.cityShards.get(cityId, shard) if cityId else shard
+        if target == shard:
+            self._callOne(shard, 'updateCab', cabId, state, cityId)
+            return True
+        released = self._callOne(shard, 'releaseCab', cabId, state)
+        try:
+            self._callOne(target, 'adoptCab', released, cityId)
+        except ShardError:
+            self._callOne(shard, 'adoptCab', released, released['cityId'])  # Put the cab back where it was
+            raise
+        self.cabShards[cabId] = target
+        self.handoffs += 1
+        logger.info("Cab %s handed off from shard %s to shard %s", cabId, shard, target)
+        return True
+
+    def getStats(self):
+        """
+        Get the number of cities, cabs and bookings held by each shard.
+
+        Returns:
+            list: One dictionary per shard.
+        """
+        replies = self._call({shard: [('getStats', ())] for shard in range(self.numShards)})
+        return [replies[shard][0] for shard in range(self.numShards)]
+
+    def close(self):
+        """
+        Stop the worker processes.
+        """
+        with self._lock:
+            for connection in self._connections:
+                try:
+                    connection.send(None)
+                except (BrokenPipeError, OSError):
+                    pass
+            for process in self._processes:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+            for connection in self._connections:
+                connection.close()
+            self._connections, self._processes = [], []
+        logger.info("Stopped shard processes")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,428 @@
+"""
+Snapshot Module
+
+Binary snapshot and restore of the CityManager, CabManager and
+BookingManager state.
+
+The snapshot is one file of fixed-width, 8-byte aligned little-endian
+columns: one column per attribute of the cities, cabs and bookings, plus
+the packed cab histories copied byte for byte from CompactHistory. Objects
+refer to each other by their position in the file, so the object graph
+(including cabs and cities that bookings still refer to after they were
+replaced in a manager) is restored exactly. restore() maps the file and
+reads the columns in place, building every object in a single pass.
+
+The few values that do not fit a column (timestamps kept as-is, and the
+state table of the packed histories) are written as one JSON column with
+datetimes and CabStates tagged, so reading a snapshot never runs code from
+the file.
+
+Usage:
+    snapshot("fleet.snap")
+    restore("fleet.snap")
+"""
+
+from array import array
+from datetime import datetime, timedelta
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+from .booking import Booking, BookingState
+from .booking_manager import BookingManager
+from .cab import Cab, CabState
+from .cab_manager import CabManager
+from .city import City
+from .city_manager import CityManager
+from .compact_history import CompactHistory, recodeStates, stateTable
+from .history_index import toMicros
+
+logger = logging.getLogger('cab_management.snapshot')
+
+MAGIC = b'CABSNAP\0'
+VERSION = 2
+
+_HEADER = struct.Struct('<8sI4xqqqqqq')  # magic, version, counts and booking counter
+_COLUMN = struct.Struct('<cxxxxxxxq')  # typecode, byte length
+_EPOCH = datetime(1970, 1, 1)
+
+CAB_STATES = list(CabState)
+CAB_STATE_CODES = {state: code for code, state in enumerate(CAB_STATES)}
+BOOKING_STATES = list(BookingState)
+BOOKING_STATE_CODES = {state: code for code, state in enumerate(BOOKING_STATES)}
+
+# Timestamp kinds, stored in a byte column next to the microseconds column
+_NONE = 0
+_DATETIME = 1
+_ISO_STRING = 2  # ISO string that round-trips through datetime.isoformat
+_OTHER = 3  # Anything else, kept in the extras column
+
+
+class SnapshotError(Exception):
+    """
+    Raised when a file is not a snapshot this version can read.
+    """
+
+
+class _TimestampColumns:
+    """
+    Kind and microseconds columns for one timestamp attribute.
+    """
+    def __init__(self, name, extras):
+        self.name = name
+        self.kinds = array('b')
+        self.micros = array('q')
+        self.extras = extras
+
+    def append(self, timestamp):
+        kind, micros = _NONE, 0
+        if timestamp is not None:
+            kind = _OTHER
+            if type(timestamp) is datetime and timestamp.tzinfo is None:
+                kind, micros = _DATETIME, toMicros(timestamp)
+            elif isinstance(timestamp, str):
+                micros = toMicros(timestamp)
+                if micros is not None and _decodeMicros(micros).isoformat() == timestamp:
+                    kind = _ISO_STRING
+                else:
+                    micros = 0
+            if kind == _OTHER:
+                self.extras[(self.name, len(self.kinds))] = timestamp
+        self.kinds.append(kind)
+        self.micros.append(micros)
+
+
+def _encodeExtra(value):
+    """
+    Convert a timestamp kept as-is, or a history state, to a JSON value.
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, datetime):
+        return {'datetime': value.isoformat()}
+    if isinstance(value, CabState):
+        return {'CabState': value.name}
+    logger.warning("Snapshot keeps %r of type %s as a string", value, type(value).__name__)
+    return str(value)
+
+
+def _decodeExtra(value):
+    if isinstance(value, dict):
+        if 'datetime' in value:
+            return datetime.fromisoformat(value['datetime'])
+        return CabState[value['CabState']]
+    return value
+
+
+def _encodeExtras(extras):
+    """
+    Encode the extras column as JSON, keyed by attribute name and position.
+    """
+    document = {'historyStates': [_encodeExtra(state) for state in extras['historyStates']]}
+    for key, value in extras.items():
+        if key == 'historyStates':
+            continue
+        name, position = key
+        if name == 'history':
+            value = {str(entry): _encodeExtra(timestamp) for entry, timestamp in value.items()}
+        else:
+            value = _encodeExtra(value)
+        document.setdefault(name, {})[str(position)] = value
+    return json.dumps(document, separators=(',', ':')).encode()
+
+
+def _decodeExtras(data):
+    """
+    Decode the extras column written by _encodeExtras.
+
+    Raises:
+        SnapshotError: If the column is not valid.
+    """
+    try:
+        document = json.loads(bytes(data))
+        extras = {'historyStates': [_decodeExtra(state) for state in document.pop('historyStates')]}
+        for name, values in document.items():
+            for position, value in values.items():
+                if name == 'history':
+                    value = {int(entry): _decodeExtra(timestamp) for entry, timestamp in value.items()}
+                else:
+                    value = _decodeExtra(value)
+                extras[(name, int(position))] = value
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        raise SnapshotError(f"Invalid extras column: {e}") from None
+    return extras
+
+
+def _decodeMicros(micros):
+    return _EPOCH + timedelta(microseconds=micros)
+
+
+def _decodeTimestamp(kind, micros, extras, key):
+    if kind == _DATETIME:
+        return _decodeMicros(micros)
+    if kind == _ISO_STRING:
+        return _decodeMicros(micros).isoformat()
+    if kind == _OTHER:
+        return extras[key]
+    return None
+
+
+def _decodeColumn(kinds, micros, extras, name):
+    """
+    Decode a kind column and a microseconds column into a list of timestamps.
+    """
+    raw = kinds.tobytes()
+    if raw.count(_DATETIME) + raw.count(_NONE) == len(raw):
+        epoch, delta = _EPOCH, timedelta
+        return [epoch + delta(0, 0, value) if kind else None for kind, value in zip(raw, micros)]
+    return [_decodeTimestamp(kind, value, extras, (name, position))
+            for position, (kind, value) in enumerate(zip(kinds, micros))]
+
+
+def _writeColumn(file, column):
+    """
+    Write an array or bytes object as one column, padded to 8 bytes.
+    """
+    if isinstance(column, array):
+        typecode = column.typecode
+        if sys.byteorder != 'little' and column.itemsize > 1:
+            column = array(typecode, column)
+            column.byteswap()
+        data = column.tobytes()
+    else:
+        typecode, data = 'B', bytes(column)
+    file.write(_COLUMN.pack(typecode.encode(), len(data)))
+    file.write(data)
+    file.write(b'\0' * (-len(data) % 8))
+
+
+class _ColumnReader:
+    """
+    Reads the columns of a snapshot in order as memoryviews over the mapped file.
+    """
+    def __init__(self, buffer, offset):
+        self.buffer = buffer
+        self.offset = offset
+        self.views = []  # Released before the file is unmapped
+
+    def next(self):
+        typecode, length = _COLUMN.unpack_from(self.buffer, self.offset)
+        start = self.offset + _COLUMN.size
+        self.offset = start + length + (-length % 8)
+        view = self.buffer[start:start + length]
+        typecode = typecode.decode()
+        if typecode != 'B':
+            if sys.byteorder != 'little' and array(typecode).itemsize > 1:
+                column = array(typecode, view.tobytes())
+                column.byteswap()
+                view.release()
+                view = memoryview(column)
+            else:
+                view = view.cast(typecode)
+        self.views.append(view)
+        return view
+
+    def release(self):
+        for view in self.views:
+            view.release()
+        self.views.clear()
+
+
+def snapshot(path):
+    """
+    Write the state of all managers to a binary snapshot file.
+
+    The file is written next to path and then renamed over it, so an existing
+    snapshot is only replaced by a complete one.
+
+    Args:
+        path (str): The path of the snapshot file.
+
+    Returns:
+        dict: Dictionary mapping "cities", "cabs" and "bookings" to the number of objects written.
+    """
+    city_manager = CityManager.getInstance()
+    cab_manager = CabManager.getInstance()
+    booking_manager = BookingManager.getInstance()
+
+    # Number every object; registered ones first, then the ones only reachable from other objects
+    cities = list(city_manager.cities.values())
+    cabs = list(cab_manager.cabs.values())
+    bookings = list(booking_manager.bookings.values())
+    city_index = {id(city): position for position, city in enumerate(cities)}
+    cab_index = {id(cab): position for position, cab in enumerate(cabs)}
+    for booking in bookings:
+        if id(booking.cab) not in cab_index:
+            cab_index[id(booking.cab)] = len(cabs)
+            cabs.append(booking.cab)
+    for city in [cab._city for cab in cabs] + [booking.city for booking in bookings]:
+        if city is not None and id(city) not in city_index:
+            city_index[id(city)] = len(cities)
+            cities.append(city)
+
+    extras = {}
+    city_ids = array('q', (city.cityId for city in cities))
+    names = [city.name.encode() for city in cities]
+    name_offsets = array('q', [0])
+    for name in names:
+        name_offsets.append(name_offsets[-1] + len(name))
+
+    cab_ids = array('q')
+    cab_city_ids = array('q')
+    cab_cities = array('q')
+    cab_states = array('b')
+    idle_totals = array('q')
+    last_transitions = _TimestampColumns('lastTransition', extras)
+    history_offsets = array('q', [0])
+    history_data = bytearray()
+    booking_offsets = array('q', [0])
+    cab_bookings = array('q')
+    for position, cab in enumerate(cabs):
+        cab_ids.append(cab.cabId)
+        cab_city_ids.append(cab.cityId)
+        cab_cities.append(city_index[id(cab._city)] if cab._city is not None else -1)
+        cab_states.append(CAB_STATE_CODES[cab.state])
+        idle_totals.append(cab._idleTotal // timedelta(microseconds=1))
+        last_transitions.append(cab._lastTransition)
+        history_data += cab.history.packed()
+        history_offsets.append(len(history_data))
+        if cab.history.extras:
+            extras[('history', position)] = cab.history.extras
+        cab_bookings.extend(cab.bookings)
+        booking_offsets.append(len(cab_bookings))
+
+    booking_ids = array('q')
+    booking_cabs = array('q')
+    booking_cities = array('q')
+    booking_states = array('b')
+    start_times = _TimestampColumns('start_time', extras)
+    end_times = _TimestampColumns('end_time', extras)
+    for booking in bookings:
+        booking_ids.append(booking.bookingId)
+        booking_cabs.append(cab_index[id(booking.cab)])
+        booking_cities.append(city_index[id(booking.city)])
+        booking_states.append(BOOKING_STATE_CODES[booking.state])
+        start_times.append(booking.start_time)
+        end_times.append(booking.end_time)
+
+    extras['historyStates'] = stateTable()  # Codes used in the packed histories
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, 'wb') as file:
+        file.write(_HEADER.pack(MAGIC, VERSION, len(cities), len(city_manager.cities), len(cabs),
+                                len(cab_manager.cabs), len(bookings), Booking._booking_counter))
+        for column in (city_ids, name_offsets, b''.join(names),
+                       cab_ids, cab_city_ids, cab_cities, cab_states, idle_totals,
+                       last_transitions.kinds, last_transitions.micros,
+                       history_offsets, history_data, booking_offsets, cab_bookings,
+                       booking_ids, booking_cabs, booking_cities, booking_states,
+                       start_times.kinds, start_times.micros, end_times.kinds, end_times.micros,
+                       _encodeExtras(extras)):
+            _writeColumn(file, column)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary_path, path)
+
+    logger.info("Snapshot of %s cities, %s cabs and %s bookings written to %s", len(cities), len(cabs), len(bookings), path)
+    return {'cities': len(cities), 'cabs': len(cabs), 'bookings': len(bookings)}
+
+
+def restore(path):
+    """
+    Replace the state of all managers with the contents of a snapshot file.
+
+    The manager singletons are kept; their cities, cabs and bookings are replaced.
+    A fleet store that is enabled on the CabManager is rebuilt.
+
+    Args:
+        path (str): The path of the snapshot file.
+
+    Returns:
+        dict: Dictionary mapping "cities", "cabs" and "bookings" to the number of objects restored.
+
+    Raises:
+        SnapshotError: If the file is not a snapshot of a supported version.
+    """
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        buffer = memoryview(mapped)
+        try:
+            counts = _restoreFrom(buffer)
+        finally:
+            buffer.release()
+    logger.info("Restored %s cities, %s cabs and %s bookings from %s", counts['cities'], counts['cabs'], counts['bookings'], path)
+    return counts
+
+
+def _restoreFrom(buffer):
+    if len(buffer) < _HEADER.size:
+        raise SnapshotError("File is too short to be a snapshot")
+    magic, version, num_cities, registered_cities, num_cabs, registered_cabs, num_bookings, booking_counter = \
+        _HEADER.unpack_from(buffer)
+    if magic != MAGIC:
+        raise SnapshotError("File is not a cab management snapshot")
+    if version != VERSION:
+        raise SnapshotError(f"Unsupported snapshot version {version}")
+
+    reader = _ColumnReader(buffer, _HEADER.size)
+    try:
+        city_ids, name_offsets, names = reader.next(), reader.next(), reader.next()
+        cab_ids, cab_city_ids, cab_cities, cab_states, idle_totals = (reader.next() for _ in range(5))
+        last_kinds, last_micros = reader.next(), reader.next()
+        history_offsets, histories, booking_offsets, cab_bookings = (reader.next() for _ in range(4))
+        booking_ids, booking_cabs, booking_cities, booking_states = (reader.next() for _ in range(4))
+        start_kinds, start_micros, end_kinds, end_micros = (reader.next() for _ in range(4))
+        extras = _decodeExtras(reader.next())
+        if extras['historyStates'] != stateTable()[:len(extras['historyStates'])]:
+            histories = bytearray(histories)  # Written with other state codes
+            recodeStates(histories, extras['historyStates'])
+
+        cities = [City(city_ids[position], bytes(names[name_offsets[position]:name_offsets[position + 1]]).decode())
+                  for position in range(num_cities)]
+
+        cabs = []
+        members = [[] for _ in range(num_cities)]  # city position -> cabs to add
+        last_transitions = _decodeColumn(last_kinds, last_micros, extras, 'lastTransition')
+        for position in range(num_cabs):
+            history = CompactHistory.fromBytes(histories[history_offsets[position]:history_offsets[position + 1]],
+                                               extras.get(('history', position)))
+            cab = Cab.fromRow(cab_ids[position], cab_city_ids[position], CAB_STATES[cab_states[position]],
+                              last_transitions[position], history)
+            cab._idleTotal = timedelta(microseconds=idle_totals[position])
+            cab.bookings = cab_bookings[booking_offsets[position]:booking_offsets[position + 1]].tolist()
+            if cab_cities[position] >= 0:
+                members[cab_cities[position]].append(cab)
+            cabs.append(cab)
+        for city, city_cabs in zip(cities, members):
+            if city_cabs:
+                city.addCabs(city_cabs)
+
+        bookings = {}
+        from_row = Booking.fromRow
+        for booking_id, cab_position, city_position, state, start_time, end_time in zip(
+                booking_ids, booking_cabs, booking_cities, booking_states,
+                _decodeColumn(start_kinds, start_micros, extras, 'start_time'),
+                _decodeColumn(end_kinds, end_micros, extras, 'end_time')):
+            bookings[booking_id] = from_row(booking_id, cabs[cab_position], cities[city_position],
+                                            BOOKING_STATES[state], start_time, end_time)
+    finally:
+        reader.release()
+
+    city_manager = CityManager.getInstance()
+    cab_manager = CabManager.getInstance()
+    booking_manager = BookingManager.getInstance()
+    city_manager.cities = {city.cityId: city for city in cities[:registered_cities]}
+    cab_manager.cabs = {cab.cabId: cab for cab in cabs[:registered_cabs]}
+    booking_manager.bookings = bookings
+    booking_manager.rebuildDemandCounters()
+    with Booking._booking_counter_lock:
+        Booking._booking_counter = booking_counter
+    if cab_manager.fleetStore is not None:
+        cab_manager.disableFleetStore()
+        cab_manager.enableFleetStore()
+    if cab_manager.historySegments is not None:
+        cab_manager.enableHistorySpill()
+    if booking_manager.bookingColumns is not None:
+        booking_manager.disableBookingColumns()
+        booking_manager.enableBookingColumns()
+    return {'cities': num_cities, 'cabs': num_cabs, 'bookings': num_bookings}
@@ -0,0 +1,475 @@
+"""
+SQLite Store Module
+
+Optional SQLite persistence for the CityManager, CabManager and
+BookingManager state.
+
+SQLiteStore attaches to the managers the same way a Journal does and
+receives the same events. Events only update in-memory buffers: the latest
+row of every changed cab and booking, and the new history entries. They
+run inside Cab.stateListeners under the city locks of bookCab and
+endBooking, so they never touch the database: a writer thread takes the
+buffers every flushInterval seconds, or as soon as they reach batchSize
+rows, and writes them with executemany in one transaction, the same way
+the journal's group commit works. A book + end cycle therefore costs a few
+dictionary updates on the caller's thread. Timestamps are stored as
+integer microseconds since the epoch, and the start hour of every booking
+is stored as well, on the same wall clock Analytics.highDemandCities uses.
+
+The tables are indexed on cabs (cityId, state), cab_history (cabId,
+timestamp) and bookings (start_time), so fleet and booking analytics can
+be answered in SQL instead of Python loops.
+"""
+
+from datetime import datetime, timedelta
+import logging
+import sqlite3
+import threading
+from .booking import Booking, BookingState
+from .booking_columns import wallMicros
+from .booking_manager import BookingManager
+from .cab import Cab, CabState
+from .cab_manager import CabManager
+from .city import City
+from .city_manager import CityManager
+from .history_index import toMicros
+
+logger = logging.getLogger('cab_management.sqlite_store')
+
+DEFAULT_BATCH_SIZE = 5000  # Buffered rows that wake the writer early
+DEFAULT_FLUSH_INTERVAL = 1.0  # Seconds the writer waits between flushes
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROS_PER_HOUR = 3600 * 10**6
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cities (
+    cityId INTEGER PRIMARY KEY,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cabs (
+    cabId INTEGER PRIMARY KEY,
+    cityId INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    lastTransition INTEGER
+);
+CREATE INDEX IF NOT EXISTS cabs_city_state ON cabs (cityId, state);
+CREATE TABLE IF NOT EXISTS cab_history (
+    cabId INTEGER NOT NULL,
+    timestamp INTEGER,
+    state TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cab_history_cab_time ON cab_history (cabId, timestamp);
+CREATE TABLE IF NOT EXISTS bookings (
+    bookingId INTEGER PRIMARY KEY,
+    cabId INTEGER NOT NULL,
+    cityId INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    start_time INTEGER,
+    end_time INTEGER,
+    start_hour INTEGER
+);
+CREATE INDEX IF NOT EXISTS bookings_start_time ON bookings (start_time);
+"""
+
+
+def _micros(timestamp):
+    if type(timestamp) is datetime and timestamp.tzinfo is None:
+        return (timestamp - _EPOCH) // timedelta(microseconds=1)
+    return toMicros(timestamp) if timestamp is not None else None
+
+
+def _hour(start_time):
+    micros = wallMicros(start_time)
+    return micros // _MICROS_PER_HOUR % 24 if micros is not None else None
+
+
+def _datetime(micros):
+    return _EPOCH + timedelta(microseconds=micros) if micros is not None else None
+
+
+class SQLiteStore:
+    """
+    SQLite persistence backend with buffered writes from a writer thread.
+
+    Attributes:
+        path (str): The path of the database file.
+        batchSize (int): Number of buffered rows that wakes the writer before flushInterval has passed.
+        flushInterval (float): Seconds the writer waits between flushes.
+        connection (sqlite3.Connection): The database connection.
+        flushes (int): Number of flushes so far.
+        rowsWritten (int): Number of rows written so far.
+        error (sqlite3.Error): The error that stopped the writer, or None.
+    """
+    def __init__(self, path, batchSize=DEFAULT_BATCH_SIZE, flushInterval=DEFAULT_FLUSH_INTERVAL):
+        self.path = path
+        self.batchSize = batchSize
+        self.flushInterval = flushInterval
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        self.flushes = 0
+        self.rowsWritten = 0
+        self.error = None
+        self._lock = threading.Lock()  # Guards the buffers, held only to update or swap them
+        self._writeLock = threading.RLock()  # Guards the connection and keeps flushes in order
+        self._cities = {}  # cityId -> name
+        self._removedCities = set()  # cityId, deleted before the buffered rows are written
+        self._cabs = {}  # cabId -> (cityId, state, lastTransition)
+        self._moves = {}  # cabId -> cityId, for cabs without a buffered row
+        self._history = []  # (cabId, timestamp, state)
+        self._bookings = {}  # bookingId -> (cabId, cityId, state, start_time, end_time)
+        self._pending = 0
+        self._wake = threading.Event()
+        self._closing = False
+        self._writer = threading.Thread(target=self._run, name='sqlite-writer', daemon=True)
+        self._writer.start()
+
+    def attach(self, saveExisting=True):
+        """
+        Start persisting the events of the manager singletons.
+
+        Args:
+            saveExisting (bool): First replace the database contents with the current state of the managers.
+
+        Returns:
+            SQLiteStore: This store.
+        """
+        if saveExisting:
+            self.saveAll()
+        CityManager.getInstance().journal = self
+        CabManager.getInstance().journal = self
+        BookingManager.getInstance().journal = self
+        Cab.stateListeners.append(self.cabStateChanged)
+        logger.info("SQLite store %s attached", self.path)
+        return self
+
+    def detach(self):
+        """
+        Stop persisting manager events and flush the buffered rows.
+        """
+        for manager in (CityManager.getInstance(), CabManager.getInstance(), BookingManager.getInstance()):
+            if manager.journal is self:
+                manager.journal = None
+        if self.cabStateChanged in Cab.stateListeners:
+            Cab.stateListeners.remove(self.cabStateChanged)
+        self.flush()
+
+    def close(self):
+        """
+        Detach, flush, stop the writer and close the database.
+        """
+        self.detach()
+        self._closing = True
+        self._wake.set()
+        self._writer.join()
+        self.connection.close()
+        logger.info("SQLite store %s closed after %s rows in %s flushes", self.path, self.rowsWritten, self.flushes)
+
+    def __enter__(self):
+        return self.attach()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    # Events, with the same interface as Journal
+
+    def cityAdded(self, cityId, name):
+        with self._lock:
+            self._cities[cityId] = name
+            self._removedCities.discard(cityId)
+            self._added(1)
+
+    def cityRemoved(self, cityId):
+        with self._lock:
+            self._cities.pop(cityId, None)
+            self._removedCities.add(cityId)
+            self._added(1)
+
+    def cabRegistered(self, cab):
+        micros = _micros(cab._lastTransition)
+        with self._lock:
+            self._cabs[cab.cabId] = (cab.cityId, cab.state.name, micros)
+            self._moves.pop(cab.cabId, None)
+            self._history.append((cab.cabId, micros, cab.state.name))
+            self._added(2)
+
+    def cabStateChanged(self, cab, previous_state, timestamp):
+        """
+        Cab.stateListeners callback.
+        """
+        micros = _micros(timestamp)
+        with self._lock:
+            self._cabs[cab.cabId] = (cab.cityId, cab.state.name, micros)
+            self._moves.pop(cab.cabId, None)
+            self._history.append((cab.cabId, micros, cab.state.name))
+            self._added(2)
+
+    def cabMoved(self, cabId, cityId):
+        with self._lock:
+            row = self._cabs.get(cabId)
+            if row is not None:
+                self._cabs[cabId] = (cityId,) + row[1:]
+            else:
+                self._moves[cabId] = cityId
+            self._added(1)
+
+    def bookingCreated(self, booking):
+        self._bookingChanged(booking)
+
+    def bookingEnded(self, booking):
+        self._bookingChanged(booking)
+
+    def _bookingChanged(self, booking):
+        row = (booking.cab.cabId, booking.city.cityId, booking.state.name,
+               _micros(booking.start_time), _micros(booking.end_time), _hour(booking.start_time))
+        with self._lock:
+            self._bookings[booking.bookingId] = row
+            self._added(1)
+
+    def _added(self, rows):
+        self._pending += rows
+        if self._pending >= self.batchSize:
+            self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flushInterval)
+            self._wake.clear()
+            closing = self._closing
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                logger.error("Failed to write SQLite store %s: %s", self.path, e)
+                self.error = e
+                return
+            if closing:
+                return
+
+    def flush(self):
+        """
+        Write every buffered row in one transaction.
+
+        The buffers are swapped out under the buffer lock and written after it
+        is released, so events keep buffering while the transaction runs.
+        """
+        with self._writeLock:
+            with self._lock:
+                if not self._pending:
+                    return
+                cities, removed, cabs, moves, history, bookings = (
+                    self._cities, self._removedCities, self._cabs, self._moves, self._history, self._bookings)
+                self._cities, self._cabs, self._moves, self._history, self._bookings = {}, {}, {}, [], {}
+                self._removedCities = set()
+                self._pending = 0
+            with self.connection:
+                execute = self.connection.executemany
+                execute("DELETE FROM cities WHERE cityId = ?", [(cityId,) for cityId in removed])
+                execute("INSERT OR REPLACE INTO cities (cityId, name) VALUES (?, ?)", cities.items())
+                execute("INSERT OR REPLACE INTO cabs (cabId, cityId, state, lastTransition) VALUES (?, ?, ?, ?)",
+                        [(cabId,) + row for cabId, row in cabs.items()])
+                execute("UPDATE cabs SET cityId = ? WHERE cabId = ?", [(cityId, cabId) for cabId, cityId in moves.items()])
+                execute("INSERT INTO cab_history (cabId, timestamp, state) VALUES (?, ?, ?)", history)
+                execute("INSERT OR REPLACE INTO bookings (bookingId, cabId, cityId, state, start_time, end_time, "
+                        "start_hour) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        [(bookingId,) + row for bookingId, row in bookings.items()])
+            self.rowsWritten += len(cities) + len(removed) + len(cabs) + len(moves) + len(history) + len(bookings)
+            self.flushes += 1
+
+    def saveAll(self):
+        """
+        Replace the database contents with the current state of the managers.
+        """
+        cities = CityManager.getInstance().cities
+        cabs = CabManager.getInstance().cabs
+        bookings = BookingManager.getInstance().bookings
+        with self._writeLock:
+            self.flush()
+            with self.connection:
+                for table in ('cities', 'cabs', 'cab_history', 'bookings'):
+                    self.connection.execute(f"DELETE FROM {table}")
+                self.connection.executemany("INSERT INTO cities (cityId, name) VALUES (?, ?)",
+                                            ((city.cityId, city.name) for city in cities.values()))
+                self.connection.executemany(
+                    "INSERT INTO cabs (cabId, cityId, state, lastTransition) VALUES (?, ?, ?, ?)",
+                    ((cab.cabId, cab.cityId, cab.state.name, _micros(cab._lastTransition)) for cab in cabs.values()))
+                self.connection.executemany(
+                    "INSERT INTO cab_history (cabId, timestamp, state) VALUES (?, ?, ?)",
+                    ((cab.cabId, _micros(timestamp), state.name) for cab in cabs.values() for timestamp, state in cab.history))
+                self.connection.executemany(
+                    "INSERT INTO bookings (bookingId, cabId, cityId, state, start_time, end_time, start_hour) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    ((booking.bookingId, booking.cab.cabId, booking.city.cityId, booking.state.name,
+                      _micros(booking.start_time), _micros(booking.end_time), _hour(booking.start_time))
+                     for booking in bookings.values()))
+        logger.info("Saved %s cities, %s cabs and %s bookings to %s", len(cities), len(cabs), len(bookings), self.path)
+
+    def load(self):
+        """
+        Replace the state of all managers with the contents of the database.
+
+        Timestamps are loaded as datetimes. Cabs are rebuilt from their history,
+        so their idle totals are recomputed. History rows without a timestamp are
+        skipped with a warning rather than stamped with the load time, and a cab
+        left without any history is skipped together with its bookings.
+
+        Returns:
+            dict: Dictionary mapping "cities", "cabs" and "bookings" to the number of objects loaded.
+
+        Raises:
+            ValueError: If a journal or store is attached to the managers.
+        """
+        city_manager = CityManager.getInstance()
+        cab_manager = CabManager.getInstance()
+        booking_manager = BookingManager.getInstance()
+        if city_manager.journal or cab_manager.journal or booking_manager.journal:
+            raise ValueError("Detach the journal or store before loading into the managers")
+        self.flush()
+
+        cities = {cityId: City(cityId, name) for cityId, name in self.connection.execute("SELECT cityId, name FROM cities")}
+        cab_cities = dict(self.connection.execute("SELECT cabId, cityId FROM cabs"))
+        cabs = {}
+        untimed = 0
+        for cabId, micros, state in self.connection.execute(
+                "SELECT cabId, timestamp, state FROM cab_history ORDER BY cabId, rowid"):
+            if micros is None:
+                untimed += 1
+                continue
+            cab = cabs.get(cabId)
+            if cab is None:
+                cabs[cabId] = Cab.fromRow(cabId, cab_cities.get(cabId), CabState[state], _datetime(micros))
+            else:
+                cab._changeState(CabState[state], _datetime(micros))
+        if untimed:
+            logger.warning("Skipped %s cab history rows without a timestamp in %s", untimed, self.path)
+        bookings = {}
+        for bookingId, cabId, cityId, state, start_time, end_time in self.connection.execute(
+                "SELECT bookingId, cabId, cityId, state, start_time, end_time FROM bookings ORDER BY bookingId"):
+            cab = cabs.get(cabId)
+            if cab is None:
+                logger.warning("Skipped booking %s: cab %s has no history with a timestamp", bookingId, cabId)
+                continue
+            bookings[bookingId] = Booking.fromRow(bookingId, cab, cities[cityId], BookingState[state],
+                                                  _datetime(start_time), _datetime(end_time))
+            cab.bookings.append(bookingId)
+
+        members = {}
+        for cab in cabs.values():
+            if cab.cityId in cities:
+                members.setdefault(cab.cityId, []).append(cab)
+        for cityId, city_cabs in members.items():
+            cities[cityId].addCabs(city_cabs)
+        city_manager.cities = cities
+        cab_manager.cabs = cabs
+        booking_manager.bookings = bookings
+        booking_manager.rebuildDemandCounters()
+        with Booking._booking_counter_lock:
+            Booking._booking_counter = max([Booking._booking_counter, *bookings])
+        if cab_manager.fleetStore is not None:
+            cab_manager.disableFleetStore()
+            cab_manager.enableFleetStore()
+        if cab_manager.historySegments is not None:
+            cab_manager.enableHistorySpill()
+        if booking_manager.bookingColumns is not None:
+            booking_manager.disableBookingColumns()
+            booking_manager.enableBookingColumns()
+        logger.info("Loaded %s cities, %s cabs and %s bookings from %s", len(cities), len(cabs), len(bookings), self.path)
+        return {'cities': len(cities), 'cabs': len(cabs), 'bookings': len(bookings)}
+
+    # Queries
+
+    def _query(self, sql, parameters=()):
+        with self._writeLock:
+            self.flush()
+            return self.connection.execute(sql, parameters).fetchall()
+
+    def getCabIdsInCityByState(self, cityId, state):
+        """
+        Get the IDs of all cabs in a city with a given state.
+
+        Args:
+            cityId (int): The ID of the city.
+            state (Union[CabState, str]): The state to filter cabs by.
+
+        Returns:
+            list: IDs of the matching cabs.
+        """
+        state = state.name if isinstance(state, CabState) else state
+        return [cabId for cabId, in self._query("SELECT cabId FROM cabs WHERE cityId = ? AND state = ?", (cityId, state))]
+
+    def getCabCountsByCityAndState(self):
+        """
+        Count the cabs in every (city, state) pair.
+
+        Returns:
+            dict: Dictionary mapping city IDs to dictionaries mapping each CabState to a cab count.
+        """
+        counts = {}
+        for cityId, state, count in self._query("SELECT cityId, state, COUNT(*) FROM cabs GROUP BY cityId, state"):
+            city_counts = counts.setdefault(cityId, {state: 0 for state in CabState})
+            city_counts[CabState[state]] = count
+        return counts
+
+    def getBookingsBetween(self, start_time, end_time):
+        """
+        Get the IDs of the bookings that started in a time window.
+
+        Args:
+            start_time (datetime): The start of the window, inclusive.
+            end_time (datetime): The end of the window, exclusive.
+
+        Returns:
+            list: IDs of the matching bookings, ordered by start time.
+        """
+        return [bookingId for bookingId, in self._query(
+            "SELECT bookingId FROM bookings WHERE start_time >= ? AND start_time < ? ORDER BY start_time",
+            (_micros(start_time), _micros(end_time)))]
+
+    def highDemandCities(self):
+        """
+        Find the city with the highest demand for cabs and the peak hour, like Analytics.highDemandCities.
+
+        Hours are read from the stored start_hour, which is the wall-clock hour of the
+        start time as in the Python version, also for timezone-aware start times.
+        Ties go to the city or hour with the earliest booking ID, as in the Python version.
+
+        Returns:
+            tuple: Name of the city with the most bookings and the hour of day with the most bookings,
+                or (None, None) if there are no bookings.
+        """
+        city = self._query(
+            "SELECT cities.name FROM bookings JOIN cities USING (cityId) WHERE start_hour IS NOT NULL "
+            "GROUP BY cityId ORDER BY COUNT(*) DESC, MIN(bookingId) LIMIT 1")
+        hour = self._query(
+            "SELECT start_hour FROM bookings WHERE start_hour IS NOT NULL "
+            "GROUP BY start_hour ORDER BY COUNT(*) DESC, MIN(bookingId) LIMIT 1")
+        if not city or not hour:
+            return None, None
+        return city[0][0], hour[0][0]
+
+    def calculateStateTime(self, cabId, state, start_time, end_time):
+        """
+        Calculate the time a cab spent in a state within a window, from its stored history.
+
+        Args:
+            cabId (int): The ID of the cab.
+            state (Union[CabState, str]): The state to measure.
+            start_time (datetime): The start of the window.
+            end_time (datetime): The end of the window.
+
+        Returns:
+            int: The time spent in the state in seconds.
+        """
+        state = state.name if isinstance(state, CabState) else state
+        start, end = _micros(start_time), _micros(end_time)
+        rows = self._query(
+            "SELECT timestamp, state FROM cab_history WHERE cabId = ? AND timestamp < ? AND timestamp >= "
+            "COALESCE((SELECT MAX(timestamp) FROM cab_history WHERE cabId = ? AND timestamp <= ?), ?) "
+            "ORDER BY timestamp", (cabId, end, cabId, start, start))
+        total = 0
+        for position, (timestamp, row_state) in enumerate(rows):
+            if row_state == state:
+                next_time = rows[position + 1][0] if position + 1 < len(rows) else end
+                total += min(next_time, end) - max(timestamp, start)
+        return total // 10**6
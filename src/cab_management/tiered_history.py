@@ -0,0 +1,425 @@
+"""
+Tiered History Module
+
+Two-tier storage for cab state histories. Recent transitions stay in memory
+as packed CompactHistory entries; older ones are sealed, a fixed number of
+entries at a time, into fixed-width chunks of segment files on disk that are
+read back through mmap. Only a small summary of every sealed chunk stays in
+memory, so the resident size of a history is bounded however long the cab lives.
+"""
+
+from array import array
+from bisect import bisect_right
+from datetime import timedelta
+import logging
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+from .compact_history import CompactHistory, _CODE_MASK, _ENTRY, _RAW, _STATES
+from .history_index import HistoryIndex, toMicros, windowMicros
+
+logger = logging.getLogger('cab_management.tiered_history')
+
+DEFAULT_CHUNK_ENTRIES = 512  # Transitions per sealed chunk
+DEFAULT_SEGMENT_CHUNKS = 8192  # Chunks per segment file, 36 MiB with the default chunk size
+
+
+class HistorySegments:
+    """
+    Segment files holding sealed history chunks.
+
+    Every chunk holds exactly chunkEntries packed entries, so a chunk number
+    maps to a segment file and an offset by arithmetic. Chunks are written
+    with plain file writes and read through a read-only mmap of each segment,
+    so only the pages that are actually read are mapped into the process.
+
+    Segments are scratch space for the running process, not persistence: files
+    left in the directory by an earlier store are overwritten. Use a snapshot
+    or the journal to persist histories. A directory created by the store
+    itself is deleted with its segment files on close().
+
+    Attributes:
+        directory (str): The directory holding the segment files.
+        chunkEntries (int): Number of entries in every chunk.
+        chunkSize (int): Size of every chunk in bytes.
+        segmentChunks (int): Number of chunks in every segment file.
+        chunks (int): Number of chunks written so far.
+    """
+    def __init__(self, directory=None, chunkEntries=DEFAULT_CHUNK_ENTRIES, segmentChunks=DEFAULT_SEGMENT_CHUNKS):
+        self._ownsDirectory = directory is None  # Deleted on close() if the store created it
+        if directory is None:
+            directory = tempfile.mkdtemp(prefix='cab-history-')
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.chunkEntries = chunkEntries
+        self.chunkSize = chunkEntries * _ENTRY.size
+        self.segmentChunks = segmentChunks
+        self.chunks = 0
+        self._files = []
+        self._maps = []
+        self._lock = threading.Lock()  # Serializes chunk numbering and segment creation
+
+    def _openSegment(self):
+        path = os.path.join(self.directory, f"segment-{len(self._files):06d}.hist")
+        file = open(path, 'w+b', buffering=0)
+        file.truncate(self.chunkSize * self.segmentChunks)
+        self._files.append(file)
+        self._maps.append(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+        logger.info("Opened history segment %s", path)
+
+    def write(self, data):
+        """
+        Seal one chunk of packed entries.
+
+        Args:
+            data (bytes): Exactly chunkSize bytes of packed entries.
+
+        Returns:
+            int: The chunk number.
+
+        Raises:
+            ValueError: If data is not exactly one chunk long.
+        """
+        if len(data) != self.chunkSize:
+            raise ValueError(f"Chunks must be {self.chunkSize} bytes, got {len(data)}")
+        with self._lock:
+            number = self.chunks
+            segment, slot = divmod(number, self.segmentChunks)
+            if segment == len(self._files):
+                self._openSegment()
+            file = self._files[segment]
+            file.seek(slot * self.chunkSize)
+            file.write(data)
+            self.chunks += 1
+        return number
+
+    def locate(self, number):
+        """
+        Get the mapping and offset of a chunk.
+
+        Args:
+            number (int): The chunk number.
+
+        Returns:
+            tuple: The mmap of the chunk's segment and the chunk's offset in it.
+        """
+        segment, slot = divmod(number, self.segmentChunks)
+        return self._maps[segment], slot * self.chunkSize
+
+    def read(self, number):
+        """
+        Read a chunk.
+
+        Args:
+            number (int): The chunk number.
+
+        Returns:
+            bytes: The packed entries of the chunk.
+        """
+        segment_map, offset = self.locate(number)
+        return segment_map[offset:offset + self.chunkSize]
+
+    def close(self):
+        """
+        Unmap and close every segment file. Histories still referring to the segments can no longer be read.
+
+        If the store created its directory, the directory and the segment files are deleted.
+        """
+        with self._lock:
+            for segment_map in self._maps:
+                segment_map.close()
+            for file in self._files:
+                file.close()
+            self._maps, self._files = [], []
+            if self._ownsDirectory:
+                shutil.rmtree(self.directory, ignore_errors=True)
+                self._ownsDirectory = False
+        logger.info("Closed history segments in %s after %s chunks", self.directory, self.chunks)
+
+
+class TieredHistory(CompactHistory):
+    """
+    CompactHistory whose older entries are sealed into HistorySegments.
+
+    The newest entries stay in the data bytearray. Once it holds two chunks'
+    worth of entries, the oldest chunk is written to the segments and only
+    its chunk number stays in memory. Indexing, iteration, packed() and
+    buildIndex() cover both tiers, and extras stay keyed by position in the
+    whole history.
+
+    While the timestamps arrive in order, every sealed chunk also keeps a
+    summary in memory (its first timestamp and the time spent in every state
+    before it), so time-window queries bisect the summaries and read at most
+    one sealed chunk. Once a timestamp arrives out of order the summaries are
+    dropped and the history is indexed like a CompactHistory, reading the
+    sealed chunks back to build the index.
+
+    Attributes:
+        segments (HistorySegments): The store holding the sealed chunks.
+        coldLength (int): Number of sealed entries.
+        chunks (array): Chunk number of every sealed chunk, oldest first.
+        ordered (bool): Whether every usable timestamp so far is in order.
+        chunkStarts (list): Microseconds since the epoch of the first usable timestamp of every sealed chunk.
+        chunkSums (list): Dictionary per sealed chunk mapping states to the microseconds spent
+            in them before the chunk's first timestamp.
+        coldEnd (tuple): (microseconds, state, sums) of the last sealed transition, or None.
+    """
+    __slots__ = ('segments', 'coldLength', 'chunks', 'ordered', 'chunkStarts', 'chunkSums', 'coldEnd',
+                 '_lastMicros')
+
+    def __init__(self, segments, entries=()):
+        self.segments = segments
+        self.coldLength = 0
+        self.chunks = array('q')
+        self.ordered = True
+        self.chunkStarts = []
+        self.chunkSums = []
+        self.coldEnd = None
+        self._lastMicros = None  # Latest usable timestamp, while ordered
+        super().__init__(entries)
+
+    @classmethod
+    def fromHistory(cls, history, segments):
+        """
+        Create a tiered copy of a history, sealing all but its newest entries.
+
+        Args:
+            history (CompactHistory): The history to copy.
+            segments (HistorySegments): The store for sealed chunks.
+
+        Returns:
+            TieredHistory: The tiered history.
+        """
+        tiered = cls(segments)
+        tiered.data = bytearray(history.packed())
+        tiered.extras = dict(history.extras) if history.extras else None
+        tiered._checkOrder(tiered.data, 0)
+        while len(tiered.data) >= 2 * segments.chunkSize:
+            tiered._seal()
+        return tiered
+
+    def append(self, entry):
+        super().append(entry)
+        if self.ordered:
+            micros, code = _ENTRY.unpack_from(self.data, len(self.data) - _ENTRY.size)
+            if code & _RAW:
+                self._checkOrder(self.data[-_ENTRY.size:], len(self) - 1)
+            elif self._lastMicros is not None and micros < self._lastMicros:
+                self._unordered()
+            else:
+                self._lastMicros = micros
+        if len(self.data) >= 2 * self.segments.chunkSize:
+            self._seal()
+
+    def _usable(self, data, first):
+        """
+        Iterate over packed entries with usable timestamps.
+
+        Args:
+            data (bytes): Packed entries.
+            first (int): Position of the first entry in the whole history.
+
+        Yields:
+            tuple: (microseconds since the epoch, state) for each entry whose timestamp can be interpreted.
+        """
+        for position, (micros, code) in enumerate(_ENTRY.iter_unpack(data), first):
+            if code & _RAW:
+                micros = toMicros(self.extras[position])
+                if micros is None:
+                    continue
+            yield micros, _STATES[code & _CODE_MASK]
+
+    def _checkOrder(self, data, first):
+        """
+        Drop the chunk summaries if the new entries in data go back in time.
+        """
+        for micros, _ in self._usable(data, first):
+            if self._lastMicros is not None and micros < self._lastMicros:
+                self._unordered()
+                return
+            self._lastMicros = micros
+
+    def _unordered(self):
+        self.ordered = False
+        self.chunkStarts, self.chunkSums, self.coldEnd = [], [], None
+        logger.debug("History timestamps out of order after %s entries, dropping chunk summaries", len(self))
+
+    def _seal(self):
+        """
+        Move the oldest chunk of the in-memory tier to the segments.
+        """
+        size = self.segments.chunkSize
+        chunk = self.data[:size]
+        if self.ordered:
+            sums = dict(self.coldEnd[2]) if self.coldEnd is not None else {}
+            last_micros, last_state = self.coldEnd[:2] if self.coldEnd is not None else (None, None)
+            start = start_sums = None
+            for micros, state in self._usable(chunk, self.coldLength):
+                if last_micros is not None:
+                    sums[last_state] = sums.get(last_state, 0) + micros - last_micros
+                if start is None:
+                    start, start_sums = micros, dict(sums)
+                last_micros, last_state = micros, state
+            if start is None:
+                self._unordered()  # Nothing to bisect on
+            else:
+                self.chunkStarts.append(start)
+                self.chunkSums.append(start_sums)
+                self.coldEnd = (last_micros, last_state, sums)
+        self.chunks.append(self.segments.write(chunk))
+        del self.data[:size]
+        self.coldLength += self.segments.chunkEntries
+
+    def _coldUntil(self, state, micros):
+        """
+        Get the microseconds spent in state from the first transition until micros, from the sealed tier.
+
+        Reads at most one sealed chunk.
+        """
+        chunk = bisect_right(self.chunkStarts, micros) - 1
+        if chunk < 0:
+            return 0
+        total = self.chunkSums[chunk].get(state, 0)
+        previous_micros = previous_state = None
+        data = self.segments.read(self.chunks[chunk])
+        for entry_micros, entry_state in self._usable(data, chunk * self.segments.chunkEntries):
+            if entry_micros > micros:
+                break
+            if previous_state == state:
+                total += entry_micros - previous_micros
+            previous_micros, previous_state = entry_micros, entry_state
+        if previous_state == state:
+            total += micros - previous_micros
+        return total
+
+    def packed(self):
+        return b''.join([self.segments.read(number) for number in self.chunks] + [bytes(self.data)])
+
+    def buildIndex(self):
+        return TieredIndex(self)
+
+    def iterMicros(self):
+        for number in self.chunks:
+            for micros, code in _ENTRY.iter_unpack(self.segments.read(number)):
+                yield (None if code & _RAW else micros), _STATES[code & _CODE_MASK]
+        yield from super().iterMicros()
+
+    def _decode(self, index):
+        if index >= self.coldLength:
+            micros, code = _ENTRY.unpack_from(self.data, (index - self.coldLength) * _ENTRY.size)
+        else:
+            chunk, slot = divmod(index, self.segments.chunkEntries)
+            segment_map, offset = self.segments.locate(self.chunks[chunk])
+            micros, code = _ENTRY.unpack_from(segment_map, offset + slot * _ENTRY.size)
+        return self._decodeEntry(index, micros, code)
+
+    def __len__(self):
+        return self.coldLength + len(self.data) // _ENTRY.size
+
+    def __iter__(self):
+        entries = self.segments.chunkEntries
+        for chunk, number in enumerate(self.chunks):
+            first = chunk * entries
+            for position, (micros, code) in enumerate(_ENTRY.iter_unpack(self.segments.read(number)), first):
+                yield self._decodeEntry(position, micros, code)
+        for position, (micros, code) in enumerate(_ENTRY.iter_unpack(self.data), self.coldLength):
+            yield self._decodeEntry(position, micros, code)
+
+
+class TieredIndex:
+    """
+    History index spanning both tiers of a TieredHistory.
+
+    Times before the last sealed transition are answered from the chunk
+    summaries and a single sealed chunk; later times from a HistoryIndex over
+    the in-memory tier, which is rebuilt after every seal. Histories with
+    out-of-order timestamps fall back to a HistoryIndex over every transition.
+
+    Attributes:
+        history (TieredHistory): The indexed history.
+    """
+    __slots__ = ('history', '_hot', '_coldLength', '_full')
+
+    def __init__(self, history):
+        self.history = history
+        self._hot = None  # HistoryIndex over the last sealed transition and the in-memory tier
+        self._coldLength = None  # history.coldLength when _hot was built
+        self._full = None  # HistoryIndex over the whole history, once it is out of order
+
+    def _hotIndex(self):
+        history = self.history
+        if self._hot is None or self._coldLength != history.coldLength:
+            index = HistoryIndex()
+            if history.coldEnd is not None:
+                micros, state, sums = history.coldEnd
+                index.base = sums
+                index.appendMicros(micros, state)
+            for micros, state in history._usable(history.data, history.coldLength):
+                index.appendMicros(micros, state)
+            self._hot, self._coldLength = index, history.coldLength
+        return self._hot
+
+    def append(self, timestamp, state):
+        """
+        Record a transition that was just appended to the history.
+
+        Args:
+            timestamp (Union[datetime, str]): The time of the transition.
+            state (CabState): The state entered.
+        """
+        if self._full is not None:
+            self._full.append(timestamp, state)
+        elif self._hot is not None and self._coldLength == self.history.coldLength:
+            self._hot.append(timestamp, state)
+        else:
+            self._hot = None  # Rebuilt from the history on the next query
+
+    def appendMicros(self, micros, state):
+        if self._full is not None:
+            self._full.appendMicros(micros, state)
+        elif self._hot is not None and self._coldLength == self.history.coldLength:
+            self._hot.appendMicros(micros, state)
+        else:
+            self._hot = None
+
+    def _timeUntil(self, state, micros):
+        cold_end = self.history.coldEnd
+        if cold_end is not None and micros < cold_end[0]:
+            return self.history._coldUntil(state, micros)
+        return self._hotIndex().timeUntil(state, micros)
+
+    def timeInState(self, state, start_time=None, end_time=None):
+        """
+        Get the time spent in a state between start_time and end_time, across both tiers.
+
+        Args:
+            state (CabState): The state to measure.
+            start_time (datetime, optional): Start of the window. If None, the window starts at the first transition.
+            end_time (datetime, optional): End of the window. If None, the current time will be used.
+
+        Returns:
+            timedelta: The time spent in the state during the window.
+
+        Raises:
+            ValueError: If a bound is neither a datetime nor an ISO format string.
+        """
+        if not self.history.ordered:
+            if self._full is None:
+                self._full, self._hot = CompactHistory.buildIndex(self.history), None
+            return self._full.timeInState(state, start_time, end_time)
+        hot = self._hotIndex()
+        if self.history.chunkStarts:
+            first = self.history.chunkStarts[0]
+        elif hot.times:
+            first = hot.times[0]
+        else:
+            return timedelta(0)
+        start, end = windowMicros(start_time, end_time, first)
+        if end <= start:
+            return timedelta(0)
+        return timedelta(microseconds=self._timeUntil(state, end) - self._timeUntil(state, start))
+
+    def __len__(self):
+        return len(self.history)
@@ -5,21 +5,31 @@ Utility functions for Cab Management
 import datetime
 import json
 import logging
-from cab_management.cab_manager import CabManager
-from cab_management.city_manager import CityManager
-from cab_management.booking_manager import BookingManager
-from cab_management.booking import Booking, BookingState
-from cab_management.cab import CabState
-
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+import re
+import time
+from .cab_manager import CabManager
+from .city_manager import CityManager
+from .booking_manager import BookingManager
+from .booking import Booking, BookingState
+from .cab import CabState
+
 logger = logging.getLogger('cab_management.utils')
 
 INITIAL_DATA_PATH = "data/initial_data.json"
+STREAM_CHUNK_SIZE = 10000  # Records applied per chunk by stream_initial_data
+STREAM_BLOCK_SIZE = 1 << 16  # Characters read from the file at a time
+
+_SECTION_KINDS = {'cities': 'city', 'cabs': 'cab', 'bookings': 'booking'}
+_NON_WHITESPACE = re.compile(r'[^ \t\n\r]')
 
 def load_initial_data(file_path=None):
     """
     Load initial data from a JSON file.
+
+    Cabs are registered in bulk with CabManager.registerCabs. Each cab's history
+    starts with a single entry holding its loaded state at load time, rather than
+    an IDLE registration followed by a change to that state. A cab naming an unknown
+    city is skipped with a warning and the rest of the file is still loaded.
     
     Args:
         file_path (str): The path to the JSON file. If None or empty, use INITIAL_DATA_PATH.
@@ -30,9 +40,9 @@ def load_initial_data(file_path=None):
     try:
         with open(file_path, 'r') as file:
             data = json.load(file)
-        logger.info(f"Initial data loaded successfully from {file_path}")
+        logger.info("Initial data loaded successfully from %s", file_path)
     except Exception as e:
-        logger.error(f"Failed to load initial data from {file_path}: {e}")
+        logger.error("Failed to load initial data from %s: %s", file_path, e)
         return
 
     cab_manager = CabManager.getInstance()
@@ -42,12 +52,10 @@ def load_initial_data(file_path=None):
     try:
         for city in data['cities']:
             city_manager.addCity(city['cityId'], city['name'])
-            logger.info(f"City {city['name']} with ID {city['cityId']} added.")
+            logger.info("City %s with ID %s added.", city['name'], city['cityId'])
 
-        for cab in data['cabs']:
-            cab_manager.registerCab(cab['cabId'], cab['cityId'])
-            cab_manager.updateCab(cab['cabId'], cab['cabState'], cab['cityId'])
-            logger.info(f"Cab {cab['cabId']} registered in city {cab['cityId']} with state {cab['cabState']}.")
+        cab_manager.registerCabs(((cab['cabId'], cab['cityId'], cab['cabState']) for cab in data['cabs']),
+                                 skipUnknownCities=True)
 
         for booking in data['bookings']:
             cab_id = booking['cabId']
@@ -55,11 +63,220 @@ def load_initial_data(file_path=None):
             start_time = booking['start_time']
             end_time = booking.get('end_time', None)
             add_old_booking(booking_manager, cab_manager, city_manager, cab_id, city_id, start_time, end_time)
-            logger.info(f"Booking added for cab {cab_id} in city {city_id} from {start_time} to {end_time}.")
+            logger.info("Booking added for cab %s in city %s from %s to %s.", cab_id, city_id, start_time, end_time)
 
         logger.info("All initial data processed successfully.")
     except Exception as e:
-        logger.error(f"Error processing initial data: {e}")
+        logger.error("Error processing initial data: %s", e)
+
+def stream_initial_data(file_path=None, chunk_size=STREAM_CHUNK_SIZE, progress=None, format=None):
+    """
+    Load initial data from a file without reading the whole file into memory.
+
+    Two layouts are supported:
+
+    - NDJSON (.ndjson/.jsonl): one city, cab or booking object per line. The kind of
+      record is taken from an optional "type" field ("city", "cab" or "booking"),
+      otherwise from its keys ("name", "cabState" or "start_time").
+    - JSON: the {cities, cabs, bookings} layout read by load_initial_data, parsed
+      incrementally one array element at a time.
+
+    Records are applied in file order, in chunks of at most chunk_size records, so
+    cities and cabs must appear before the bookings that use them.
+
+    Args:
+        file_path (str): The path to the file. If None or empty, use INITIAL_DATA_PATH.
+        chunk_size (int): The maximum number of records held in memory at once.
+        progress (callable, optional): Called after every chunk with the number of records
+            applied so far and the elapsed time in seconds.
+        format (str, optional): "ndjson" or "json". If None, it is chosen from the file extension.
+
+    Returns:
+        dict: Dictionary mapping "city", "cab" and "booking" to the number of records applied.
+    """
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be positive, got {chunk_size}")
+    if not file_path:
+        file_path = INITIAL_DATA_PATH
+    if format is None:
+        format = "ndjson" if file_path.endswith(('.ndjson', '.jsonl')) else "json"
+
+    counts = {'city': 0, 'cab': 0, 'booking': 0}
+    rows = 0
+    started = time.perf_counter()
+    with open(file_path, 'r') as file:
+        records = _iter_ndjson_records(file) if format == "ndjson" else _StreamingJsonReader(file).records()
+        chunk = []
+        for record in records:
+            chunk.append(record)
+            if len(chunk) >= chunk_size:
+                rows += _apply_records(chunk, counts)
+                chunk.clear()
+                _report_progress(rows, started, progress)
+        if chunk:
+            rows += _apply_records(chunk, counts)
+            _report_progress(rows, started, progress)
+
+    elapsed = time.perf_counter() - started
+    logger.info("Streamed %s records from %s in %.2fs (%.0f rows/s)", rows, file_path, elapsed, rows / elapsed if elapsed else 0)
+    return counts
+
+def _report_progress(rows, started, progress):
+    elapsed = time.perf_counter() - started
+    logger.info("Loaded %s records (%.0f rows/s)", rows, rows / elapsed if elapsed else 0)
+    if progress is not None:
+        progress(rows, elapsed)
+
+def _record_kind(record):
+    kind = record.get('type')
+    if kind in ('city', 'cab', 'booking'):
+        return kind
+    if 'start_time' in record:
+        return 'booking'
+    if 'cabState' in record:
+        return 'cab'
+    if 'name' in record:
+        return 'city'
+    raise ValueError(f"Cannot tell the kind of record: {record}")
+
+def _iter_ndjson_records(file):
+    """
+    Yield (kind, record) pairs from an NDJSON file, skipping blank lines.
+    """
+    for line_number, line in enumerate(file, 1):
+        if line.isspace() or not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON on line {line_number}: {e}") from e
+        yield _record_kind(record), record
+
+def _apply_records(chunk, counts):
+    """
+    Apply a chunk of (kind, record) pairs to the managers.
+
+    Returns:
+        int: The number of records applied.
+    """
+    cab_manager = CabManager.getInstance()
+    city_manager = CityManager.getInstance()
+    booking_manager = BookingManager.getInstance()
+    cab_rows = []  # Consecutive cab records, registered in bulk
+    for kind, record in chunk:
+        if kind == 'cab':
+            cab_rows.append((record['cabId'], record['cityId'], record['cabState']))
+            continue
+        if cab_rows:
+            counts['cab'] += cab_manager.registerCabs(cab_rows, skipUnknownCities=True)
+            cab_rows.clear()
+        if kind == 'city':
+            city_manager.addCity(record['cityId'], record['name'])
+        else:
+            add_old_booking(booking_manager, cab_manager, city_manager, record['cabId'], record['cityId'],
+                            record['start_time'], record.get('end_time', None))
+        counts[kind] += 1
+    if cab_rows:
+        counts['cab'] += cab_manager.registerCabs(cab_rows, skipUnknownCities=True)
+    return len(chunk)
+
+
+class _StreamingJsonReader:
+    """
+    Incremental reader for the {cities, cabs, bookings} JSON layout.
+
+    The file is read in blocks of block_size characters and each array element is
+    decoded with json.JSONDecoder.raw_decode as soon as it is complete, so only the
+    current block and the element being decoded are held in memory.
+    """
+    def __init__(self, file, block_size=STREAM_BLOCK_SIZE):
+        self.file = file
+        self.block_size = block_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        """
+        Read the next block, dropping the part of the buffer already consumed.
+
+        Returns:
+            bool: False at the end of the file.
+        """
+        if self.eof:
+            return False
+        block = self.file.read(self.block_size)
+        if not block:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + block
+        self.pos = 0
+        return True
+
+    def _peek(self):
+        """
+        Skip whitespace and get the next character, or '' at the end of the file.
+        """
+        while True:
+            match = _NON_WHITESPACE.search(self.buffer, self.pos)
+            if match:
+                self.pos = match.start()
+                return self.buffer[self.pos]
+            self.pos = len(self.buffer)
+            if not self._fill():
+                return ''
+
+    def _expect(self, chars):
+        char = self._peek()
+        if not char or char not in chars:
+            raise ValueError(f"Expected one of {chars!r} but found {char or 'end of file'!r}")
+        self.pos += 1
+        return char
+
+    def _value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # A number or literal that ends the buffer may continue in the next block
+            if end == len(self.buffer) and not isinstance(value, (dict, list, str)) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def records(self):
+        """
+        Yield (kind, record) pairs for every element of the cities, cabs and bookings arrays.
+
+        Other top-level keys are decoded and skipped.
+        """
+        self._expect('{')
+        if self._peek() == '}':
+            return
+        while True:
+            key = self._value()
+            if not isinstance(key, str):
+                raise ValueError(f"Expected a key but found {key!r}")
+            self._expect(':')
+            kind = _SECTION_KINDS.get(key)
+            if kind is not None and self._peek() == '[':
+                self.pos += 1
+                if self._peek() == ']':
+                    self.pos += 1
+                else:
+                    while True:
+                        yield kind, self._value()
+                        if self._expect(',]') == ']':
+                            break
+            else:
+                self._value()
+            if self._expect(',}') == '}':
+                return
 
 def add_booking(city_id, start_time=None):
     """
@@ -76,9 +293,9 @@ def add_booking(city_id, start_time=None):
     
     if booking_id is not None:
         booking = booking_manager.bookings.get(booking_id)
-        logger.info(f"Booking {booking.bookingId} added for cab {booking.cab.cabId} in city {city_id} at {booking.start_time}")
+        logger.info("Booking %s added for cab %s in city %s at %s", booking.bookingId, booking.cab.cabId, city_id, booking.start_time)
     else:
-        logger.warning(f"No cabs available for booking in city {city_id}")
+        logger.warning("No cabs available for booking in city %s", city_id)
         
     return booking_id
 
@@ -94,7 +311,7 @@ def end_trip_with_timestamp(booking_id, end_time=None):
     
     try:
         booking_manager.endBooking(booking_id, end_time)
-        logger.info(f"Booking with ID {booking_id} ended at {end_time if end_time else datetime.datetime.now()}")
+        logger.info("Booking with ID %s ended at %s", booking_id, end_time if end_time else datetime.datetime.now())
         return True
     except ValueError as e:
         logger.error(e)
@@ -121,11 +338,11 @@ def add_old_booking(booking_manager, cab_manager, city_manager, cab_id, city_id,
         
         if end_time:
             booking_manager.endBooking(booking_id, end_time)
-            logger.info(f"Old booking {booking_id} for cab {cab_id} in city {city_id} ended at {end_time}.")
+            logger.info("Old booking %s for cab %s in city %s ended at %s.", booking_id, cab_id, city_id, end_time)
         else:
-            logger.info(f"Old booking {booking_id} for cab {cab_id} in city {city_id} started at {start_time} and is ongoing.")
+            logger.info("Old booking %s for cab %s in city %s started at %s and is ongoing.", booking_id, cab_id, city_id, start_time)
     else:
-        logger.warning(f"Cab {cab_id} or city {city_id} not found. Cannot add old booking.")
+        logger.warning("Cab %s or city %s not found. Cannot add old booking.", cab_id, city_id)
 
 
 # Example usage
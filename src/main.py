@@ -10,12 +10,15 @@ from cab_management.cab_manager import CabManager
 from cab_management.city_manager import CityManager
 from cab_management.booking_manager import BookingManager
 from cab_management.analytics import Analytics
+from cab_management.analytics_cache import AnalyticsCache
 from cab_management.utils import load_initial_data
+from cab_management.logging_config import configureLogging
+from cab_management.metrics import MetricsRegistry
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger('cab_management')
 
+analytics_cache = AnalyticsCache()  # Repeated analytics queries are answered until their data changes
+
 def display_menu():
     """
     Display the menu options to the user.
@@ -50,7 +53,7 @@ def analytics_menu(cab_manager):
                 end_time = datetime.fromisoformat(end_time_input) if end_time_input else datetime.now()
                 cab = cab_manager.getCab(cab_id)
                 if cab:
-                    idle_time = Analytics.calculateIdleTime(cab, start_time, end_time)
+                    idle_time = analytics_cache.calculateIdleTime(cab, start_time, end_time)
                     logger.info(f"Cab {cab_id} idle time between {start_time} and {end_time}: {idle_time} seconds")
                 else:
                     logger.warning(f"Cab {cab_id} not found.")
@@ -65,8 +68,7 @@ def analytics_menu(cab_manager):
                     logger.warning(f"Cab {cab_id} not found.")
 
             elif choice == '3':
-                bookings = cab_manager.getAllBookings()
-                high_demand_city, peak_time = Analytics.highDemandCities(bookings)
+                high_demand_city, peak_time = analytics_cache.highDemandCities()
                 logger.info(f"High demand city: {high_demand_city}, Peak time: {peak_time}")
 
             elif choice == '4':
@@ -297,6 +299,16 @@ def main():
     """
     Main driver function of the cab management program.
     """
+    parser = argparse.ArgumentParser(description="Cab management portal.")
+    parser.add_argument('--production-logging', action='store_true',
+                        help="Write logs from a background thread and sample high-frequency events")
+    parser.add_argument('--metrics-port', type=int,
+                        help="Record operation latencies and serve them in Prometheus format on this local port")
+    args = parser.parse_args()
+    configureLogging(logging.INFO, production=args.production_logging)
+    if args.metrics_port is not None:
+        MetricsRegistry().attach().serve(args.metrics_port)
+
     try:
         cab_manager = CabManager.getInstance()
         city_manager = CityManager.getInstance()
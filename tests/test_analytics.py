@@ -8,6 +8,7 @@ try:
     from src.cab_management.utils import load_initial_data
     from src.cab_management.booking_manager import BookingManager
     from src.cab_management.cab_manager import CabManager
+    from src.cab_management.cab import CabState
 except ImportError:
     import sys
     sys.path.insert(0, 'src')
@@ -15,6 +16,7 @@ except ImportError:
     from cab_management.utils import load_initial_data
     from cab_management.booking_manager import BookingManager
     from cab_management.cab_manager import CabManager
+    from cab_management.cab import CabState
 
 
 class TestAnalytics(unittest.TestCase):
@@ -40,6 +42,32 @@ class TestAnalytics(unittest.TestCase):
         idle_time = Analytics.calculateIdleTime(self.booking.getCab(), self.starttime, self.starttime + timedelta(hours=2))
         self.assertEqual(idle_time, 3600)
 
+    def test_calculateStateTime(self):
+        """Test the calculateStateTime method for non-idle states."""
+        self.booking = self.booking_manager.bookings[self.bookingId]
+        cab = self.booking.getCab()
+        on_trip_time = Analytics.calculateStateTime(cab, CabState.ON_TRIP, self.starttime, self.starttime + timedelta(hours=2))
+        self.assertEqual(on_trip_time, 3600)
+        reserved_time = Analytics.calculateStateTime(cab, 'RESERVED', self.starttime, self.starttime + timedelta(hours=2))
+        self.assertEqual(reserved_time, 0)
+
+    def test_idle_time_is_time_in_state(self):
+        """Test that idle time counts only IDLE periods, clipped to the window, and that bad bounds raise ValueError."""
+        cab = self.cab_manager.getCab(105)
+        base = datetime(2031, 3, 1, 8)
+        cab.setState(CabState.ON_TRIP, base + timedelta(hours=1))
+        cab.setState(CabState.IDLE, base + timedelta(hours=3))
+        cab.setState(CabState.RESERVED, base + timedelta(hours=4))
+        cab.setState(CabState.IDLE, base + timedelta(hours=5))
+        # Idle 08:00-09:00 and 11:00-12:00, then from 13:00 on
+        self.assertEqual(Analytics.calculateIdleTime(cab, base, base + timedelta(hours=6)), 3 * 3600)
+        self.assertEqual(Analytics.calculateIdleTime(cab, base + timedelta(minutes=30), base + timedelta(hours=3, minutes=15)), 45 * 60)
+        self.assertEqual(Analytics.calculateStateTime(cab, CabState.RESERVED, base, base + timedelta(hours=6)), 3600)
+        with self.assertRaises(ValueError):
+            Analytics.calculateIdleTime(cab, "not a time", base)
+        with self.assertRaises(ValueError):
+            Analytics.calculateIdleTime(cab, base, "not a time")
+
     def test_getCabHistory(self):
         """Test the getCabHistory method."""
         history, bookings = Analytics.getCabHistory(self.cab)
@@ -0,0 +1,77 @@
+import unittest
+import sys
+import logging
+from datetime import datetime
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+try:
+    from src.cab_management.analytics_cache import AnalyticsCache
+    from src.cab_management.analytics import Analytics
+    from src.cab_management.booking_manager import BookingManager
+    from src.cab_management.cab_manager import CabManager
+    from src.cab_management.cab import CabState
+    from src.cab_management.utils import load_initial_data
+except ImportError:
+    sys.path.insert(0, 'src')
+    from cab_management.analytics_cache import AnalyticsCache
+    from cab_management.analytics import Analytics
+    from cab_management.booking_manager import BookingManager
+    from cab_management.cab_manager import CabManager
+    from cab_management.cab import CabState
+    from cab_management.utils import load_initial_data
+
+START, END = datetime(2024, 7, 25), datetime(2032, 1, 1)
+
+class TestAnalyticsCache(unittest.TestCase):
+
+    def setUp(self):
+        """Load initial data and create an empty cache."""
+        load_initial_data()
+        self.cache = AnalyticsCache()
+
+    def test_invalidated_when_data_changes(self):
+        """Test that results are reused until the bookings or the cab they depend on change."""
+        cab_manager = CabManager.getInstance()
+        booking_manager = BookingManager.getInstance()
+        cab, other = cab_manager.getCab(105), cab_manager.getCab(106)
+
+        demand = self.cache.highDemandCities()
+        self.assertEqual(self.cache.highDemandCities(), demand)
+        idle = self.cache.calculateIdleTime(cab, START, END)
+        self.assertEqual(self.cache.calculateIdleTime(cab, START, END), idle)
+        other_idle = self.cache.calculateIdleTime(other, START, END)
+
+        cab_manager.updateCab(105, state=CabState.ON_TRIP if cab.state == CabState.IDLE else CabState.IDLE)
+        self.assertEqual(self.cache.calculateIdleTime(cab, START, END), Analytics.calculateIdleTime(cab, START, END))
+        self.assertEqual(self.cache.calculateIdleTime(other, START, END), other_idle)
+        booking_manager.bookOldCab(cab_manager.getCab(108), cab_manager.getCab(108).cityId, datetime(2031, 1, 1, 6))
+        self.assertEqual(self.cache.highDemandCities(), Analytics.highDemandCities(booking_manager.getAllBookings()))
+
+        stats = self.cache.getStats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['stale']), (3, 5, 2))
+        self.assertAlmostEqual(stats['hitRate'], 3 / 8)
+        logger.info("test_invalidated_when_data_changes passed.")
+
+    def test_city_reports_and_eviction(self):
+        """Test that city reports only see their own city's changes and that the cache stays bounded."""
+        cab_manager = CabManager.getInstance()
+        cache = AnalyticsCache(maxEntries=2)
+        report = cache.fleetIdleReport(START, END, city=1)
+        self.assertIs(cache.fleetIdleReport(START, END, city=1), report)
+        cab_manager.updateCab(105, state=CabState.ON_TRIP if cab_manager.getCab(105).state == CabState.IDLE else CabState.IDLE)
+        self.assertEqual(cab_manager.getCab(105).cityId, 3)
+        self.assertIs(cache.fleetIdleReport(START, END, city=1), report)  # A cab in another city changed
+        self.assertIsNot(cache.fleetIdleReport(START, END), report)
+
+        cache.fleetIdleReport(START, END, city=2)
+        self.assertEqual((len(cache), cache.evictions), (2, 1))
+        self.assertIsNot(cache.fleetIdleReport(START, END, city=1), report)  # Evicted
+        self.assertIsNotNone(cache.fleetIdleReport(START, None))
+        self.assertEqual(cache.uncached, 1)
+        logger.info("test_city_reports_and_eviction passed.")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+import sys
+import logging
+from datetime import datetime, timedelta, timezone
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+try:
+    from src.cab_management.booking_columns import BookingColumns
+    from src.cab_management.booking import Booking, BookingState
+    from src.cab_management.city import City
+    from src.cab_management.analytics import Analytics
+    from src.cab_management.booking_manager import BookingManager
+    from src.cab_management.utils import load_initial_data
+except ImportError:
+    sys.path.insert(0, 'src')
+    from cab_management.booking_columns import BookingColumns
+    from cab_management.booking import Booking, BookingState
+    from cab_management.city import City
+    from cab_management.analytics import Analytics
+    from cab_management.booking_manager import BookingManager
+    from cab_management.utils import load_initial_data
+
+class TestBookingColumns(unittest.TestCase):
+
+    def test_matches_analytics(self):
+        """Test that the columns give the same answer as the loop over bookings and stay up to date."""
+        load_initial_data()
+        booking_manager = BookingManager.getInstance()
+        columns = booking_manager.enableBookingColumns()
+        self.addCleanup(booking_manager.disableBookingColumns)
+        booking_manager.bookCab(2, datetime(2024, 7, 26, 23))
+        self.assertEqual(len(columns), len(booking_manager.bookings))
+
+        bookings = booking_manager.getAllBookings()
+        self.assertEqual(Analytics.highDemandCities(columns), Analytics.highDemandCities(bookings))
+        city_counts, hour_counts = Analytics.demandHistograms(columns)
+        self.assertEqual(sum(city_counts.values()), len(bookings))
+        self.assertEqual(sum(hour_counts), len(bookings))
+        self.assertGreaterEqual(hour_counts[23], 1)
+        logger.info("test_matches_analytics passed.")
+
+    def test_ties_and_unusable_start_times(self):
+        """Test tie-breaking and the handling of every kind of start time like the loop over bookings."""
+        first, second = City(901, "First"), City(902, "Second")
+        start_times = [
+            (second, "not a time"),  # Skipped, so Second is not the first city seen
+            (first, datetime(2024, 7, 25, 9, tzinfo=timezone(timedelta(hours=5)))),  # Wall-clock hour 9
+            (second, "2024-07-25T14:30:00"),
+            (first, "2024-07-25T14:00:00+02:00"),
+            (second, datetime(2024, 7, 25, 9, 15)),
+            (first, 1234),  # Skipped
+        ]
+        bookings = [Booking.fromRow(position, None, city, BookingState.COMPLETED, start_time, None)
+                    for position, (city, start_time) in enumerate(start_times)]
+        columns = BookingColumns(bookings)
+        self.assertEqual(columns.invalid, 2)
+        self.assertEqual(columns.highDemandCities(), Analytics.highDemandCities(bookings))
+        self.assertEqual(columns.highDemandCities(), ("First", 9))
+        city_counts, hour_counts = columns.histograms()
+        self.assertEqual(city_counts, {second: 2, first: 2})
+        self.assertEqual((hour_counts[9], hour_counts[14], sum(hour_counts)), (2, 2, 4))
+        with self.assertRaises(ValueError):
+            BookingColumns(bookings[:1]).highDemandCities()
+        logger.info("test_ties_and_unusable_start_times passed.")
+
+if __name__ == '__main__':
+    unittest.main()
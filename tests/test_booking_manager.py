@@ -1,7 +1,9 @@
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import sys
 import logging
+import threading
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -11,11 +13,17 @@ try:
     from src.cab_management.utils import load_initial_data
     from src.cab_management.booking_manager import BookingManager
     from src.cab_management.booking import BookingState
+    from src.cab_management.city_manager import CityManager
+    from src.cab_management.cab_manager import CabManager
+    from src.cab_management.cab import CabState
 except ImportError:
     sys.path.insert(0, 'src')
     from cab_management.utils import load_initial_data
     from cab_management.booking_manager import BookingManager
     from cab_management.booking import BookingState
+    from cab_management.city_manager import CityManager
+    from cab_management.cab_manager import CabManager
+    from cab_management.cab import CabState
 
 class TestBookingManager(unittest.TestCase):
 
@@ -56,6 +64,97 @@ class TestBookingManager(unittest.TestCase):
         self.assertIn(self.booking_manager.bookings[self.booking_id], all_bookings, "All bookings should include the created booking")
         logger.info("getAllBookings test passed.")
 
+    def test_bookCabs(self):
+        """Test the bookCabs method."""
+        city_id = 2
+        idle_cabs = len(CityManager.getInstance().getCity(city_id).idleCabs)
+        requests = [city_id] * idle_cabs + [(city_id, self.start_time), 999]
+        booking_ids = self.booking_manager.bookCabs(requests)
+        self.assertEqual(len(booking_ids), len(requests), "There should be one result per request")
+        self.assertIsNone(booking_ids[-1], "Unknown city should not be booked")
+        self.assertIsNone(booking_ids[-2], "Request beyond the idle cabs should not be booked")
+        booked_cabs = {self.booking_manager.bookings[booking_id].cab.cabId for booking_id in booking_ids[:idle_cabs]}
+        self.assertEqual(len(booked_cabs), idle_cabs, "Each request should get a different cab")
+        logger.info("bookCabs test passed.")
+
+    def test_bookCabs_reserves_taken_cabs(self):
+        """Test that bookCabs reserves every taken cab before assigning any of them."""
+        city_id = 901
+        CityManager.getInstance().addCity(city_id, "Batch City")
+        for cab_id in range(90100, 90104):
+            CabManager.getInstance().registerCab(cab_id, city_id)
+
+        seen_states = []
+        concurrent_cabs = []
+        assign_cab = self.booking_manager._assignCab
+
+        def assign_and_interleave(cab, city, start_time=None):
+            # Runs outside the city lock, where another thread may book in the same city
+            seen_states.append({other: CabManager.getInstance().getCab(other).state for other in (90100, 90101)})
+            booking_id = self.booking_manager.bookCab(city_id)
+            if booking_id is not None:
+                concurrent_cabs.append(self.booking_manager.bookings[booking_id].cab.cabId)
+            return assign_cab(cab, city, start_time)
+
+        self.booking_manager._assignCab = assign_and_interleave
+        try:
+            booking_ids = self.booking_manager.bookCabs([city_id, city_id])
+        finally:
+            del self.booking_manager._assignCab
+
+        self.assertEqual(seen_states[0], {90100: CabState.RESERVED, 90101: CabState.RESERVED},
+                         "Taken cabs should be reserved before the lock is released")
+        batch_cabs = {self.booking_manager.bookings[booking_id].cab.cabId for booking_id in booking_ids}
+        self.assertEqual(len(batch_cabs), 2, "Each request should get a different cab")
+        self.assertFalse(batch_cabs & set(concurrent_cabs), "A concurrent booking should not get a batch cab")
+        logger.info("bookCabs reservation test passed.")
+
+    def test_concurrent_bookCab(self):
+        """Test that concurrent bookings never assign a cab twice or reuse a booking ID."""
+        city_id = 900
+        CityManager.getInstance().addCity(city_id, "Stress City")
+        for cab_id in range(90000, 90020):
+            CabManager.getInstance().registerCab(cab_id, city_id)
+
+        active_cabs = set()
+        booking_ids = []
+        errors = []
+        state_lock = threading.Lock()
+        previous_switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)  # Switch threads as often as possible to provoke races
+
+        def worker():
+            for _ in range(500):
+                booking_id = self.booking_manager.bookCab(city_id)
+                if booking_id is None:
+                    continue
+                cab_id = self.booking_manager.bookings[booking_id].cab.cabId
+                with state_lock:
+                    if cab_id in active_cabs:
+                        errors.append(f"Cab {cab_id} assigned to two active bookings")
+                    active_cabs.add(cab_id)
+                    booking_ids.append(booking_id)
+                with state_lock:
+                    active_cabs.discard(cab_id)
+                self.booking_manager.endBooking(booking_id)
+
+        try:
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                for future in [executor.submit(worker) for _ in range(8)]:
+                    future.result()
+        finally:
+            sys.setswitchinterval(previous_switch_interval)
+
+        self.assertEqual(errors, [], "No cab should be in two active bookings")
+        for cab_id in range(90000, 90020):
+            # A cab handed to two bookings at once is only reserved once for both of them
+            cab = CabManager.getInstance().getCab(cab_id)
+            reservations = sum(1 for _, state in cab.getHistory() if state == CabState.RESERVED)
+            self.assertEqual(reservations, len(cab.getBookings()), f"Cab {cab_id} was double-booked")
+        self.assertEqual(len(booking_ids), len(set(booking_ids)), "Booking IDs should be unique")
+        self.assertGreater(len(booking_ids), 0, "Some bookings should have succeeded")
+        logger.info("concurrent bookCab test passed.")
+
 if __name__ == '__main__':
     unittest.main()
 
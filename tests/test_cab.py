@@ -1,6 +1,8 @@
 import unittest
 import sys
 import logging
+import random
+from datetime import datetime, timedelta
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -44,5 +46,34 @@ class TestCab(unittest.TestCase):
         self.assertGreater(len(history), 0, "History should not be empty")
         logger.info("test_get_history passed.")
 
+    def test_idle_time_matches_history_walk(self):
+        """Test that the running idle total matches a full walk of the history."""
+        def idle_time_from_history(cab, current_time):
+            total_idle_time = timedelta(0)
+            previous_time = None
+            for timestamp, state in cab.getHistory():
+                if isinstance(timestamp, datetime):
+                    if previous_time is not None and state == CabState.IDLE:
+                        total_idle_time += timestamp - previous_time
+                    previous_time = timestamp
+            if cab.getState() == CabState.IDLE and previous_time is not None:
+                total_idle_time += current_time - previous_time
+            return int(total_idle_time.total_seconds())
+
+        rng = random.Random(42)
+        base_time = datetime(2024, 7, 25, 10, 0)
+        for trial in range(200):
+            cab = Cab(1000 + trial, self.city_id)
+            for _ in range(rng.randint(0, 30)):
+                timestamp = rng.choice([
+                    None,
+                    base_time + timedelta(seconds=rng.randint(-86400, 86400), microseconds=rng.randint(0, 999999)),
+                    "2024-07-25T10:00:00",
+                ])
+                cab.setState(rng.choice(list(CabState)), timestamp)
+            current_time = base_time + timedelta(days=rng.randint(0, 3))
+            self.assertEqual(cab.getIdleTime(current_time), idle_time_from_history(cab, current_time))
+        logger.info("test_idle_time_matches_history_walk passed.")
+
 if __name__ == '__main__':
     unittest.main()
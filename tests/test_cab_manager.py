@@ -41,6 +41,37 @@ class TestCabManager(unittest.TestCase):
         self.assertEqual(cab.cityId, self.city_id, "City ID should match the registered city ID")
         logger.info("registerCab test passed.")
 
+    def test_registerCabs(self):
+        """Test the registerCabs method."""
+        city = self.cab_manager.cityManager.getCity(2)
+        self.addCleanup(self._unregister, 9001, 9002, 9003)
+        registered = self.cab_manager.registerCabs([(9001, 2), (9002, 2, "ON_TRIP"), (9003, 3, CabState.RESERVED)])
+        self.assertEqual(registered, 3)
+        self.assertEqual(self.cab_manager.getCab(9002).getState(), CabState.ON_TRIP)
+        self.assertEqual(len(self.cab_manager.getCab(9002).getHistory()), 1, "Bulk registration should record one entry")
+        self.assertIn(9001, city.cabs)
+        self.assertIn(self.cab_manager.getCab(9001), city.idleCabs)
+        self.assertNotIn(self.cab_manager.getCab(9002), city.idleCabs)
+
+        # Rows are validated before anything is registered
+        with self.assertRaises(ValueError):
+            self.cab_manager.registerCabs([(9004, 2), (9005, 999)])
+        with self.assertRaises(ValueError):
+            self.cab_manager.registerCabs([(9006, 2, "PARKED")])
+        self.assertIsNone(self.cab_manager.getCab(9004))
+
+        # Re-registering a cab in another city moves it
+        self.cab_manager.registerCabs([(9001, 3)])
+        self.assertNotIn(9001, city.cabs)
+        self.assertIn(9001, self.cab_manager.cityManager.getCity(3).cabs)
+        logger.info("registerCabs test passed.")
+
+    def _unregister(self, *cab_ids):
+        for cab_id in cab_ids:
+            cab = self.cab_manager.cabs.pop(cab_id, None)
+            if cab is not None and cab._city is not None:
+                cab._city.removeCab(cab_id)
+
     def test_updateCab(self):
         """Test the updateCab method."""
         new_state = CabState.RESERVED
@@ -9,11 +9,11 @@ logger = logging.getLogger(__name__)
 
 try:
     from src.cab_management.city import City
-    from src.cab_management.cab import Cab
+    from src.cab_management.cab import Cab, CabState
 except ImportError:
     sys.path.insert(0, 'src')
     from cab_management.city import City
-    from cab_management.cab import Cab
+    from cab_management.cab import Cab, CabState
 
 class TestCity(unittest.TestCase):
 
@@ -55,5 +55,19 @@ class TestCity(unittest.TestCase):
         self.assertEqual(cabs[0].cabId, cab_id, "The cab ID should match the added cab ID")
         logger.info("test_get_cabs passed.")
 
+    def test_get_cabs_by_state(self):
+        """Test that state buckets and counts follow state changes."""
+        cabs = [Cab(cab_id, self.city_id) for cab_id in (101, 102, 103)]
+        for cab in cabs:
+            self.city.addCab(cab)
+        cabs[0].setState(CabState.ON_TRIP)
+        cabs[1].setState("RESERVED")
+        self.assertEqual([cab.cabId for cab in self.city.getCabsByState(CabState.IDLE)], [103])
+        self.assertEqual([cab.cabId for cab in self.city.getCabsByState("ON_TRIP")], [101])
+        self.city.removeCab(102)
+        self.assertEqual(self.city.getCabCountByState(CabState.RESERVED), 0, "Removed cab should leave its bucket")
+        self.assertEqual(self.city.getCabCounts(), {CabState.IDLE: 1, CabState.RESERVED: 0, CabState.ON_TRIP: 1})
+        logger.info("test_get_cabs_by_state passed.")
+
 if __name__ == '__main__':
     unittest.main()
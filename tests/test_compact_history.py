@@ -0,0 +1,50 @@
+import unittest
+import sys
+import logging
+from datetime import datetime, timezone
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+try:
+    from src.cab_management.compact_history import CompactHistory
+    from src.cab_management.cab import CabState
+except ImportError:
+    sys.path.insert(0, 'src')
+    from cab_management.compact_history import CompactHistory
+    from cab_management.cab import CabState
+
+class TestCompactHistory(unittest.TestCase):
+
+    def setUp(self):
+        """Set up entries covering every kind of timestamp the history accepts."""
+        self.entries = [
+            (datetime(2024, 7, 25, 10, 0, 0, 123456), CabState.IDLE),
+            ("2024-07-25T11:00:00", CabState.RESERVED),
+            ("2024-07-25 12:00:00", CabState.ON_TRIP),
+            (datetime(2024, 7, 25, 13, 0, tzinfo=timezone.utc), CabState.IDLE),
+        ]
+        self.history = CompactHistory(self.entries)
+
+    def test_round_trip(self):
+        """Test that entries decode to exactly what was appended."""
+        self.assertEqual(len(self.history), 4)
+        self.assertEqual(list(self.history), self.entries)
+        self.assertEqual(self.history[-1], self.entries[-1])
+        self.assertEqual(self.history[1:3], self.entries[1:3])
+        self.assertEqual(self.history, self.entries)
+        with self.assertRaises(IndexError):
+            self.history[4]
+        logger.info("test_round_trip passed.")
+
+    def test_iter_micros(self):
+        """Test raw iteration over packed entries."""
+        micros = [micros for micros, _ in self.history.iterMicros()]
+        self.assertEqual(micros[1] - micros[0], 3600 * 10**6 - 123456)
+        self.assertIsNone(micros[2], "Non-canonical strings are kept as-is")
+        self.assertEqual([state for _, state in self.history.iterMicros()], [state for _, state in self.entries])
+        logger.info("test_iter_micros passed.")
+
+if __name__ == '__main__':
+    unittest.main()
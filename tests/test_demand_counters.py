@@ -0,0 +1,93 @@
+import unittest
+import os
+import sys
+import tempfile
+import logging
+from datetime import datetime
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+try:
+    from src.cab_management.demand_counters import DemandCounters
+    from src.cab_management.booking import Booking, BookingState
+    from src.cab_management.city import City
+    from src.cab_management.analytics import Analytics
+    from src.cab_management.booking_manager import BookingManager
+    from src.cab_management.cab_manager import CabManager
+    from src.cab_management.city_manager import CityManager
+    from src.cab_management.snapshot import snapshot, restore
+    from src.cab_management.utils import load_initial_data
+except ImportError:
+    sys.path.insert(0, 'src')
+    from cab_management.demand_counters import DemandCounters
+    from cab_management.booking import Booking, BookingState
+    from cab_management.city import City
+    from cab_management.analytics import Analytics
+    from cab_management.booking_manager import BookingManager
+    from cab_management.cab_manager import CabManager
+    from cab_management.city_manager import CityManager
+    from cab_management.snapshot import snapshot, restore
+    from cab_management.utils import load_initial_data
+
+class TestDemandCounters(unittest.TestCase):
+
+    def assertMatchesBatch(self, booking_manager):
+        bookings = booking_manager.getAllBookings()
+        self.assertEqual(Analytics.highDemandCities(booking_manager.demand), Analytics.highDemandCities(bookings))
+        self.assertEqual(Analytics.demandHistograms(booking_manager.demand), Analytics.demandHistograms(bookings))
+        city_counts, hour_counts, city_hour_counts = booking_manager.demand.histograms()
+        for city, counts in city_hour_counts.items():
+            self.assertEqual(sum(counts), city_counts[city])
+        self.assertEqual([sum(column) for column in zip(*city_hour_counts.values())], hour_counts)
+
+    def test_matches_batch_with_backfill(self):
+        """Test that the counters agree with the loop over bookings, including backfilled and restored bookings."""
+        load_initial_data()
+        booking_manager = BookingManager.getInstance()
+        self.assertMatchesBatch(booking_manager)
+
+        # Backfill old bookings with start times long before the existing ones
+        cab, city = CabManager.getInstance().getCab(105), CityManager.getInstance().getCity(3)
+        for hour in (3, 3, 3, 17):
+            booking_id = booking_manager.bookOldCab(cab, city, f"2019-03-04T{hour:02d}:10:00")
+            self.assertIsNotNone(booking_id)
+            booking_manager.endBooking(booking_id, f"2019-03-04T{hour:02d}:50:00")
+        booking_manager.bookCab(2, datetime(2030, 1, 1, 3))
+        self.assertMatchesBatch(booking_manager)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'fleet.snap')
+            snapshot(path)
+            expected = Analytics.demandHistograms(booking_manager.demand)
+            booking_manager.bookCab(3, datetime(2030, 1, 1, 5))
+            restore(path)
+        self.assertEqual(Analytics.demandHistograms(booking_manager.demand), expected)
+        self.assertMatchesBatch(booking_manager)
+        logger.info("test_matches_batch_with_backfill passed.")
+
+    def test_ties_and_unusable_start_times(self):
+        """Test that ties go to the first city and hour counted and unusable start times are skipped."""
+        first, second = City(911, "First"), City(912, "Second")
+        start_times = [
+            (second, "not a time"),  # Skipped, so Second is not the first city seen
+            (first, "2024-07-25T09:00:00+05:00"),
+            (second, datetime(2024, 7, 25, 14, 30)),
+            (first, "2024-07-25T14:00:00"),
+            (second, datetime(2024, 7, 25, 9, 15)),
+            (first, None),  # Skipped
+        ]
+        bookings = [Booking.fromRow(position, None, city, BookingState.COMPLETED, start_time, None)
+                    for position, (city, start_time) in enumerate(start_times)]
+        counters = DemandCounters(bookings)
+        self.assertEqual((counters.skipped, len(counters)), (2, 4))
+        self.assertEqual(counters.highDemandCities(), Analytics.highDemandCities(bookings))
+        self.assertEqual(counters.highDemandCities(), ("First", 9))
+        self.assertEqual(counters.histograms()[2][second][14], 1)
+        with self.assertRaises(ValueError):
+            DemandCounters(bookings[:1]).highDemandCities()
+        logger.info("test_ties_and_unusable_start_times passed.")
+
+if __name__ == '__main__':
+    unittest.main()
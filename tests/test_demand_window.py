@@ -0,0 +1,104 @@
+import unittest
+import sys
+import random
+from collections import Counter
+import logging
+from datetime import datetime, timedelta
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+try:
+    from src.cab_management.demand_window import DemandWindow
+    from src.cab_management.booking import Booking, BookingState
+    from src.cab_management.city import City
+    from src.cab_management.booking_manager import BookingManager
+    from src.cab_management.utils import load_initial_data
+except ImportError:
+    sys.path.insert(0, 'src')
+    from cab_management.demand_window import DemandWindow
+    from cab_management.booking import Booking, BookingState
+    from cab_management.city import City
+    from cab_management.booking_manager import BookingManager
+    from cab_management.utils import load_initial_data
+
+START = datetime(2024, 7, 25, 8)
+
+def make_booking(city, start_time):
+    return Booking.fromRow(0, None, city, BookingState.COMPLETED, start_time, None)
+
+class TestDemandWindow(unittest.TestCase):
+
+    def test_window_slides(self):
+        """Test that bookings leave the counts once the window moves past them."""
+        north, south = City(921, "North"), City(922, "South")
+        demand_window = DemandWindow(timedelta(hours=1), buckets=6, topK=2)
+        demand_window.extend(make_booking(north, START + timedelta(minutes=minute)) for minute in (0, 5, 10))
+        demand_window.extend(make_booking(south, START + timedelta(minutes=minute)) for minute in (40, 50))
+        self.assertEqual(demand_window.topCities(), [("North", 3), ("South", 2)])
+        self.assertEqual(demand_window.topHours(), [(8, 5)])
+
+        demand_window.add(make_booking(south, START + timedelta(minutes=65)))  # North's first bucket expires
+        self.assertEqual(demand_window.topCities(), [("South", 3), ("North", 1)])
+        demand_window.add(make_booking(north, START - timedelta(hours=2)))  # Backfilled before the window
+        self.assertEqual(demand_window.late, 1)
+        self.assertEqual(demand_window.topCities(now=START + timedelta(minutes=115)), [("South", 1)])
+        self.assertEqual(demand_window.topHours(now=START + timedelta(hours=5)), [])
+        logger.info("test_window_slides passed.")
+
+    def test_exact_top_cities_track_window(self):
+        """Test that the maintained top-k order matches counting the window from scratch."""
+        rng = random.Random(7)
+        cities = [City(930 + index, f"City {index}") for index in range(40)]
+        demand_window = DemandWindow(timedelta(hours=1), buckets=12, topK=5)
+        bookings = []
+        for minute in range(0, 300, 3):
+            start_time = START + timedelta(minutes=minute)
+            for _ in range(rng.randint(0, 6)):
+                city = rng.choice(cities[:rng.randint(1, len(cities))])
+                demand_window.add(make_booking(city, start_time))
+                bookings.append((city, start_time))
+            if minute % 30 == 0:
+                cutoff = start_time - timedelta(minutes=55)  # The last 12 buckets of 5 minutes
+                window = Counter(city for city, booked in bookings if booked >= cutoff)
+                expected = sorted(window.items(), key=lambda item: (-item[1], item[0].cityId))[:7]
+                self.assertEqual(demand_window.topCities(7, now=start_time), [(city.name, count) for city, count in expected])
+        logger.info("test_exact_top_cities_track_window passed.")
+
+    def test_sketch_matches_exact_counts(self):
+        """Test that sketching finds the same heavy hitters as exact counting on a skewed stream."""
+        cities = [City(city_id, f"City {city_id}") for city_id in range(1000, 3000)]
+        rng = random.Random(7)
+        bookings = [make_booking(cities[min(int(rng.paretovariate(1.0)) - 1, len(cities) - 1)],
+                                 START + timedelta(seconds=position))
+                    for position in range(20000)]
+        exact = DemandWindow(timedelta(hours=2), buckets=12, topK=5)
+        sketched = DemandWindow(timedelta(hours=2), buckets=12, topK=5, sketchWidth=512)
+        exact.extend(bookings)
+        sketched.extend(bookings)
+
+        expected, estimated = exact.topCities(), sketched.topCities()
+        self.assertEqual([name for name, _ in estimated], [name for name, _ in expected])
+        for (_, count), (_, estimate) in zip(expected, estimated):
+            self.assertGreaterEqual(estimate, count)  # Count-min never undercounts
+            self.assertLessEqual(estimate, count * 1.05)
+        self.assertEqual(sketched.topHours(), exact.topHours())
+        logger.info("test_sketch_matches_exact_counts passed.")
+
+    def test_booking_manager_feeds_window(self):
+        """Test that BookingManager keeps the window up to date as bookings are added."""
+        load_initial_data()
+        booking_manager = BookingManager.getInstance()
+        demand_window = booking_manager.enableDemandWindow(timedelta(hours=1), buckets=4)
+        self.addCleanup(booking_manager.disableDemandWindow)
+        self.assertIs(booking_manager.enableDemandWindow(), demand_window)
+        booking_manager.bookCab(2, datetime(2031, 3, 3, 21, 10))
+        booking_manager.bookCabs([(1, datetime(2031, 3, 3, 21, 20)), (2, datetime(2031, 3, 3, 21, 30))])
+        name = booking_manager.bookings[max(booking_manager.bookings)].city.name
+        self.assertEqual(demand_window.topCities(1), [(name, 2)])
+        self.assertEqual(demand_window.topHours(), [(21, 3)])
+        logger.info("test_booking_manager_feeds_window passed.")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+import sys
+import logging
+from datetime import datetime, timedelta, timezone
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+try:
+    from src.cab_management.fleet_report import buildFleetReport
+    from src.cab_management.analytics import Analytics
+    from src.cab_management.cab import Cab, CabState
+    from src.cab_management.cab_manager import CabManager
+    from src.cab_management.utils import load_initial_data
+except ImportError:
+    sys.path.insert(0, 'src')
+    from cab_management.fleet_report import buildFleetReport
+    from cab_management.analytics import Analytics
+    from cab_management.cab import Cab, CabState
+    from cab_management.cab_manager import CabManager
+    from cab_management.utils import load_initial_data
+
+class TestFleetReport(unittest.TestCase):
+
+    def assertMatchesPerCab(self, report, cabs, start_time, end_time):
+        for cab in cabs:
+            for state in CabState:
+                self.assertEqual(report.cab(cab.cabId)[state],
+                                 Analytics.calculateStateTime(cab, state, start_time, end_time),
+                                 f"cab {cab.cabId} {state}")
+
+    def test_matches_per_cab_queries(self):
+        """Test that the report gives the same seconds as calculateStateTime for the whole fleet."""
+        load_initial_data()
+        cabs = list(CabManager.getInstance().cabs.values())
+        windows = [(datetime(2024, 7, 25), datetime(2024, 7, 26)), (None, datetime(2024, 7, 26, 12)),
+                   (datetime(2024, 7, 25, 10), datetime(2024, 7, 25, 9))]
+        for start_time, end_time in windows:
+            report = Analytics.fleetIdleReport(start_time, end_time)
+            self.assertEqual(len(report), len(cabs))
+            self.assertMatchesPerCab(report, cabs, start_time, end_time)
+            for cityId, totals in report.cities.items():
+                self.assertEqual(totals[CabState.IDLE], sum(report.cab(cab.cabId)[CabState.IDLE]
+                                                            for cab in cabs if cab.cityId == cityId))
+
+        report = Analytics.fleetIdleReport(datetime(2024, 7, 25), datetime(2024, 7, 26), city=1)
+        self.assertEqual(set(report.cabIds), {cab.cabId for cab in cabs if cab.cityId == 1})
+        self.assertEqual(list(report.cities), [1])
+        self.assertIsNone(report.cab(-1))
+        logger.info("test_matches_per_cab_queries passed.")
+
+    def test_unordered_and_unusual_timestamps(self):
+        """Test histories with out-of-order, ISO string, timezone-aware and unusable timestamps."""
+        start = datetime(2024, 7, 25, 8)
+        cab = Cab.fromRow(9301, 1, CabState.IDLE, start)
+        cab.setState(CabState.RESERVED, (start + timedelta(hours=2)).isoformat())
+        cab.setState(CabState.IDLE, start + timedelta(hours=1))  # Before the previous transition
+        cab.history.append((datetime(2024, 7, 25, 15, tzinfo=timezone(timedelta(hours=5))), CabState.ON_TRIP))  # 10:00 UTC
+        cab.history.append(("not a time", CabState.RESERVED))
+        other = Cab.fromRow(9302, 2, CabState.ON_TRIP, start + timedelta(minutes=30))
+        for start_time, end_time in [(start, start + timedelta(hours=4)), (start + timedelta(minutes=90), start + timedelta(days=1))]:
+            report = buildFleetReport([cab, other], start_time, end_time)
+            self.assertMatchesPerCab(report, [cab, other], start_time, end_time)
+        report = buildFleetReport([cab, other], start, start + timedelta(hours=4))
+        self.assertEqual(report.cities[2], {CabState.IDLE: 0, CabState.RESERVED: 0, CabState.ON_TRIP: 12600})
+        logger.info("test_unordered_and_unusual_timestamps passed.")
+
+    def test_invalid_window_bounds(self):
+        """Test that unparseable window bounds are rejected like calculateStateTime rejects them."""
+        load_initial_data()
+        cabs = list(CabManager.getInstance().cabs.values())
+        for start_time, end_time in [("not a time", datetime(2024, 7, 26)), (datetime(2024, 7, 25), "not a time")]:
+            with self.assertRaises(ValueError):
+                buildFleetReport(cabs, start_time, end_time)
+            with self.assertRaises(ValueError):
+                Analytics.fleetIdleReport(start_time, end_time)
+            with self.assertRaises(ValueError):
+                Analytics.calculateStateTime(cabs[0], CabState.IDLE, start_time, end_time)
+        logger.info("test_invalid_window_bounds passed.")
+
+if __name__ == '__main__':
+    unittest.main()
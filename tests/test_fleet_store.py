@@ -0,0 +1,95 @@
+import unittest
+import sys
+import threading
+import logging
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+try:
+    from src.cab_management.fleet_store import FleetStore
+    from src.cab_management.cab import CabState
+    from src.cab_management.cab_manager import CabManager
+    from src.cab_management.utils import load_initial_data
+except ImportError:
+    sys.path.insert(0, 'src')
+    from cab_management.fleet_store import FleetStore
+    from cab_management.cab import CabState
+    from cab_management.cab_manager import CabManager
+    from cab_management.utils import load_initial_data
+
+class TestFleetStore(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a store with cabs in two cities."""
+        self.store = FleetStore()
+        self.store.add(101, 1)
+        self.store.add(102, 1, CabState.ON_TRIP)
+        self.store.add(103, 2)
+        self.store.add(104, 1)
+        logger.info("Fleet store set up with four cabs.")
+
+    def test_queries(self):
+        """Test state filtering and per-city counts."""
+        self.assertEqual(sorted(self.store.getCabIdsInCityByState(1, CabState.IDLE)), [101, 104])
+        self.assertEqual(self.store.getCabIdsInCityByState(2, "ON_TRIP"), [])
+        counts = self.store.getCountsByCityAndState()
+        self.assertEqual(counts[1], {CabState.IDLE: 2, CabState.RESERVED: 0, CabState.ON_TRIP: 1})
+        self.assertEqual(counts[2][CabState.IDLE], 1)
+        logger.info("test_queries passed.")
+
+    def test_update_and_remove(self):
+        """Test that updates and removals keep rows consistent."""
+        self.store.update(103, state=CabState.RESERVED, cityId=1)
+        self.store.remove(101)
+        self.assertNotIn(101, self.store)
+        self.assertEqual(len(self.store), 3)
+        self.assertEqual(self.store.getState(104), CabState.IDLE, "Moved row should keep its data")
+        self.assertEqual(self.store.getCabIdsInCityByState(1, CabState.RESERVED), [103])
+        logger.info("test_update_and_remove passed.")
+
+    def test_concurrent_add_and_scan(self):
+        """Test that scans running while other threads add cabs neither fail nor see misaligned rows."""
+        errors = []
+
+        def add(first):
+            for cab_id in range(first, first + 2000):
+                self.store.add(cab_id, 3)
+
+        def scan():
+            try:
+                for _ in range(200):
+                    self.store.getCabIdsInCityByState(3, CabState.IDLE)
+                    self.store.getCountsByCityAndState()
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=add, args=(first,)) for first in (1000, 5000)]
+        threads.append(threading.Thread(target=scan))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(self.store.getCabIdsInCityByState(3, CabState.IDLE)), 4000)
+        self.assertEqual(len(self.store), len(self.store.rows))
+        logger.info("test_concurrent_add_and_scan passed.")
+
+    def test_cab_manager_integration(self):
+        """Test that the CabManager keeps its fleet store in sync."""
+        load_initial_data()
+        cab_manager = CabManager.getInstance()
+        store = cab_manager.enableFleetStore()
+        try:
+            self.assertEqual(len(store), len(cab_manager.cabs))
+            cab_manager.updateCab(101, CabState.ON_TRIP, 2)
+            self.assertEqual(store.getState(101), CabState.ON_TRIP)
+            self.assertIn(101, cab_manager.getCabIdsInCityByState(2, CabState.ON_TRIP))
+            self.assertEqual(cab_manager.getCabCountsByCityAndState()[3], CabManager.getInstance().cityManager.getCabCountsInCity(3))
+        finally:
+            cab_manager.disableFleetStore()
+        logger.info("test_cab_manager_integration passed.")
+
+if __name__ == '__main__':
+    unittest.main()
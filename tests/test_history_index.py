@@ -0,0 +1,71 @@
+import unittest
+import sys
+import logging
+import random
+from datetime import datetime, timedelta
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+try:
+    from src.cab_management.history_index import HistoryIndex
+    from src.cab_management.cab import CabState
+except ImportError:
+    sys.path.insert(0, 'src')
+    from cab_management.history_index import HistoryIndex
+    from cab_management.cab import CabState
+
+def time_in_state_by_scan(history, state, start_time, end_time):
+    """Reference implementation walking every segment of the sorted history."""
+    entries = sorted(history, key=lambda entry: entry[0])
+    total = timedelta(0)
+    for position, (timestamp, entry_state) in enumerate(entries):
+        segment_end = entries[position + 1][0] if position + 1 < len(entries) else end_time
+        if entry_state == state:
+            overlap = min(segment_end, end_time) - max(timestamp, start_time)
+            if overlap > timedelta(0):
+                total += overlap
+    return total
+
+class TestHistoryIndex(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a base time for the generated histories."""
+        self.base_time = datetime(2024, 7, 25, 10, 0)
+
+    def test_time_in_state(self):
+        """Test window queries on a simple trip."""
+        index = HistoryIndex([
+            (self.base_time, CabState.IDLE),
+            (self.base_time + timedelta(hours=1), CabState.RESERVED),
+            (self.base_time + timedelta(hours=1, minutes=10), CabState.ON_TRIP),
+            (self.base_time + timedelta(hours=2), CabState.IDLE),
+        ])
+        window_end = self.base_time + timedelta(hours=3)
+        self.assertEqual(index.timeInState(CabState.IDLE, self.base_time, window_end), timedelta(hours=2))
+        self.assertEqual(index.timeInState(CabState.RESERVED, self.base_time, window_end), timedelta(minutes=10))
+        self.assertEqual(index.timeInState(CabState.ON_TRIP, self.base_time, window_end), timedelta(minutes=50))
+        self.assertEqual(index.timeInState(CabState.ON_TRIP, window_end, self.base_time), timedelta(0))
+        logger.info("test_time_in_state passed.")
+
+    def test_matches_scan(self):
+        """Test random histories, including out-of-order and ISO string timestamps, against a full scan."""
+        rng = random.Random(7)
+        for _ in range(100):
+            history = []
+            index = HistoryIndex()
+            for _ in range(rng.randint(1, 40)):
+                timestamp = self.base_time + timedelta(minutes=rng.randint(0, 2000))
+                state = rng.choice(list(CabState))
+                history.append((timestamp, state))
+                index.append(timestamp.isoformat() if rng.random() < 0.2 else timestamp, state)
+            start_time = self.base_time + timedelta(minutes=rng.randint(-100, 2100))
+            end_time = start_time + timedelta(minutes=rng.randint(0, 1000))
+            for state in CabState:
+                self.assertEqual(index.timeInState(state, start_time, end_time),
+                                 time_in_state_by_scan(history, state, start_time, end_time))
+        logger.info("test_matches_scan passed.")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+import sys
+import logging
+from datetime import datetime, timedelta
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+try:
+    from src.cab_management.city import City
+    from src.cab_management.cab import Cab, CabState
+except ImportError:
+    sys.path.insert(0, 'src')
+    from cab_management.city import City
+    from cab_management.cab import Cab, CabState
+
+class TestIdleCabIndex(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a city with cabs that have been idle for 1, 3 and 2 hours."""
+        self.city = City(1, "New York")
+        self.cabs = {}
+        now = datetime.now()
+        for cab_id, idle_hours in ((101, 1), (102, 3), (103, 2)):
+            cab = Cab(cab_id, self.city.cityId)
+            cab.setState(CabState.ON_TRIP, now - timedelta(hours=idle_hours, minutes=1))
+            cab.setState(CabState.IDLE, now - timedelta(hours=idle_hours))
+            self.city.addCab(cab)
+            self.cabs[cab_id] = cab
+        logger.info("City set up with three idle cabs.")
+
+    def test_longest_idle_cab(self):
+        """Test that the index returns the cab with the most idle time."""
+        best_cab = self.city.getLongestIdleCab()
+        expected = max(self.cabs.values(), key=lambda cab: cab.getIdleTime())
+        self.assertIs(best_cab, expected, "Index should return the cab with the most idle time")
+        self.assertEqual(best_cab.cabId, 102)
+        logger.info("test_longest_idle_cab passed.")
+
+    def test_state_change_updates_index(self):
+        """Test that cabs leave and re-enter the index on state changes."""
+        self.cabs[102].setState(CabState.RESERVED)
+        self.assertEqual(self.city.getLongestIdleCab().cabId, 103, "Reserved cab should be skipped")
+        self.assertEqual(len(self.city.idleCabs), 2)
+        self.cabs[102].setState(CabState.IDLE)
+        self.assertIn(self.cabs[102], self.city.idleCabs, "Cab should re-enter the index when idle again")
+        logger.info("test_state_change_updates_index passed.")
+
+    def test_remove_cab(self):
+        """Test that removed cabs are no longer returned."""
+        self.city.removeCab(102)
+        self.city.removeCab(103)
+        self.assertEqual(self.city.getLongestIdleCab().cabId, 101)
+        self.city.removeCab(101)
+        self.assertIsNone(self.city.getLongestIdleCab(), "Empty index should return None")
+        logger.info("test_remove_cab passed.")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import unittest
+import os
+import sys
+import tempfile
+import logging
+from datetime import datetime
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+try:
+    from src.cab_management.journal import Journal, replay
+    from src.cab_management.utils import load_initial_data
+    from src.cab_management.booking_manager import BookingManager
+    from src.cab_management.cab_manager import CabManager
+    from src.cab_management.city_manager import CityManager
+    from src.cab_management.cab import CabState
+except ImportError:
+    sys.path.insert(0, 'src')
+    from cab_management.journal import Journal, replay
+    from cab_management.utils import load_initial_data
+    from cab_management.booking_manager import BookingManager
+    from cab_management.cab_manager import CabManager
+    from cab_management.city_manager import CityManager
+    from cab_management.cab import CabState
+
+def fleet_state():
+    """Summarize the state of all managers as plain values."""
+    cabs = {cab_id: (cab.cityId, cab.state, cab.getHistory(), list(cab.bookings), cab._idleTotal,
+                     cab._city.cityId if cab._city else None)
+            for cab_id, cab in CabManager.getInstance().cabs.items()}
+    bookings = {booking_id: (booking.cab.cabId, booking.city.cityId, booking.state, booking.start_time, booking.end_time)
+                for booking_id, booking in BookingManager.getInstance().bookings.items()}
+    cities = {city_id: (city.name, sorted(city.cabs), {state: sorted(cabs) for state, cabs in city.cabsByState.items()})
+              for city_id, city in CityManager.getInstance().cities.items()}
+    return cabs, bookings, cities
+
+class TestJournal(unittest.TestCase):
+
+    def setUp(self):
+        """Start from empty managers and pick a journal path."""
+        CabManager._instance = None
+        CityManager._instance = None
+        BookingManager._instance = None
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'fleet.journal')
+        logger.info("Empty managers set up for journal tests.")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_replay(self):
+        """Test that replaying the journal rebuilds the same state."""
+        with Journal(self.path) as journal:
+            load_initial_data()
+            booking_manager = BookingManager.getInstance()
+            booking_id = booking_manager.bookCab(3, datetime(2024, 7, 26, 9))
+            booking_manager.bookCabs([1, 2])
+            booking_manager.endBooking(booking_id, datetime(2024, 7, 26, 10))
+            CabManager.getInstance().updateCab(101, CabState.IDLE, 5)
+            journal.sync()
+            self.assertEqual(journal.durable, journal.appended)
+        expected = fleet_state()
+
+        CabManager.getInstance().registerCab(999, 1)
+        counts = replay(self.path)
+        self.assertEqual(fleet_state(), expected)
+        self.assertEqual(counts['bookings'], len(expected[1]))
+        self.assertIsNone(CabManager.getInstance().getCab(999))
+        self.assertIsNotNone(BookingManager.getInstance().bookCab(3), "Replayed fleet should accept bookings")
+        logger.info("test_replay passed after %s events.", counts['events'])
+
+    def test_city_removed(self):
+        """Test that a removed city stays removed after replay, and can be added again."""
+        with Journal(self.path):
+            city_manager = CityManager.getInstance()
+            city_manager.addCity(1, "New York")
+            city_manager.addCity(2, "Boston")
+            city_manager.addCity(3, "Chicago")
+            self.assertTrue(city_manager.removeCity(2))
+            self.assertTrue(city_manager.removeCity(3))
+            city_manager.addCity(3, "Chicago")
+        expected = fleet_state()
+
+        CityManager.getInstance().addCity(4, "Denver")
+        replay(self.path)
+        self.assertEqual(fleet_state(), expected)
+        self.assertEqual(sorted(CityManager.getInstance().cities), [1, 3])
+        logger.info("test_city_removed passed.")
+
+    def test_torn_record(self):
+        """Test that a record cut short by a crash is dropped, and appending resumes after it."""
+        with Journal(self.path):
+            CityManager.getInstance().addCity(1, "New York")
+            CabManager.getInstance().registerCab(101, 1)
+        with open(self.path, 'ab') as file:
+            file.write(b'\x03\x20\x00\x65')  # Header of a cab state record and part of its payload
+        with Journal(self.path):
+            CabManager.getInstance().registerCab(102, 1)
+        replay(self.path)
+        self.assertEqual(sorted(CabManager.getInstance().cabs), [101, 102])
+        logger.info("test_torn_record passed.")
+
+    def test_corrupt_tail(self):
+        """Test that replay stops at a zero-filled or corrupted record, and that long payloads round-trip."""
+        long_name = "X" * 70000  # Longer than a 16-bit payload length
+        with Journal(self.path):
+            CityManager.getInstance().addCity(1, long_name)
+            CabManager.getInstance().registerCab(101, 1)
+        with open(self.path, 'ab') as file:
+            file.write(bytes(64))  # Preallocated space never written before a crash
+        replay(self.path)
+        self.assertEqual(CityManager.getInstance().getCity(1).name, long_name)
+        self.assertEqual(sorted(CabManager.getInstance().cabs), [101])
+
+        with Journal(self.path):  # Truncates the zero-filled tail
+            CabManager.getInstance().registerCab(102, 1)
+            CabManager.getInstance().registerCab(103, 1)
+        with open(self.path, 'r+b') as file:
+            file.seek(-3, os.SEEK_END)
+            file.write(b'\xff')  # Flip a byte of the last record's timestamp
+        replay(self.path)
+        self.assertEqual(sorted(CabManager.getInstance().cabs), [101, 102])
+        logger.info("test_corrupt_tail passed.")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+import sys
+import logging
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+try:
+    from src.cab_management.logging_config import SamplingFilter, configureLogging, stopLogging
+except ImportError:
+    sys.path.insert(0, 'src')
+    from cab_management.logging_config import SamplingFilter, configureLogging, stopLogging
+
+class ListHandler(logging.Handler):
+    """Collects formatted messages in a list."""
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+class TestLoggingConfig(unittest.TestCase):
+
+    def setUp(self):
+        """Remember the root logger configuration so it can be restored."""
+        self.root = logging.getLogger()
+        self.saved_handlers = list(self.root.handlers)
+        self.saved_level = self.root.level
+
+    def tearDown(self):
+        stopLogging()
+        for handler in list(self.root.handlers):
+            self.root.removeHandler(handler)
+        for handler in self.saved_handlers:
+            self.root.addHandler(handler)
+        self.root.setLevel(self.saved_level)
+
+    def test_sampling_filter(self):
+        """Test that sampled events keep one in N and warnings are never dropped."""
+        sampling = SamplingFilter({'cab_management.cab': 10, 'Selected cab %s': 2})
+        def make(name, level, msg):
+            return logging.LogRecord(name, level, __file__, 0, msg, (1,), None)
+        kept = [sampling.filter(make('cab_management.cab', logging.INFO, 'Cab %s')) for _ in range(100)]
+        self.assertEqual(sum(kept), 10)
+        kept = [sampling.filter(make('cab_management.booking_manager', logging.INFO, 'Selected cab %s')) for _ in range(10)]
+        self.assertEqual(sum(kept), 5, "Message templates should have their own rate")
+        self.assertTrue(all(sampling.filter(make('cab_management.cab', logging.WARNING, 'Cab %s')) for _ in range(10)))
+        self.assertTrue(sampling.filter(make('cab_management.utils', logging.INFO, 'Loaded %s')))
+        logger.info("test_sampling_filter passed.")
+
+    def test_production_mode(self):
+        """Test that production mode delivers sampled records through the listener thread."""
+        handler = ListHandler()
+        configureLogging(logging.INFO, production=True, sample_rates={'test.sampled': 5}, handlers=[handler])
+        for position in range(10):
+            logging.getLogger('test.sampled').info("Sampled %s", position)
+        logging.getLogger('test.other').warning("Warning %s", "kept")
+        stopLogging()
+        self.assertEqual(handler.messages, ["Sampled 0", "Sampled 5", "Warning kept"])
+        logger.info("test_production_mode passed.")
+
+if __name__ == '__main__':
+    unittest.main()
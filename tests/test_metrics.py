@@ -0,0 +1,114 @@
+import unittest
+import sys
+import logging
+import os
+import tempfile
+import urllib.request
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+try:
+    from src.cab_management.metrics import MetricsRegistry, LatencyHistogram, EXPORT_BOUNDS, bucketIndex, bucketBounds
+    from src.cab_management.booking_manager import BookingManager
+    from src.cab_management.analytics import Analytics
+    from src.cab_management.utils import load_initial_data
+except ImportError:
+    sys.path.insert(0, 'src')
+    from cab_management.metrics import MetricsRegistry, LatencyHistogram, EXPORT_BOUNDS, bucketIndex, bucketBounds
+    from cab_management.booking_manager import BookingManager
+    from cab_management.analytics import Analytics
+    from cab_management.utils import load_initial_data
+
+class TestMetrics(unittest.TestCase):
+
+    def test_histogram_buckets(self):
+        """Test that every value lands in a bucket within 1/16 of it and that percentiles follow the counts."""
+        for value in list(range(200)) + [10**3, 12345, 10**6 + 7, 10**9, 2**62]:
+            low, high = bucketBounds(bucketIndex(value))
+            self.assertTrue(low <= value < high)
+            self.assertLessEqual(high - low, max(1, value // 16))
+
+        histogram = LatencyHistogram('op')
+        for value in [1000] * 98 + [50000, 10**6]:
+            histogram.record(value)
+        self.assertEqual((histogram.count, histogram.total), (100, 98000 + 50000 + 10**6))
+        self.assertAlmostEqual(histogram.percentile(50), 1000, delta=1000 / 16)
+        self.assertAlmostEqual(histogram.percentile(99), 50000, delta=50000 / 16)
+        self.assertAlmostEqual(histogram.max, 10**6, delta=10**6 / 16)
+        histogram.reset()
+        self.assertEqual((histogram.count, histogram.percentile(50)), (0, 0))
+        logger.info("test_histogram_buckets passed.")
+
+    def test_attach_records_operations(self):
+        """Test that attached metrics time calls and count failures, and that detach restores the methods."""
+        load_initial_data()
+        book_cab, find_best_cab = BookingManager.bookCab, BookingManager.__dict__['findBestCab']
+        high_demand_cities = Analytics.__dict__['highDemandCities']
+        registry = MetricsRegistry().attach()
+        try:
+            booking_manager = BookingManager.getInstance()
+            booking_id = booking_manager.bookCab(3)
+            self.assertIsNotNone(booking_id)
+            self.assertFalse(booking_manager.endBooking(-1))
+            Analytics.highDemandCities(booking_manager.demand)
+            with self.assertRaises(ValueError):
+                Analytics.highDemandCities([])
+
+            self.assertEqual(registry.latencies['bookCab'].count, 1)
+            self.assertEqual(registry.latencies['findBestCab'].count, 1)  # Called by bookCab
+            self.assertEqual(registry.latencies['highDemandCities'].count, 2)
+            self.assertEqual(registry.failures['endBooking'], 1)
+            self.assertEqual(registry.errors['highDemandCities'], 1)
+            gauges = registry.getMetrics()['gauges']
+            self.assertGreaterEqual(gauges['activeBookings'], 1)
+            self.assertEqual(sum(count for _, count in gauges['idleCabs'].values()), gauges['cabs']['IDLE'])
+            booking_manager.endBooking(booking_id)
+        finally:
+            registry.detach()
+        self.assertIs(BookingManager.bookCab, book_cab)
+        self.assertIs(BookingManager.__dict__['findBestCab'], find_best_cab)
+        self.assertIs(Analytics.__dict__['highDemandCities'], high_demand_cities)
+        logger.info("test_attach_records_operations passed.")
+
+    def test_prometheus_export(self):
+        """Test the Prometheus text written to a file and served over HTTP."""
+        registry = MetricsRegistry()
+        registry.latencies['bookCab'] = histogram = LatencyHistogram('bookCab')
+        histogram.record(2000)
+        histogram.record(3000)
+        registry.failures['bookCab'] = 1
+        text = registry.toPrometheus()
+        self.assertIn('# TYPE cab_management_operation_seconds histogram', text)
+        self.assertIn('cab_management_operation_seconds_bucket{op="bookCab",le="+Inf"} 2', text)
+        buckets = [line for line in text.splitlines() if line.startswith('cab_management_operation_seconds_bucket')]
+        self.assertEqual(len(buckets), len(EXPORT_BOUNDS) + 1, "Every export bound should be written, empty or not")
+        self.assertIn('cab_management_operation_seconds_bucket{op="bookCab",le="1.023e-06"} 0', text)
+        self.assertIn('cab_management_operation_seconds_bucket{op="bookCab",le="2.047e-06"} 1', text)
+        self.assertIn('cab_management_operation_seconds_bucket{op="bookCab",le="4.095e-06"} 2', text)
+        self.assertIn('cab_management_operation_seconds_bucket{op="bookCab",le="68.719476735"} 2', text)
+        self.assertIn('cab_management_operation_seconds_count{op="bookCab"} 2', text)
+        self.assertIn('cab_management_operation_seconds_sum{op="bookCab"} 5e-06', text)
+        self.assertIn('cab_management_operation_failures_total{op="bookCab"} 1', text)
+        self.assertIn('cab_management_active_bookings ', text)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'cab_management.prom')
+            registry.writePrometheus(path)
+            with open(path) as f:
+                self.assertIn('cab_management_operation_seconds_count{op="bookCab"} 2', f.read())
+
+        server = registry.serve(port=0)
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+            with urllib.request.urlopen(url, timeout=5) as response:
+                self.assertIn('text/plain', response.headers['Content-Type'])
+                self.assertIn('cab_management_operation_seconds_count{op="bookCab"} 2', response.read().decode())
+        finally:
+            server.shutdown()
+            server.server_close()
+        logger.info("test_prometheus_export passed.")
+
+if __name__ == '__main__':
+    unittest.main()
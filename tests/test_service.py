@@ -0,0 +1,116 @@
+import unittest
+import asyncio
+import json
+import sys
+import logging
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+try:
+    from src.cab_management.utils import load_initial_data
+    from src.cab_management.service import BookingService
+    from src.cab_management.booking_manager import BookingManager
+    from src.cab_management.booking import BookingState
+    from src.cab_management.city_manager import CityManager
+except ImportError:
+    sys.path.insert(0, 'src')
+    from cab_management.utils import load_initial_data
+    from cab_management.service import BookingService
+    from cab_management.booking_manager import BookingManager
+    from cab_management.booking import BookingState
+    from cab_management.city_manager import CityManager
+
+class TestBookingService(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        """Load initial data and start the service on a free port."""
+        load_initial_data()
+        self.service = BookingService(port=0)
+        port = await self.service.start()
+        self.reader, self.writer = await asyncio.open_connection("127.0.0.1", port)
+        logger.info(f"Booking service started on port {port}.")
+
+    async def asyncTearDown(self):
+        self.writer.close()
+        await self.service.stop()
+
+    async def call(self, *requests):
+        """Send requests pipelined on one connection and return the responses by ID."""
+        for request_id, request in enumerate(requests):
+            self.writer.write(json.dumps(dict(request, id=request_id)).encode() + b"\n")
+        await self.writer.drain()
+        responses = {}
+        for _ in requests:
+            response = json.loads(await self.reader.readline())
+            responses[response["id"]] = response
+        return [responses[request_id] for request_id in range(len(requests))]
+
+    async def test_book_requests_are_coalesced(self):
+        """Test that pipelined bookings get distinct cabs in fewer batches than requests."""
+        idle_cabs = len(CityManager.getInstance().getCity(3).idleCabs)
+        batches_before = self.service.coalescer.batches
+        responses = await self.call(*[{"op": "book", "cityId": 3}] * (idle_cabs + 1))
+        booking_ids = [response["bookingId"] for response in responses if response["ok"]]
+        self.assertEqual(len(booking_ids), idle_cabs, "Every idle cab should be booked")
+        self.assertFalse(responses[-1]["ok"], "The last request should find no cab")
+        bookings = BookingManager.getInstance().bookings
+        self.assertEqual(len({bookings[booking_id].cab.cabId for booking_id in booking_ids}), idle_cabs)
+        self.assertLess(self.service.coalescer.batches - batches_before, idle_cabs + 1, "Requests should share a batch")
+        logger.info("test_book_requests_are_coalesced passed.")
+
+    async def test_end_and_update(self):
+        """Test the end and update operations and error responses."""
+        book, = await self.call({"op": "book", "cityId": 1})
+        end, update, missing, unknown = await self.call(
+            {"op": "end", "bookingId": book["bookingId"]},
+            {"op": "update", "cabId": 101, "state": "IDLE", "cityId": 2},
+            {"op": "update", "cabId": 999999},
+            {"op": "fly"},
+        )
+        self.assertTrue(end["ok"])
+        self.assertEqual(BookingManager.getInstance().bookings[book["bookingId"]].getState(), BookingState.COMPLETED)
+        self.assertTrue(update["ok"])
+        self.assertFalse(missing["ok"])
+        self.assertFalse(unknown["ok"])
+        logger.info("test_end_and_update passed.")
+
+    async def test_responses_flushed_before_close(self):
+        """Test that every response to a large pipelined burst arrives before the server closes the connection."""
+        requests = 5000
+        for request_id in range(requests):
+            self.writer.write(json.dumps({"id": request_id, "op": "fly"}).encode() + b"\n")
+        self.writer.write_eof()
+        await self.writer.drain()
+        responses = [json.loads(line) for line in (await self.reader.read()).splitlines()]
+        self.assertEqual(sorted(response["id"] for response in responses), list(range(requests)))
+        self.assertTrue(self.reader.at_eof(), "The server should close the connection after the last response")
+        logger.info("test_responses_flushed_before_close passed.")
+
+    async def test_in_flight_requests_are_capped(self):
+        """Test that a client that writes but never reads cannot make the server queue unbounded work."""
+        self.service.maxInFlight = 4
+        reader, writer = await asyncio.open_connection("127.0.0.1", self.service.port)
+
+        def responding():
+            return sum(1 for task in asyncio.all_tasks() if task.get_coro().__qualname__ == "BookingService._respond")
+
+        peak = 0
+        for _ in range(50):
+            writer.write(b'{"op": "fly"}\n' * 100)
+            await asyncio.sleep(0)
+            peak = max(peak, responding())
+        await asyncio.sleep(0.2)
+        peak = max(peak, responding())
+        self.assertGreater(peak, 0)
+        self.assertLessEqual(peak, 4, "No more than maxInFlight requests should be handled at once")
+
+        writer.write_eof()
+        responses = (await reader.read()).splitlines()
+        self.assertEqual(len(responses), 5000, "Every request should still be answered once the client reads")
+        writer.close()
+        logger.info("test_in_flight_requests_are_capped passed.")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import unittest
+import sys
+import logging
+from datetime import datetime
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+try:
+    from src.cab_management.sharding import ShardRouter, ShardWorker, ShardError
+    from src.cab_management.cab import Cab, CabState
+    from src.cab_management.analytics_cache import AnalyticsCache
+    from src.cab_management.utils import load_initial_data
+except ImportError:
+    sys.path.insert(0, 'src')
+    from cab_management.sharding import ShardRouter, ShardWorker, ShardError
+    from cab_management.cab import Cab, CabState
+    from cab_management.analytics_cache import AnalyticsCache
+    from cab_management.utils import load_initial_data
+
+START = datetime(2031, 1, 1, 8)
+
+class TestSharding(unittest.TestCase):
+
+    def setUp(self):
+        """Start two shards holding four cities with two cabs each."""
+        self.router = ShardRouter(2)
+        for city in range(1, 5):
+            self.router.addCity(city, f"City{city}")
+        self.router.registerCabs([(city * 10 + n, city) for city in range(1, 5) for n in range(2)], START)
+
+    def tearDown(self):
+        self.router.close()
+
+    def test_requests_routed_to_owning_shard(self):
+        """Test that cities are spread over the shards and bookings are ended through their global IDs."""
+        self.assertEqual(self.router.cityShards, {1: 0, 2: 1, 3: 0, 4: 1})
+        self.assertEqual([stats['cabs'] for stats in self.router.getStats()], [4, 4])
+
+        bookings = self.router.bookCabs([(1, START), (2, START), (2, START), (2, START), 99])
+        self.assertIsNone(bookings[3])  # City 2 has two cabs
+        self.assertIsNone(bookings[4])  # Unknown city
+        self.assertEqual(len(set(bookings[:3])), 3)
+        self.assertEqual([booking_id % 2 for booking_id in bookings[:3]], [0, 1, 1])
+        for booking_id in bookings[:3]:
+            self.assertTrue(self.router.endBooking(booking_id, START.replace(hour=9)))
+        self.assertFalse(self.router.endBooking(bookings[0] + 1000))
+        logger.info("test_requests_routed_to_owning_shard passed.")
+
+    def test_cross_shard_handoff(self):
+        """Test that moving a cab to a city on another shard hands it off, and that busy cabs stay put."""
+        bookings = self.router.bookCabs([(3, START), (3, START)])  # Both cabs of city 3 on trips
+        with self.assertRaises(ShardError):
+            self.router.updateCab(30, cityId=4)
+        self.assertEqual(self.router.cabShards[30], 0)
+        for booking_id in bookings:
+            self.router.endBooking(booking_id, START.replace(hour=10))
+
+        self.assertTrue(self.router.updateCab(40, state=CabState.IDLE, cityId=3))
+        self.assertEqual(self.router.cabShards[40], 0)
+        self.assertEqual([stats['cabs'] for stats in self.router.getStats()], [5, 3])
+        self.assertTrue(self.router.updateCab(40, cityId=1))  # Same shard, no handoff
+        self.assertEqual(self.router.handoffs, 1)
+        self.assertIsNotNone(self.router.bookCab(1, START.replace(hour=11)))
+        self.assertFalse(self.router.updateCab(999, cityId=1))
+        logger.info("test_cross_shard_handoff passed.")
+
+    def test_failed_handoff_and_misrouted_booking(self):
+        """Test that a cab the new shard fails to adopt returns to its old shard, and that shards refuse foreign booking IDs."""
+        call_one = self.router._callOne
+
+        def failing_adopt(shard, method, *args):
+            if method == 'adoptCab' and shard == 1:
+                raise ShardError("Shard 1: adopt failed")
+            return call_one(shard, method, *args)
+
+        self.router._callOne = failing_adopt
+        with self.assertRaises(ShardError):
+            self.router.updateCab(10, cityId=2)
+        self.router._callOne = call_one
+        self.assertEqual(self.router.cabShards[10], 0)
+        self.assertEqual([stats['cabs'] for stats in self.router.getStats()], [4, 4])
+        self.assertEqual(self.router.handoffs, 0)
+        self.assertIsNotNone(self.router.bookCabs([(1, START), (1, START)])[1])  # Cab 10 is bookable in city 1 again
+
+        self.assertFalse(ShardWorker(1, 2).endBooking(4))  # Booking 4 belongs to shard 0
+        logger.info("test_failed_handoff_and_misrouted_booking passed.")
+
+    def test_partial_registration_is_routed(self):
+        """Test that cabs registered by the shards that succeeded stay routable when another shard fails."""
+        with self.assertRaises(ShardError) as raised:
+            self.router.registerCabs([(100, 1), (101, 3), (200, 2, "FLYING")])  # Shard 1 rejects its row
+        self.assertEqual(list(raised.exception.results), [0])
+        self.assertEqual(self.router.cabShards[100], 0)
+        self.assertEqual(self.router.cabShards[101], 0)
+        self.assertNotIn(200, self.router.cabShards)
+        self.assertEqual([stats['cabs'] for stats in self.router.getStats()], [6, 4])
+        self.assertTrue(self.router.updateCab(100, cityId=4))  # Routed, and handed off
+        logger.info("test_partial_registration_is_routed passed.")
+
+    def test_release_invalidates_fleet_reports(self):
+        """Test that a cab leaving its shard is dropped from cached fleet reports."""
+        load_initial_data()
+        worker = ShardWorker(0, 1)
+        cache = AnalyticsCache()
+        window = (datetime(2024, 7, 25), datetime(2024, 7, 26))
+        self.assertIsNotNone(cache.fleetIdleReport(*window).cab(101))
+        version = Cab.fleetVersion
+        released = worker.releaseCab(101)
+        self.assertGreater(Cab.fleetVersion, version)
+        self.assertIsNone(cache.fleetIdleReport(*window).cab(101))
+        worker.adoptCab(released, released['cityId'])
+        logger.info("test_release_invalidates_fleet_reports passed.")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+import os
+import sys
+import tempfile
+import logging
+from datetime import datetime, timedelta, timezone
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+try:
+    from src.cab_management.snapshot import snapshot, restore, SnapshotError
+    from src.cab_management.utils import load_initial_data
+    from src.cab_management.booking_manager import BookingManager
+    from src.cab_management.cab_manager import CabManager
+    from src.cab_management.city_manager import CityManager
+except ImportError:
+    sys.path.insert(0, 'src')
+    from cab_management.snapshot import snapshot, restore, SnapshotError
+    from cab_management.utils import load_initial_data
+    from cab_management.booking_manager import BookingManager
+    from cab_management.cab_manager import CabManager
+    from cab_management.city_manager import CityManager
+
+def fleet_state():
+    """Summarize the state of all managers as plain values."""
+    cabs = {cab_id: (cab.cityId, cab.state, cab.getHistory(), list(cab.bookings), cab._idleTotal,
+                     cab._lastTransition, cab._city.cityId if cab._city else None)
+            for cab_id, cab in CabManager.getInstance().cabs.items()}
+    bookings = {booking_id: (booking.cab.cabId, booking.city.cityId, booking.state, booking.start_time, booking.end_time)
+                for booking_id, booking in BookingManager.getInstance().bookings.items()}
+    cities = {city_id: (city.name, sorted(city.cabs), {state: sorted(cabs) for state, cabs in city.cabsByState.items()})
+              for city_id, city in CityManager.getInstance().cities.items()}
+    return cabs, bookings, cities
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        """Load initial data and pick a snapshot path."""
+        load_initial_data()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'fleet.snap')
+        logger.info("Initial data loaded for snapshot tests.")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_round_trip(self):
+        """Test that restore brings back exactly the state that was snapshotted."""
+        booking_manager = BookingManager.getInstance()
+        booking_id = booking_manager.bookCab(3)
+        expected = fleet_state()
+        counts = snapshot(self.path)
+        self.assertEqual(counts['bookings'], len(booking_manager.bookings))
+
+        booking_manager.endBooking(booking_id)
+        booking_manager.bookCab(4)
+        restore(self.path)
+        self.assertEqual(fleet_state(), expected)
+
+        # Restored objects are wired together and usable
+        booking = booking_manager.bookings[booking_id]
+        self.assertIs(booking.cab, CabManager.getInstance().getCab(booking.cab.cabId))
+        self.assertIs(booking.cab._city, CityManager.getInstance().getCity(booking.cab.cityId))
+        self.assertTrue(booking_manager.endBooking(booking_id))
+        self.assertGreater(booking_manager.bookCab(3), max(expected[1]), "New bookings should get fresh IDs")
+        logger.info("test_round_trip passed.")
+
+    def test_unusual_values_round_trip(self):
+        """Test that timestamps kept as-is and odd history states survive the JSON extras column."""
+        aware = datetime(2024, 7, 25, 15, tzinfo=timezone(timedelta(hours=5)))
+        cab = CabManager.getInstance().getCab(101)
+        cab.history.append((aware, "MAINTENANCE"))
+        cab.history.append(("25/07/2024 16:00", cab.state))
+        booking_manager = BookingManager.getInstance()
+        booking_id = booking_manager.bookCab(3, aware)
+        booking_manager.bookings[booking_id].end_time = "later"
+        expected = fleet_state()
+        snapshot(self.path)
+
+        booking_manager.bookCab(4)
+        restore(self.path)
+        self.assertEqual(fleet_state(), expected)
+        self.assertEqual(booking_manager.bookings[booking_id].start_time.utcoffset(), timedelta(hours=5))
+        with open(self.path, 'rb') as file:
+            self.assertIn(b'"MAINTENANCE"', file.read())
+        logger.info("test_unusual_values_round_trip passed.")
+
+    def test_invalid_file(self):
+        """Test that files that are not snapshots are rejected without touching the managers."""
+        with open(self.path, 'wb') as file:
+            file.write(b'not a snapshot' * 10)
+        expected = fleet_state()
+        with self.assertRaises(SnapshotError):
+            restore(self.path)
+        self.assertEqual(fleet_state(), expected)
+        logger.info("test_invalid_file passed.")
+
+if __name__ == '__main__':
+    unittest.main()
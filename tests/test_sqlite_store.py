@@ -0,0 +1,135 @@
+import unittest
+import os
+import sys
+import tempfile
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+try:
+    from src.cab_management.sqlite_store import SQLiteStore
+    from src.cab_management.utils import load_initial_data
+    from src.cab_management.analytics import Analytics
+    from src.cab_management.booking_manager import BookingManager
+    from src.cab_management.cab_manager import CabManager
+    from src.cab_management.city_manager import CityManager
+    from src.cab_management.cab import CabState
+except ImportError:
+    sys.path.insert(0, 'src')
+    from cab_management.sqlite_store import SQLiteStore
+    from cab_management.utils import load_initial_data
+    from cab_management.analytics import Analytics
+    from cab_management.booking_manager import BookingManager
+    from cab_management.cab_manager import CabManager
+    from cab_management.city_manager import CityManager
+    from cab_management.cab import CabState
+
+class TestSQLiteStore(unittest.TestCase):
+
+    def setUp(self):
+        """Load initial data and open a store that flushes only on demand."""
+        load_initial_data()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = SQLiteStore(os.path.join(self.tmp_dir.name, 'fleet.db'), batchSize=1000, flushInterval=3600)
+        self.store.attach()
+        logger.info("Initial data loaded for SQLite store tests.")
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp_dir.cleanup()
+
+    def test_batched_writes(self):
+        """Test that events are buffered and written together."""
+        booking_manager = BookingManager.getInstance()
+        flushes = self.store.flushes
+        booking_id = booking_manager.bookCab(3)
+        booking_manager.endBooking(booking_id)
+        self.assertEqual(self.store.flushes, flushes, "Events should stay buffered until a flush")
+
+        self.assertEqual(sorted(self.store.getCabIdsInCityByState(3, CabState.IDLE)),
+                         sorted(CabManager.getInstance().getCabIdsInCityByState(3, CabState.IDLE)))
+        self.assertEqual(self.store.flushes, flushes + 1, "Queries should flush the buffered events once")
+        logger.info("test_batched_writes passed.")
+
+    def test_queries_match_analytics(self):
+        """Test that the SQL analytics agree with the in-memory ones."""
+        booking_manager = BookingManager.getInstance()
+        booking_id = booking_manager.bookCab(3, datetime(2030, 1, 1, 9))
+        booking_manager.endBooking(booking_id, datetime(2030, 1, 1, 10))
+        analytics = Analytics()
+        cab_id = booking_manager.bookings[booking_id].cab.cabId
+
+        self.assertEqual(self.store.highDemandCities(), analytics.highDemandCities(booking_manager.getAllBookings()))
+        window = (datetime(2030, 1, 1, 8), datetime(2030, 1, 1, 12))
+        self.assertEqual(self.store.calculateStateTime(cab_id, CabState.IDLE, *window),
+                         analytics.calculateIdleTime(CabManager.getInstance().getCab(cab_id), *window))
+        self.assertIn(booking_id, self.store.getBookingsBetween(*window))
+        logger.info("test_queries_match_analytics passed.")
+
+    def test_peak_hour_uses_wall_clock(self):
+        """Test that the SQL peak hour is the wall-clock hour of aware start times, as in Analytics."""
+        booking_manager = BookingManager.getInstance()
+        start_time = datetime(2030, 1, 1, 23, tzinfo=timezone(timedelta(hours=5)))  # 18:00 UTC
+        booked = [booking_manager.bookCab(city, start_time) for city in range(1, 7)]
+        self.assertNotIn(None, booked)
+
+        self.assertEqual(self.store._query("SELECT DISTINCT start_hour FROM bookings WHERE bookingId IN (?, ?, ?, ?, ?, ?)",
+                                           booked), [(23,)])
+        self.assertEqual(self.store.highDemandCities(), Analytics.highDemandCities(booking_manager.getAllBookings()))
+        logger.info("test_peak_hour_uses_wall_clock passed.")
+
+    def test_writer_thread_flushes(self):
+        """Test that a full batch is written by the writer thread, not by the event."""
+        self.store.close()
+        self.store = SQLiteStore(os.path.join(self.tmp_dir.name, 'batched.db'), batchSize=2, flushInterval=3600)
+        self.store.attach(saveExisting=False)
+        booking_manager = BookingManager.getInstance()
+        booking_manager.bookCab(3)
+        deadline = time.monotonic() + 5
+        while not self.store.flushes and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.store.flushes, 1, "The writer thread should flush a full batch")
+        self.assertIsNone(self.store.error)
+        logger.info("test_writer_thread_flushes passed.")
+
+    def test_load(self):
+        """Test that loading the database rebuilds the managers."""
+        booking_manager = BookingManager.getInstance()
+        booking_id = booking_manager.bookCab(3, datetime(2030, 1, 1, 9))
+        cab_id = booking_manager.bookings[booking_id].cab.cabId
+        expected_states = {cab.cabId: cab.state for cab in CabManager.getInstance().cabs.values()}
+        CityManager.getInstance().addCity(77, "Removed")
+        self.store.flush()
+        self.assertTrue(CityManager.getInstance().removeCity(77))
+        self.store.detach()
+
+        CabManager.getInstance().registerCab(999, 1)
+        counts = self.store.load()
+        self.assertEqual({cab.cabId: cab.state for cab in CabManager.getInstance().cabs.values()}, expected_states)
+        self.assertEqual(counts['bookings'], len(booking_manager.bookings))
+        self.assertEqual(booking_manager.bookings[booking_id].start_time, datetime(2030, 1, 1, 9))
+        self.assertNotIn(77, CityManager.getInstance().cities)
+        self.assertIn(booking_id, CabManager.getInstance().getCab(cab_id).bookings)
+        self.assertTrue(booking_manager.endBooking(booking_id), "Loaded bookings should be usable")
+        logger.info("test_load passed.")
+
+    def test_load_skips_untimed_history(self):
+        """Test that history rows without a timestamp are skipped instead of being stamped with the load time."""
+        cab = CabManager.getInstance().getCab(101)
+        expected = [state for _, state in cab.getHistory()]
+        self.store.detach()
+        with self.store.connection:
+            self.store.connection.execute("INSERT INTO cab_history (cabId, timestamp, state) VALUES (101, NULL, 'ON_TRIP')")
+
+        with self.assertLogs('cab_management.sqlite_store', level='WARNING'):
+            self.store.load()
+        history = CabManager.getInstance().getCab(101).getHistory()
+        self.assertEqual([state for _, state in history], expected, "The untimed row should not be replayed")
+        logger.info("test_load_skips_untimed_history passed.")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+import unittest
+import os
+import sys
+import tempfile
+import logging
+from datetime import datetime, timedelta
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+try:
+    from src.cab_management.tiered_history import HistorySegments, TieredHistory
+    from src.cab_management.compact_history import CompactHistory
+    from src.cab_management.analytics import Analytics
+    from src.cab_management.utils import load_initial_data
+    from src.cab_management.booking_manager import BookingManager
+    from src.cab_management.cab_manager import CabManager
+    from src.cab_management.cab import Cab, CabState
+except ImportError:
+    sys.path.insert(0, 'src')
+    from cab_management.tiered_history import HistorySegments, TieredHistory
+    from cab_management.compact_history import CompactHistory
+    from cab_management.analytics import Analytics
+    from cab_management.utils import load_initial_data
+    from cab_management.booking_manager import BookingManager
+    from cab_management.cab_manager import CabManager
+    from cab_management.cab import Cab, CabState
+
+START = datetime(2024, 7, 25)
+STATES = [CabState.RESERVED, CabState.ON_TRIP, CabState.IDLE]
+
+def drive(cab, transitions, minutes):
+    """Cycle the cab through RESERVED, ON_TRIP and IDLE at the given minute offsets."""
+    for position in range(transitions):
+        cab.setState(STATES[position % 3], START + timedelta(minutes=minutes(position)))
+
+class TestTieredHistory(unittest.TestCase):
+
+    def setUp(self):
+        """Create segment files with small chunks so histories spill quickly."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.segments = HistorySegments(self.tmp_dir.name, chunkEntries=4)
+        logger.info("History segments created for tiered history tests.")
+
+    def tearDown(self):
+        self.segments.close()
+        self.tmp_dir.cleanup()
+
+    def test_reads_across_tiers(self):
+        """Test that history and idle time queries see the spilled transitions."""
+        tiered = Cab(1, 1, created=START)
+        tiered.history = TieredHistory.fromHistory(tiered.history, self.segments)
+        reference = Cab(2, 1, created=START)
+        for cab in (tiered, reference):
+            drive(cab, 100, lambda position: position * 10 + position % 7)
+        self.assertGreater(tiered.history.coldLength, 80)
+        self.assertLess(len(tiered.history.data), 2 * self.segments.chunkSize, "Resident tier should stay bounded")
+
+        self.assertEqual(Analytics.getCabHistory(tiered)[0], reference.getHistory())
+        self.assertEqual(tiered.history[5], reference.history[5])
+        self.assertEqual(bytes(tiered.history.packed()), bytes(reference.history.packed()))
+        for start, end in [(0, 1000), (35, 47), (5, 600), (900, 1200), (-60, 3)]:
+            window = (START + timedelta(minutes=start), START + timedelta(minutes=end))
+            self.assertEqual(Analytics.calculateIdleTime(tiered, *window),
+                             Analytics.calculateIdleTime(reference, *window), f"Window {start}-{end}")
+        self.assertEqual(Analytics.calculateStateTime(tiered, CabState.ON_TRIP, None, START + timedelta(days=1)),
+                         Analytics.calculateStateTime(reference, CabState.ON_TRIP, None, START + timedelta(days=1)))
+        with self.assertRaises(ValueError):
+            Analytics.calculateIdleTime(tiered, "yesterday", START)
+        logger.info("test_reads_across_tiers passed with %s sealed entries.", tiered.history.coldLength)
+
+    def test_out_of_order(self):
+        """Test that histories with out-of-order timestamps still spill and answer queries correctly."""
+        tiered = Cab(1, 1, created=START + timedelta(days=1))
+        tiered.history = TieredHistory.fromHistory(tiered.history, self.segments)
+        reference = Cab(2, 1, created=START + timedelta(days=1))
+        for cab in (tiered, reference):
+            drive(cab, 30, lambda position: (position * 37) % 50 * 10)
+        self.assertFalse(tiered.history.ordered)
+        self.assertGreater(tiered.history.coldLength, 0)
+        self.assertEqual(tiered.history, CompactHistory(reference.getHistory()))
+        window = (START, START + timedelta(days=2))
+        self.assertEqual(Analytics.calculateIdleTime(tiered, *window), Analytics.calculateIdleTime(reference, *window))
+        logger.info("test_out_of_order passed.")
+
+    def test_manager_spill(self):
+        """Test that enabling spilling on the manager keeps cabs bookable and histories intact."""
+        load_initial_data()
+        cab_manager = CabManager.getInstance()
+        booking_manager = BookingManager.getInstance()
+        cab_manager.enableHistorySpill(self.tmp_dir.name + '/manager', chunkEntries=2)
+        self.addCleanup(cab_manager.disableHistorySpill)
+        for hour in range(6):
+            booking_id = booking_manager.bookCab(3, START + timedelta(days=400, hours=hour))
+            booking_manager.endBooking(booking_id, START + timedelta(days=400, hours=hour, minutes=30))
+        cab = booking_manager.bookings[booking_id].cab
+        self.assertIsInstance(cab.history, TieredHistory)
+        expected = cab.getHistory()
+        self.assertGreater(cab.history.coldLength, 0)
+
+        cab_manager.registerCab(998, 1)
+        self.assertIsInstance(cab_manager.getCab(998).history, TieredHistory)
+        cab_manager.disableHistorySpill()
+        self.assertNotIsInstance(cab.history, TieredHistory)
+        self.assertEqual(cab.getHistory(), expected)
+        logger.info("test_manager_spill passed.")
+
+    def test_temporary_directory_removed(self):
+        """Test that segments in a directory the store created are deleted on close, and others are kept."""
+        cab_manager = CabManager.getInstance()
+        segments = cab_manager.enableHistorySpill(chunkEntries=2)
+        directory = segments.directory
+        segments.write(bytes(segments.chunkSize))
+        self.assertTrue(os.listdir(directory))
+        cab_manager.disableHistorySpill()
+        self.assertFalse(os.path.exists(directory), "The self-created directory should be deleted")
+
+        self.segments.write(bytes(self.segments.chunkSize))
+        self.segments.close()
+        self.assertTrue(os.listdir(self.tmp_dir.name), "A given directory should be left in place")
+        logger.info("test_temporary_directory_removed passed.")
+
+if __name__ == '__main__':
+    unittest.main()
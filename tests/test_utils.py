@@ -1,5 +1,8 @@
 import unittest
 import sys
+import os
+import json
+import tempfile
 import logging
 
 # Set up logging
@@ -7,14 +10,18 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 try:
-    from src.cab_management.utils import load_initial_data, add_booking, end_trip_with_timestamp
+    from src.cab_management.utils import load_initial_data, stream_initial_data, add_booking, end_trip_with_timestamp, INITIAL_DATA_PATH
     from src.cab_management.booking_manager import BookingManager
     from src.cab_management.booking import BookingState
+    from src.cab_management.cab_manager import CabManager
+    from src.cab_management.cab import CabState
 except ImportError:
     sys.path.insert(0, 'src')
-    from cab_management.utils import load_initial_data, add_booking, end_trip_with_timestamp
+    from cab_management.utils import load_initial_data, stream_initial_data, add_booking, end_trip_with_timestamp, INITIAL_DATA_PATH
     from cab_management.booking_manager import BookingManager
     from cab_management.booking import BookingState
+    from cab_management.cab_manager import CabManager
+    from cab_management.cab import CabState
 
 class TestUtils(unittest.TestCase):
 
@@ -42,5 +49,66 @@ class TestUtils(unittest.TestCase):
         self.assertEqual(booking.state, BookingState.COMPLETED, "Booking should be completed after ending the trip")
         logger.info(f"Trip for booking ID {booking_id} ended successfully.")
 
+    def test_stream_initial_data(self):
+        """Test streaming the JSON layout and the same records as NDJSON."""
+        with open(INITIAL_DATA_PATH) as file:
+            data = json.load(file)
+        expected = {'city': len(data['cities']), 'cab': len(data['cabs']), 'booking': len(data['bookings'])}
+        booking_manager = BookingManager.getInstance()
+
+        before = len(booking_manager.getBookings())
+        progress = []
+        counts = stream_initial_data(INITIAL_DATA_PATH, chunk_size=7, progress=lambda rows, elapsed: progress.append(rows))
+        self.assertEqual(counts, expected)
+        self.assertEqual(len(booking_manager.getBookings()), before + expected['booking'])
+        self.assertEqual(progress[-1], sum(expected.values()))
+        self.assertTrue(all(b - a <= 7 for a, b in zip([0] + progress, progress)), "Chunks should hold at most 7 records")
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'fleet.ndjson')
+            with open(path, 'w') as file:
+                for key in ('cities', 'cabs', 'bookings'):
+                    for record in data[key]:
+                        file.write(json.dumps(record) + "\n")
+            self.assertEqual(stream_initial_data(path), expected)
+        logger.info("Streamed %s records from JSON and NDJSON.", sum(expected.values()))
+
+    def test_load_skips_cab_in_unknown_city(self):
+        """Test that a cab naming an unknown city is skipped without failing the rest of the import."""
+        with open(INITIAL_DATA_PATH) as file:
+            data = json.load(file)
+        data['cabs'].insert(1, {'cabId': 9001, 'cityId': 9999, 'cabState': 'IDLE'})
+        booking_manager = BookingManager.getInstance()
+        before = len(booking_manager.getBookings())
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'initial_data.json')
+            with open(path, 'w') as file:
+                json.dump(data, file)
+            with self.assertLogs('cab_management.cab_manager', level='WARNING') as logs:
+                load_initial_data(path)
+        self.assertEqual(len(booking_manager.getBookings()), before + len(data['bookings']))
+        self.assertIsNone(CabManager.getInstance().getCab(9001))
+        self.assertTrue(any('9001' in message and '9999' in message for message in logs.output),
+                        "Skipping the cab should be logged")
+        logger.info("test_load_skips_cab_in_unknown_city passed.")
+
+    def test_load_records_one_history_entry_per_cab(self):
+        """Test that a loaded cab's history starts with its loaded state, not IDLE then that state."""
+        data = {'cities': [{'cityId': 9100, 'name': 'Loader City'}],
+                'cabs': [{'cabId': 9101, 'cityId': 9100, 'cabState': 'ON_TRIP'},
+                         {'cabId': 9102, 'cityId': 9100, 'cabState': 'IDLE'}],
+                'bookings': []}
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'initial_data.json')
+            with open(path, 'w') as file:
+                json.dump(data, file)
+            load_initial_data(path)
+        cab_manager = CabManager.getInstance()
+        for cab_id, state in ((9101, CabState.ON_TRIP), (9102, CabState.IDLE)):
+            history = cab_manager.getCab(cab_id).getHistory()
+            self.assertEqual([entry_state for _, entry_state in history], [state],
+                             f"Cab {cab_id} should have a single registration entry")
+        logger.info("test_load_records_one_history_entry_per_cab passed.")
+
 if __name__ == '__main__':
     unittest.main()